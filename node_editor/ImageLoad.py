@@ -1,37 +1,120 @@
-from typing import NoReturn, Final
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, wait
+from typing import NoReturn, Final, Optional
 
 import pygame
 import pygame_gui
 from pygame import Surface, Event
 
-from pygame_gui.elements import UIButton, UIImage
+from pygame_gui.elements import UIButton, UIImage, UIProgressBar, UILabel
 from pygame_gui.windows import UIFileDialog
 from pygame_gui.core.utility import create_resource_path
 
-from app import Screen
-from config import Config, resource_path
+from app import Screen, SharedThemeManager
+from assets import AssetLedger
+from config import Config
+from importer import BatchImport, NameIndex, sources_of, name_of
 
 config: Final[Config] = Config()
+ledger: Final[AssetLedger] = AssetLedger()
 
 
 class ImageLoadApp(Screen):
     def update(self) -> NoReturn:
+        self.poll()
         self.surface.fill(self.ui_manager.ui_theme.get_colour('dark_bg'))
         time_delta = self.clock.tick(60) / 1000.0
         self.ui_manager.update(time_delta)
         self.ui_manager.draw_ui(self.surface)
         pygame.display.update()
 
-    @staticmethod
-    def get_path(raw_path: str) -> str:
-        path = raw_path.replace('\\', '/')
-        return f'{config.get_dir_upload()}/{path[path.rfind("/"): path.find(".")]}.jpeg'
+    def start(self, sources: list[str], single: bool = False) -> NoReturn:
+        """Отдаёт картинки пулу. Пакет, начатый раньше и ещё не готовый, пополняется."""
+        if self.pool is None:
+            # spawn: рабочим процессам не достаются копии окна и шрифтов pygame
+            self.pool = ProcessPoolExecutor(config.import_workers, mp_context=multiprocessing.get_context('spawn'))
+        if self.batch is None or self.batch.finished:
+            self.batch = BatchImport(self.pool, config.get_dir_upload(), config.max_image_size)
+            self.names = NameIndex(config.get_dir_upload())
+            self.single = single
+        else:
+            self.single = False
+        self.batch.add(sources)
+        self.accept_button.disable()
+        self.progress_bar.show()
+
+    def poll(self) -> NoReturn:
+        if self.batch is None:
+            return
+        for source, file in self.batch.poll():
+            self.names.add(name_of(source), file)
+        self.progress_bar.set_current_progress(100 * self.batch.done / max(1, self.batch.total))
+        if not self.batch.finished:
+            return
+        batch, self.batch = self.batch, None
+        self.progress_bar.hide()
+        self.names.save()
+        summary: str = f'Импортировано картинок: {len(batch.imported)} из {batch.total}'
+        if batch.failed:
+            shown: str = ', '.join(os.path.basename(source) for source in batch.failed[:3])
+            summary += f'; не удалось загрузить: {shown}' + (' и др.' if len(batch.failed) > 3 else '')
+        self.status.set_text(summary)
+        if self.single and batch.imported:
+            self.show_preview(f'{config.get_dir_upload()}/{batch.imported[0]}')
+
+    def show_preview(self, path: str) -> NoReturn:
+        if self.display_loaded_image is not None:
+            self.display_loaded_image.kill()
+        try:
+            loaded_image = pygame.image.load(path).convert_alpha()
+        except pygame.error:
+            print('Непонятная ошибка')
+            return
+        self.file_path = path
+        image_rect = loaded_image.get_rect()
+        aspect_ratio = image_rect.width / image_rect.height
+        need_to_scale = False
+        if image_rect.width > self.max_image_display_dimensions[0]:
+            image_rect.width = self.max_image_display_dimensions[0]
+            image_rect.height = int(image_rect.width / aspect_ratio)
+            need_to_scale = True
+
+        if image_rect.height > self.max_image_display_dimensions[1]:
+            image_rect.height = self.max_image_display_dimensions[1]
+            image_rect.width = int(image_rect.height * aspect_ratio)
+            need_to_scale = True
+
+        if need_to_scale:
+            loaded_image = pygame.transform.smoothscale(loaded_image,
+                                                        image_rect.size)
+
+        image_rect.center = (self.surface.get_size()[0] / 2, self.surface.get_size()[1] / 2)
+
+        self.display_loaded_image = UIImage(relative_rect=image_rect,
+                                            image_surface=ledger.track(loaded_image, self, self.file_path, 'preview'),
+                                            manager=self.ui_manager)
+        self.accept_button.enable()
+
+    def shutdown(self) -> NoReturn:
+        """Начатый пакет доделывается: картинки, уже отданные пулу, должны попасть в индекс имён."""
+        if self.batch is not None:
+            self.single = False
+            wait(self.batch.pending)
+            self.poll()
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
 
     def control(self, events: list[Event]) -> bool:
         if len(events) <= 0:
             return False
 
+        # перетащенные в окно файлы импортируются одним пакетом
+        dropped: list[str] = []
         for event in events:
+            if event.type == pygame.DROPFILE:
+                dropped += sources_of(event.file)
             if event.type == pygame_gui.UI_BUTTON_PRESSED:
                 match event.ui_element:
                     case self.load_button:
@@ -46,56 +129,33 @@ class ImageLoadApp(Screen):
 
                     case self.accept_button:
                         self.node.replace_image(self.file_path[self.file_path.rfind("/") + 1:])
+                        self.editor.mark_dirty(self.node)
+                        self.editor.node_changed(self.node)
+                        self.editor.load_input = False
+
+                    case self.back_button:
+                        # начатый пакет доделывается в фоне
                         self.editor.load_input = False
 
             if event.type == pygame_gui.UI_FILE_DIALOG_PATH_PICKED:
-                if self.display_loaded_image is not None:
-                    self.display_loaded_image.kill()
-
-                try:
-                    image_path = create_resource_path(event.text)
-                    loaded_image = pygame.image.load(image_path).convert_alpha()
-                    self.file_path = self.get_path(event.text)
-                    pygame.image.save(loaded_image, self.file_path)
-                    image_rect = loaded_image.get_rect()
-                    aspect_ratio = image_rect.width / image_rect.height
-                    need_to_scale = False
-                    if image_rect.width > self.max_image_display_dimensions[0]:
-                        image_rect.width = self.max_image_display_dimensions[0]
-                        image_rect.height = int(image_rect.width / aspect_ratio)
-                        need_to_scale = True
-
-                    if image_rect.height > self.max_image_display_dimensions[1]:
-                        image_rect.height = self.max_image_display_dimensions[1]
-                        image_rect.width = int(image_rect.height * aspect_ratio)
-                        need_to_scale = True
-
-                    if need_to_scale:
-                        loaded_image = pygame.transform.smoothscale(loaded_image,
-                                                                    image_rect.size)
-
-                    image_rect.center = (self.surface.get_size()[0] / 2, self.surface.get_size()[1] / 2)
-
-                    self.display_loaded_image = UIImage(relative_rect=image_rect,
-                                                        image_surface=loaded_image,
-                                                        manager=self.ui_manager)
-                    self.accept_button.enable()
-
-                except pygame.error as er:
-                    print('Непонятная ошибка')
+                # папка импортируется пакетом, одиночный файл — пакетом из одного с превью по готовности
+                image_path = create_resource_path(event.text)
+                self.start(sources_of(image_path), single=not os.path.isdir(image_path))
 
             if event.type == pygame_gui.UI_WINDOW_CLOSE and event.ui_element == self.file_dialog:
                 self.load_button.enable()
                 self.file_dialog = None
 
             self.ui_manager.process_events(event)
+        if dropped:
+            self.start(dropped)
         return True
 
     def __init__(self, editor):
         super().__init__()
         self.editor = editor
         self.node = None
-        self.ui_manager = pygame_gui.UIManager(self.surface.get_size(), resource_path('theme.json'))
+        self.ui_manager = SharedThemeManager(self.surface.get_size(), 'theme.json')
         self.surface.fill(self.ui_manager.ui_theme.get_colour('dark_bg'))
         self.load_button = UIButton(relative_rect=pygame.Rect(-200, -60, 180, 30),
                                     text='Загрузить изображение',
@@ -114,9 +174,42 @@ class ImageLoadApp(Screen):
                                           'top': 'bottom',
                                           'bottom': 'bottom'})
 
+        self.back_button = UIButton(relative_rect=pygame.Rect(220, -60, 180, 30),
+                                    text='Назад',
+                                    manager=self.ui_manager,
+                                    anchors={
+                                        'left': 'left',
+                                        'right': 'right',
+                                        'top': 'bottom',
+                                        'bottom': 'bottom'})
+
+        self.progress_bar = UIProgressBar(relative_rect=pygame.Rect(420, -60, 300, 30),
+                                          manager=self.ui_manager,
+                                          anchors={
+                                              'left': 'left',
+                                              'right': 'right',
+                                              'top': 'bottom',
+                                              'bottom': 'bottom'},
+                                          visible=0)
+
+        # итог последнего пакета
+        self.status = UILabel(relative_rect=pygame.Rect(20, -100, -1, 30),
+                              text='',
+                              manager=self.ui_manager,
+                              anchors={
+                                  'left': 'left',
+                                  'right': 'right',
+                                  'top': 'bottom',
+                                  'bottom': 'bottom'})
+
         self.accept_button.disable()
         self.file_dialog = None
         self.file_path: str = ''
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.batch: Optional[BatchImport] = None
+        self.names: Optional[NameIndex] = None
+        # пакет из одного выбранного файла: по готовности показывается превью для подтверждения
+        self.single: bool = False
 
         # scale images, if necessary so that their largest dimension does not exceed these values
         self.max_image_display_dimensions = (400, 400)
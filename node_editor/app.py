@@ -2,12 +2,59 @@ from abc import abstractmethod, ABC
 from typing import NoReturn, Final
 
 import pygame as pg
+import pygame_gui
 from pygame import Surface, Rect, Color, Event
+from pygame_gui.core import UIAppearanceTheme
 
-from config import Config
+from config import Config, resource_path
 
 config: Final[Config] = Config()
 
+# шрифты темы грузятся с первым менеджером интерфейса, какой бы экран его ни создал
+pg.font.init()
+
+
+def coalesce_motion(events: list[Event]) -> list[Event]:
+    """Склеивает каждую серию идущих подряд MOUSEMOTION в одно событие: сдвиги rel складываются, позиция
+    и кнопки берутся из последнего. Остальные события остаются на своих местах, поэтому нажатия и отпускания
+    кнопок не переставляются относительно движения."""
+    result: list[Event] = []
+    run: list[Event] = []
+
+    def flush() -> NoReturn:
+        if len(run) == 1:
+            result.append(run[0])
+        elif run:
+            last: Event = run[-1]
+            rel: tuple[int, int] = (sum(event.rel[0] for event in run), sum(event.rel[1] for event in run))
+            result.append(Event(pg.MOUSEMOTION, dict(last.dict, rel=rel)))
+        run.clear()
+
+    for event in events:
+        if event.type == pg.MOUSEMOTION:
+            run.append(event)
+        else:
+            flush()
+            result.append(event)
+    flush()
+    return result
+
+
+class SharedThemeManager(pygame_gui.UIManager):
+    """UIManager с общей на процесс темой: файл темы разбирается, а её шрифты загружаются один раз, хотя
+    каждый экран создаёт свой менеджер. Живое обновление темы из файла выключено: общую тему
+    перечитывать некому."""
+
+    themes: dict[str, UIAppearanceTheme] = {}
+
+    def __init__(self, size: tuple[int, int], theme: str) -> NoReturn:
+        super().__init__(size, resource_path(theme), enable_live_theme_updates=False)
+
+    def create_new_theme(self, theme_path=None) -> UIAppearanceTheme:
+        if theme_path not in SharedThemeManager.themes:
+            SharedThemeManager.themes[theme_path] = super().create_new_theme(theme_path)
+        return SharedThemeManager.themes[theme_path]
+
 
 class Screen(ABC):
     def __init__(self) -> NoReturn:
@@ -21,15 +68,32 @@ class Screen(ABC):
     def control(self, events: list[Event]) -> bool:
         pass
 
+    def suspend(self) -> list[str]:
+        """Экран уходит в фон (см. Session). Возвращает файлы, после изменения которых его нельзя продолжить."""
+        return []
+
+    def resume(self) -> NoReturn:
+        """Экран возвращается из фона; окно за это время могло поменять размер."""
+        self.surface = pg.display.set_mode(config.screen_size, pg.RESIZABLE)
+        if hasattr(self, 'ui_manager'):
+            self.ui_manager.set_window_resolution(self.surface.get_size())
+
+    def release(self) -> NoReturn:
+        """Приостановленный экран больше не понадобится: освободить то, что не освободит сборщик мусора."""
+
 
 class ScreenLoading(Screen):
     def control(self, events: list[Event]) -> bool:
         pass
 
-    def __init__(self):
+    def __init__(self, text: str = 'Загрузка...'):
         super().__init__()
         self.size: int = 100
         self.angle: int = 0
+        self.progress: float = 0.0
+        self.text: str = text
+        pg.font.init()
+        self.font: pg.font.Font = pg.font.SysFont('calibri', 16)
         self.rect: Rect = pg.Rect(self.surface.get_width() // 2 - self.size // 2, self.surface.get_height() // 2 - self.size // 2, self.size, self.size)
 
     def update(self) -> NoReturn:
@@ -38,9 +102,16 @@ class ScreenLoading(Screen):
         fon.fill(Color(255, 255, 255))
         fon = pg.transform.rotate(fon, self.angle)
 
-        self.surface.blit(fon, fon.get_rect(center=(self.surface.get_width() // 2, self.surface.get_height() // 2)))
+        center: tuple[int, int] = (self.surface.get_width() // 2, self.surface.get_height() // 2)
+        self.surface.blit(fon, fon.get_rect(center=center))
+
+        bar: Rect = pg.Rect(0, 0, self.surface.get_width() // 3, 12)
+        bar.center = (center[0], center[1] + self.size + 20)
+        pg.draw.rect(self.surface, Color(255, 255, 255), bar, width=1)
+        pg.draw.rect(self.surface, Color(255, 255, 255), (bar.x, bar.y, int(bar.w * min(self.progress, 1.0)), bar.h))
+
+        text: Surface = self.font.render(f'{self.text} {self.progress:.0%}', True, Color(255, 255, 255))
+        self.surface.blit(text, text.get_rect(center=(center[0], bar.bottom + 20)))
 
         self.angle = (self.angle - 1) % 360
         pg.display.update()
-        clock = pg.time.Clock()
-        clock.tick(120)
\ No newline at end of file
@@ -0,0 +1,156 @@
+import itertools
+import weakref
+from collections import defaultdict, OrderedDict
+from typing import NoReturn, Optional, Any, Callable, Hashable
+
+import pygame as pg
+from pygame import Surface, Color
+
+# сколько поверхностей SurfaceRegistry держит сверх тех, у которых есть владельцы
+WARM: int = 8
+
+
+class SurfaceRecord:
+    def __init__(self, kind: str, owner: str, path: Optional[str], size: tuple[int, int], bytesize: int) -> NoReturn:
+        self.kind: str = kind
+        self.owner: str = owner
+        self.path: Optional[str] = path
+        self.size: tuple[int, int] = size
+        self.bytes: int = size[0] * size[1] * bytesize
+
+
+def describe_owner(owner: Any) -> str:
+    if owner is None:
+        return '-'
+    if hasattr(owner, 'id'):
+        return f'{type(owner).__name__}#{owner.id}'
+    return type(owner).__name__
+
+
+class AssetLedger:
+    """Учёт памяти, занятой поверхностями ассетов (миниатюры, фоны игры, отрисованный текст)."""
+
+    # шрифт отчёта создаётся при первом показе: отчёт рисуется каждый кадр, пока он открыт
+    font: Optional[pg.font.Font] = None
+
+    def __new__(cls, *args, **kwargs):
+        if not hasattr(cls, 'instance'):
+            cls.instance = super(AssetLedger, cls).__new__(cls)
+        return cls.instance
+
+    def __init__(self) -> NoReturn:
+        if hasattr(self, '_records'):
+            return
+        self._records: dict[int, SurfaceRecord] = {}
+        self._keys = itertools.count()
+
+    def track(self, surface: Surface, owner: Any = None, path: Optional[str] = None, kind: str = 'image') -> Surface:
+        key: int = next(self._keys)
+        self._records[key] = SurfaceRecord(kind, describe_owner(owner), path, surface.get_size(), surface.get_bytesize())
+        weakref.finalize(surface, self._records.pop, key, None)
+        return surface
+
+    def records(self) -> list[SurfaceRecord]:
+        return list(self._records.values())
+
+    def total(self) -> int:
+        return sum(rec.bytes for rec in self._records.values())
+
+    def by_kind(self) -> dict[str, int]:
+        result: dict[str, int] = defaultdict(int)
+        for rec in self._records.values():
+            result[rec.kind] += rec.bytes
+        return dict(result)
+
+    def biggest(self, count: int = 10) -> list[SurfaceRecord]:
+        return sorted(self._records.values(), key=lambda rec: rec.bytes, reverse=True)[:count]
+
+    def duplicates(self) -> dict[tuple[str, str], list[SurfaceRecord]]:
+        """Один и тот же файл, декодированный в несколько поверхностей одного вида."""
+        groups: dict[tuple[str, str], list[SurfaceRecord]] = defaultdict(list)
+        for rec in self._records.values():
+            if rec.path is not None:
+                groups[(rec.kind, rec.path)].append(rec)
+        return {key: recs for key, recs in groups.items() if len(recs) > 1}
+
+    def report(self, count: int = 10) -> list[str]:
+        lines: list[str] = [f'Поверхностей: {len(self._records)}, всего {format_bytes(self.total())}']
+        shared: SurfaceRegistry = SurfaceRegistry()
+        lines.append(f'Общих поверхностей ассетов: {len(shared)}, декодировано файлов: {shared.decodes}')
+        lines += [f'  {kind}: {format_bytes(size)}' for kind, size in sorted(self.by_kind().items())]
+        lines.append('Крупнейшие:')
+        for rec in self.biggest(count):
+            lines.append(f'  {format_bytes(rec.bytes):>10} {rec.kind} {rec.size[0]}x{rec.size[1]} {rec.owner} {rec.path or ""}')
+        duplicates = self.duplicates()
+        if duplicates:
+            lines.append('Дубликаты:')
+            for (kind, path), recs in sorted(duplicates.items(), key=lambda item: -sum(r.bytes for r in item[1])):
+                wasted: int = sum(rec.bytes for rec in recs[1:])
+                lines.append(f'  {path} ({kind}) x{len(recs)}, лишние {format_bytes(wasted)}')
+        return lines
+
+    def draw_report(self, surface: Surface) -> NoReturn:
+        if AssetLedger.font is None:
+            AssetLedger.font = pg.font.SysFont('consolas', 14)
+        font: pg.font.Font = AssetLedger.font
+        lines: list[str] = self.report()
+        line_height: int = font.get_linesize()
+        hud = Surface((surface.get_width() // 2, line_height * len(lines) + 10)).convert_alpha()
+        hud.fill(Color(0, 0, 0, 180))
+        for i, line in enumerate(lines):
+            hud.blit(font.render(line, True, Color(255, 255, 255)), (5, 5 + i * line_height))
+        surface.blit(hud, (surface.get_width() - hud.get_width(), 0))
+
+
+class SurfaceRegistry:
+    """Общие декодированные поверхности ассетов: пока поверхность по ключу у кого-то жива, acquire отдаёт
+    её же, а не декодирует файл снова. Ссылки считает сам Python — запись исчезает вместе с последним
+    владельцем поверхности, так что отпускать поверхности вручную не нужно.
+
+    Поверхности, взятые с keep, держатся и без владельцев — последние WARM из них: фон, показанный перед
+    уходом в меню или редактор, при возврате в игру не декодируется снова."""
+
+    def __new__(cls, *args, **kwargs):
+        if not hasattr(cls, 'instance'):
+            cls.instance = super(SurfaceRegistry, cls).__new__(cls)
+        return cls.instance
+
+    def __init__(self) -> NoReturn:
+        if hasattr(self, '_surfaces'):
+            return
+        self._surfaces: weakref.WeakValueDictionary[Hashable, Surface] = weakref.WeakValueDictionary()
+        self.warm: OrderedDict[Hashable, Surface] = OrderedDict()
+        # сколько раз поверхность пришлось декодировать
+        self.decodes: int = 0
+
+    def __len__(self) -> int:
+        return len(self._surfaces)
+
+    def acquire(self, key: Hashable, load: Callable[[], Surface], keep: bool = False) -> Surface:
+        surface: Optional[Surface] = self._surfaces.get(key)
+        if surface is None:
+            surface = load()
+            self.decodes += 1
+            self._surfaces[key] = surface
+        if keep:
+            self.warm[key] = surface
+            self.warm.move_to_end(key)
+            if len(self.warm) > WARM:
+                self.warm.popitem(last=False)
+        return surface
+
+    def forget(self, kind: str) -> NoReturn:
+        """Забывает поверхности, ключи которых начинаются с kind: следующий acquire загрузит их заново."""
+        for key in [key for key in self._surfaces.keys() if isinstance(key, tuple) and key[:1] == (kind,)]:
+            self._surfaces.pop(key, None)
+        for key in [key for key in self.warm if isinstance(key, tuple) and key[:1] == (kind,)]:
+            del self.warm[key]
+
+
+def format_bytes(size: float) -> str:
+    for unit in ('Б', 'КБ', 'МБ'):
+        if size < 1024:
+            return f'{size:.1f} {unit}'
+        size /= 1024
+    return f'{size:.1f} ГБ'
+
@@ -0,0 +1,165 @@
+import json
+import os
+from typing import NoReturn, Optional, Final
+
+import pygame as pg
+from pygame import Surface, Rect
+
+from assets import AssetLedger, SurfaceRegistry
+
+ledger: Final[AssetLedger] = AssetLedger()
+registry: Final[SurfaceRegistry] = SurfaceRegistry()
+
+# файлы атласа в папке миниатюр
+SHEET: Final[str] = 'atlas.png'
+INDEX: Final[str] = 'atlas.json'
+# ширина листа; высота растёт удвоением
+WIDTH: int = 2048
+HEIGHT: int = 256
+# миниатюра хранится в одном размере — вписанной в квадрат CANONICAL с пропорциями ноды; миниатюры
+# других масштабов получаются из неё и в лист не пишутся. SLACK — допуск округления размеров ноды, пикселей
+CANONICAL: int = 240
+SLACK: int = 2
+
+Entry = tuple[int, int, int, int, int]
+
+
+def canonical_size(size: tuple[int, int]) -> tuple[int, int]:
+    """Размер миниатюры в листе для ноды размера size."""
+    k: float = CANONICAL / max(size[0], size[1], 1)
+    return max(1, round(size[0] * k)), max(1, round(size[1] * k))
+
+
+class MiniatureAtlas:
+    """Миниатюры всех картинок проекта в одном листе и индекс к нему: картинка -> прямоугольник миниатюры
+    на листе и отметка времени файла картинки. У картинки одна миниатюра канонического размера
+    (canonical_size): шаги масштаба её не переписывают, иначе каждый добавлял бы в лист новые. При открытии
+    проекта читаются два файла, а ноды получают подповерхности листа или их масштабированные копии.
+
+    Лист упаковывается полками: миниатюра кладётся на первую полку подходящей высоты, где хватает места,
+    иначе под полки добавляется новая. Место заменённых миниатюр освобождается перепаковкой — при замене
+    и при сохранении, — когда его становится больше, чем занятого."""
+
+    def __new__(cls, *args, **kwargs):
+        if not hasattr(cls, 'instance'):
+            cls.instance = super(MiniatureAtlas, cls).__new__(cls)
+        return cls.instance
+
+    def __init__(self) -> NoReturn:
+        if hasattr(self, 'entries'):
+            return
+        self.directory: Optional[str] = None
+        self.entries: dict[str, Entry] = {}
+        # полки: [верх, высота, занятая ширина]
+        self.shelves: list[list[int]] = []
+        self.sheet: Optional[Surface] = None
+        self.wasted: int = 0
+        self.dirty: bool = False
+
+    def open(self, directory: str) -> NoReturn:
+        """Читает атлас проекта; лист декодируется один раз и сразу."""
+        self.directory = directory
+        self.entries, self.shelves, self.sheet, self.wasted, self.dirty = {}, [], None, 0, False
+        try:
+            with open(f'{directory}/{INDEX}', encoding='utf-8') as file:
+                index: dict = json.load(file)
+            sheet: Surface = pg.image.load(f'{directory}/{SHEET}')
+        except (OSError, ValueError, pg.error):
+            return
+        if pg.display.get_surface() is not None:
+            # без окна (сжатие проекта из командной строки) лист остаётся в формате файла
+            sheet = sheet.convert()
+        self.sheet = ledger.track(sheet, self, f'{directory}/{SHEET}', 'miniature')
+        self.entries = {key: tuple(entry) for key, entry in index['entries'].items()}
+        self.shelves = index['shelves']
+        self.wasted = index.get('wasted', 0)
+
+    def get(self, path: str, size: tuple[int, int], stamp: int) -> Optional[Surface]:
+        """Каноническая миниатюра для ноды размера size или None, если её нет, у неё другие пропорции
+        или картинка с тех пор менялась."""
+        entry: Optional[Entry] = self.entries.get(path)
+        if entry is None or self.sheet is None or entry[4] != stamp:
+            return None
+        width, height = canonical_size(size)
+        if abs(entry[2] - width) > SLACK or abs(entry[3] - height) > SLACK:
+            return None
+        return self.sheet.subsurface(Rect(entry[:4]))
+
+    def put(self, path: str, stamp: int, miniature: Surface) -> Surface:
+        """Кладёт каноническую миниатюру вместо прежней миниатюры картинки."""
+        size: tuple[int, int] = miniature.get_size()
+        if path in self.entries:
+            self.drop(path)
+            if self.wasted > sum(entry[2] * entry[3] for entry in self.entries.values()):
+                # пустого места больше, чем занятого: перепаковка, а общие миниатюры на старом листе
+                # забываются, чтобы ноды при следующем запросе брали их с нового и старый лист освободился
+                self.repack()
+                registry.forget('miniature')
+        x, y = self.place(size)
+        self.sheet.blit(miniature, (x, y))
+        self.entries[path] = (x, y, size[0], size[1], stamp)
+        self.dirty = True
+        return self.sheet.subsurface(Rect(x, y, size[0], size[1]))
+
+    def drop(self, path: str) -> NoReturn:
+        """Место миниатюры остаётся в листе до перепаковки: ноды ещё могут показывать её подповерхность."""
+        entry: Entry = self.entries.pop(path)
+        self.wasted += entry[2] * entry[3]
+        self.dirty = True
+
+    def retain(self, paths: set[str]) -> NoReturn:
+        """Оставляет только миниатюры этих картинок."""
+        for path in [path for path in self.entries if path not in paths]:
+            self.drop(path)
+
+    def place(self, size: tuple[int, int]) -> tuple[int, int]:
+        w, h = size
+        for shelf in self.shelves:
+            top, height, used = shelf
+            if h <= height <= h + h // 4 and used + w <= WIDTH:
+                shelf[2] += w
+                return used, top
+        top: int = self.shelves[-1][0] + self.shelves[-1][1] if self.shelves else 0
+        self.shelves.append([top, h, w])
+        self.reserve(top + h)
+        return 0, top
+
+    def reserve(self, height: int) -> NoReturn:
+        """Лист не ниже height; растёт удвоением. Подповерхности старого листа у нод остаются верными."""
+        current: int = self.sheet.get_height() if self.sheet is not None else 0
+        if height <= current:
+            return
+        grown: int = max(HEIGHT, current)
+        while grown < height:
+            grown *= 2
+        sheet: Surface = Surface((WIDTH, grown))
+        if self.sheet is not None:
+            sheet.blit(self.sheet, (0, 0))
+        self.sheet = ledger.track(sheet, self, f'{self.directory}/{SHEET}', 'miniature')
+
+    def repack(self) -> NoReturn:
+        old: Surface = self.sheet
+        entries: dict[str, Entry] = self.entries
+        self.entries, self.shelves, self.sheet, self.wasted = {}, [], None, 0
+        for path, (x, y, w, h, stamp) in sorted(entries.items(), key=lambda item: -item[1][3]):
+            nx, ny = self.place((w, h))
+            self.sheet.blit(old, (nx, ny), (x, y, w, h))
+            self.entries[path] = (nx, ny, w, h, stamp)
+
+    def save(self, repack: bool = False) -> NoReturn:
+        """repack: перепаковать, если в листе есть хоть сколько-то пустого места."""
+        if not self.dirty or self.directory is None:
+            return
+        used: int = sum(entry[2] * entry[3] for entry in self.entries.values())
+        if self.wasted > used or repack and self.wasted:
+            self.repack()
+        os.makedirs(self.directory, exist_ok=True)
+        if self.sheet is not None:
+            # лист обрезается по нижней полке, чтобы не писать пустой запас
+            bottom: int = self.shelves[-1][0] + self.shelves[-1][1] if self.shelves else 1
+            pg.image.save(self.sheet.subsurface(Rect(0, 0, WIDTH, bottom)), f'{self.directory}/{SHEET}')
+        elif os.path.exists(f'{self.directory}/{SHEET}'):
+            os.remove(f'{self.directory}/{SHEET}')
+        with open(f'{self.directory}/{INDEX}', 'w', encoding='utf-8') as file:
+            json.dump({'entries': self.entries, 'shelves': self.shelves, 'wasted': self.wasted}, file)
+        self.dirty = False
@@ -0,0 +1,119 @@
+"""Микробенчмарки горячих путей редактора: python bench.py [имя ...]. Без имён запускаются все.
+
+Счётчика выделений памяти в CPython нет, поэтому выделения меряются tracemalloc: сколько байт
+сверх пустого вызова занимает вызов на пике. Ноль значит, что до аллокатора дело не дошло."""
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Callable, NoReturn, Final
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame as pg
+from pygame import Surface
+
+REPEAT: Final[int] = 200
+
+
+def allocated(call: Callable[[int], object], repeat: int = REPEAT) -> int:
+    """Пиковые байты одного вызова call(i) сверх пустого вызова, медиана по repeat вызовам."""
+
+    def peaks(target: Callable[[int], object]) -> list[int]:
+        result: list[int] = []
+        for i in range(repeat):
+            tracemalloc.reset_peak()
+            current: int = tracemalloc.get_traced_memory()[0]
+            target(i)
+            result.append(tracemalloc.get_traced_memory()[1] - current)
+        return result
+
+    call(0)
+    tracemalloc.start()
+    try:
+        empty: float = statistics.median(peaks(lambda i: None))
+        return max(0, round(statistics.median(peaks(call)) - empty))
+    finally:
+        tracemalloc.stop()
+
+
+def timed(call: Callable[[int], object], repeat: int = 20000) -> float:
+    """Микросекунд на вызов."""
+    call(0)
+    start: float = time.perf_counter()
+    for i in range(repeat):
+        call(i)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def report(name: str, call: Callable[[int], object], repeat: int = 20000) -> NoReturn:
+    print(f'{name:<28} {timed(call, repeat):>9.2f} мкс {allocated(call):>6} Б')
+
+
+def bench_set_pos() -> NoReturn:
+    """set_pos и сдвиг нод всех видов; у выбора — с разным числом ответов."""
+    from geometry import GeometryStore
+    from editor import ImageNode, VarNode, ConditionNode, ChoosenNode
+
+    store: GeometryStore = GeometryStore()
+    for name, node in (('ImageNode', ImageNode(store, (10, 10), is_mini_should=False)),
+                       ('VarNode', VarNode(store, (10, 10))),
+                       ('ConditionNode', ConditionNode(store, (10, 10)))):
+        report(f'{name}.set_pos', lambda i: node.set_pos((i, i)))
+    for count in (1, 10, 100):
+        choice: ChoosenNode = ChoosenNode(store, (10, 10), create_answer=False)
+        for _ in range(count):
+            choice.add_answer()
+        repeat: int = 200_000 // (count + 10)
+        report(f'ChoosenNode({count}).set_pos', lambda i: choice.set_pos((i, i)), repeat)
+        report(f'ChoosenNode({count}).shift', lambda i: choice.shift(1.0, 1.0), repeat)
+    answer = choice.answers[0]
+    report('Answer.set_pos', lambda i: answer.set_pos((i, i)))
+
+
+def bench_thumbnails() -> NoReturn:
+    """Миниатюра 120x67 из 4K-фона: прежний путь (полное декодирование, smoothscale, альфа-пелена)
+    против thumbnails. В скобках — разрешение, в котором картинка декодируется."""
+    import tempfile
+    import thumbnails
+
+    size: tuple[int, int] = (120, 67)
+
+    def legacy(path: str) -> Surface:
+        scale: Surface = pg.transform.smoothscale(pg.image.load(path), size)
+        fon: Surface = Surface(size).convert_alpha()
+        fon.fill(pg.Color(255, 255, 255, 100))
+        scale.blit(fon, fon.get_rect())
+        return scale
+
+    with tempfile.TemporaryDirectory() as directory:
+        path: str = f'{directory}/background.jpeg'
+        background: Surface = Surface((3840, 2160))
+        for x in range(0, 3840, 64):
+            pg.draw.line(background, (x % 256, x // 16 % 256, 128), (x, 0), (3840 - x, 2160), 40)
+        pg.image.save(background, path)
+        full: str = f'{background.get_width()}x{background.get_height()}'
+        cases: list[tuple[str, Callable[[int], object], str]] = [
+            ('прежний', lambda i: legacy(path), full),
+            ('pygame, два прохода', lambda i: thumbnails.decode_pygame(path, size), full)]
+        if thumbnails.Image is not None:
+            with thumbnails.Image.open(path) as image:
+                image.draft('RGB', (size[0] * thumbnails.ROUGH, size[1] * thumbnails.ROUGH))
+                reduced: str = f'{image.size[0]}x{image.size[1]}'
+            cases.append(('Pillow, draft', lambda i: thumbnails.decode_pillow(path, size), reduced))
+        for name, call, decoded in cases:
+            print(f'{name:<28} {timed(call, 10) / 1000:>9.2f} мс ({decoded})')
+
+
+BENCHES: Final[dict[str, Callable[[], NoReturn]]] = {
+    'set_pos': bench_set_pos,
+    'thumbnails': bench_thumbnails,
+}
+
+if __name__ == '__main__':
+    pg.init()
+    pg.display.set_mode((1, 1))
+    for bench in sys.argv[1:] or BENCHES:
+        print(f'--- {bench}')
+        BENCHES[bench]()
@@ -0,0 +1,189 @@
+import argparse
+import io
+import json
+import mmap
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import NoReturn, Optional, Final, Any, Callable
+
+import pygame as pg
+from pygame import Surface
+
+from assets import format_bytes
+from config import Config
+from editor import ProjectBuilder
+from loader import BackgroundLoader
+from project import Project, resolve_image
+from story import StoryNode, compile_story
+
+config: Final[Config] = Config()
+
+# расширение файла сборки
+SUFFIX: Final[str] = '.novel'
+# файлы внутри сборки: манифест пишется последним и указывает, где в архиве лежит каждая картинка
+MANIFEST: Final[str] = 'manifest.json'
+STORY: Final[str] = 'story.json'
+# версия формата сборки
+FORMAT: int = 1
+
+Size = tuple[int, int]
+
+
+def size_name(size: Size) -> str:
+    return f'{size[0]}x{size[1]}'
+
+
+def parse_size(text: str) -> Size:
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def prescale(source: str, size: Size) -> bytes:
+    """Фон, растянутый на экран size, как его показывает игра, в виде JPEG. Выполняется в рабочем процессе."""
+    image: Surface = pg.image.load(source)
+    if image.get_bitsize() not in (24, 32):
+        # smoothscale работает только с 24- и 32-битными поверхностями
+        full: Surface = Surface(image.get_size(), 0, 32)
+        full.blit(image, (0, 0))
+        image = full
+    if image.get_size() != size:
+        image = pg.transform.smoothscale(image, size)
+    buffer: io.BytesIO = io.BytesIO()
+    pg.image.save(image, buffer, 'background.jpeg')
+    return buffer.getvalue()
+
+
+class Export:
+    """Итог сборки: сколько экранов и картинок попало в файл и каких картинок не нашлось."""
+
+    def __init__(self, path: str) -> NoReturn:
+        self.path: str = path
+        self.screens: int = 0
+        self.images: int = 0
+        self.missing: list[str] = []
+
+    def summary(self) -> str:
+        result: str = (f'Собрано {self.path}: экранов {self.screens}, картинок {self.images}, '
+                       f'{format_bytes(os.path.getsize(self.path))}')
+        if self.missing:
+            result += f', не найдено картинок: {len(self.missing)}'
+        return result
+
+
+def export(path: str, target: Optional[str] = None, sizes: Optional[list[Size]] = None,
+           workers: Optional[int] = None, progress: Callable[[float], Any] = lambda value: None) -> Export:
+    """Собирает игру в один файл: скомпилированный граф экранов, фоны, заранее уменьшенные до разрешений
+    sizes (по умолчанию — экран игры), и манифест. Фоны перекодируются в пуле процессов; progress получает
+    долю уже записанных.
+
+    Сборка — zip-архив, в котором картинки хранятся без сжатия (JPEG и так сжат): манифест записывает
+    смещение и длину каждой, и игра читает их прямо из файла, ничего не распаковывая."""
+    config.set_root(path)
+    target = target or f'{path}/{os.path.basename(os.path.normpath(path))}{SUFFIX}'
+    sizes = sizes or [tuple(map(int, config.screen_size))]
+    project: Project = Project()
+    builder: ProjectBuilder = ProjectBuilder([(name, project.chapter_path(name)) for name in project.chapters
+                                              if os.path.exists(project.chapter_path(name))])
+    BackgroundLoader(builder.build).run_here()
+    if project.legacy:
+        project.initial = builder.initial
+    if project.initial in builder.records:
+        builder.records[project.initial].initial = True
+    story: dict[str, StoryNode] = compile_story(builder.records.values(), builder.arrows, project.links)
+
+    result: Export = Export(target)
+    result.screens = len(story)
+    # картинка ноды -> файл; ключом в сборке остаётся путь из ноды, как он записан в проекте
+    sources: dict[str, str] = {}
+    for node in story.values():
+        if node.path_image is None or node.path_image in sources:
+            continue
+        source: Optional[str] = resolve_image(node.path_image)
+        if source is None:
+            result.missing.append(node.path_image)
+        else:
+            sources[node.path_image] = source
+    result.images = len(sources)
+
+    # image -> разрешение -> [смещение, длина] в файле сборки
+    assets: dict[str, dict[str, list[int]]] = {}
+    temporary: str = f'{target}.{os.getpid()}.tmp'
+    with ProcessPoolExecutor(workers or config.import_workers,
+                             mp_context=multiprocessing.get_context('spawn')) as pool, \
+            open(temporary, 'wb') as file, zipfile.ZipFile(file, 'w') as archive:
+        jobs: list[tuple[str, Size, Future]] = [(image, size, pool.submit(prescale, source, size))
+                                                for image, source in sources.items()
+                                                for size in sizes]
+        for number, (image, size, job) in enumerate(jobs):
+            data: bytes = job.result()
+            archive.writestr(zipfile.ZipInfo(f'assets/{size_name(size)}/{number}.jpeg'), data)
+            # файл пишется подряд, без дескрипторов данных: данные записи кончаются там, где стоит файл
+            assets.setdefault(image, {})[size_name(size)] = [file.tell() - len(data), len(data)]
+            progress((number + 1) / len(jobs))
+        archive.writestr(STORY, json.dumps([node.__my_dict__() for node in story.values()], ensure_ascii=False),
+                         zipfile.ZIP_DEFLATED)
+        manifest: dict[str, Any] = {
+            'format': FORMAT,
+            'title': os.path.splitext(os.path.basename(target))[0],
+            'sizes': [list(size) for size in sizes],
+            'assets': assets
+        }
+        archive.writestr(MANIFEST, json.dumps(manifest, ensure_ascii=False), zipfile.ZIP_DEFLATED)
+    os.replace(temporary, target)
+    progress(1.0)
+    return result
+
+
+class Bundle:
+    """Собранная игра. Файл отображается в память целиком один раз; картинка экрана декодируется прямо
+    из своего участка архива."""
+
+    def __init__(self, path: str) -> NoReturn:
+        self.path: str = path
+        self.file = open(path, 'rb')
+        self.data: mmap.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        with zipfile.ZipFile(self.file) as archive:
+            manifest: dict[str, Any] = json.loads(archive.read(MANIFEST))
+            if manifest.get('format') != FORMAT:
+                raise ValueError(f'Сборка {path} другой версии: {manifest.get("format")}, нужна {FORMAT}')
+            story: list[dict[str, Any]] = json.loads(archive.read(STORY))
+        self.title: str = manifest['title']
+        self.sizes: list[Size] = [tuple(size) for size in manifest['sizes']]
+        self.assets: dict[str, dict[str, list[int]]] = manifest['assets']
+        self.story: dict[str, StoryNode] = {node['id']: StoryNode.load(node) for node in story}
+
+    def size_for(self, size: Size) -> Size:
+        """Разрешение сборки для экрана size: такое же, иначе наименьшее из крупных, иначе наибольшее."""
+        if size in self.sizes:
+            return size
+        larger: list[Size] = [s for s in self.sizes if s[0] >= size[0] and s[1] >= size[1]]
+        return min(larger) if larger else max(self.sizes)
+
+    def background(self, image: str, size: Size) -> Optional[Surface]:
+        """Фон экрана size или None, если картинки нет в сборке. Разрешение, под которое собрана игра,
+        не масштабируется вовсе."""
+        entry: Optional[dict[str, list[int]]] = self.assets.get(image)
+        if entry is None:
+            return None
+        stored: Size = self.size_for(size)
+        offset, length = entry[size_name(stored)]
+        surface: Surface = pg.image.load(io.BytesIO(self.data[offset:offset + length]), 'background.jpeg').convert()
+        if stored != size:
+            surface = pg.transform.scale(surface, size)
+        return surface
+
+    def close(self) -> NoReturn:
+        self.data.close()
+        self.file.close()
+
+
+if __name__ == '__main__':
+    # python bundle.py <папка проекта> [файл сборки] [--size 1280x720 ...]
+    parser = argparse.ArgumentParser()
+    parser.add_argument('project')
+    parser.add_argument('target', nargs='?')
+    parser.add_argument('--size', type=parse_size, action='append', help='разрешение фонов, например 1280x720')
+    args = parser.parse_args()
+    print(export(args.project, args.target, args.size).summary())
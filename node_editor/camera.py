@@ -0,0 +1,69 @@
+from typing import NoReturn
+
+from config import Tuple2D
+
+Rect4 = tuple[float, float, float, float]
+
+
+class Camera:
+    """Преобразование мировых координат (в которых сохраняется проект) в экранные: screen = world * scale + shift."""
+
+    MIN_SCALE: float = 0.05
+    MAX_SCALE: float = 8.0
+
+    def __init__(self) -> NoReturn:
+        self.scale: float = 1.0
+        self.shift: Tuple2D = (0.0, 0.0)
+
+    def is_identity(self) -> bool:
+        return self.scale == 1.0 and self.shift == (0.0, 0.0)
+
+    def move(self, delta: Tuple2D) -> NoReturn:
+        self.shift = (self.shift[0] + delta[0], self.shift[1] + delta[1])
+
+    def zoom(self, koef: float) -> float:
+        """Масштабирование относительно левого верхнего угла экрана; возвращает фактический коэффициент."""
+        scale: float = min(max(self.scale * koef, self.MIN_SCALE), self.MAX_SCALE)
+        koef = scale / self.scale
+        self.scale = scale
+        self.shift = (self.shift[0] * koef, self.shift[1] * koef)
+        return koef
+
+    def to_screen(self, point: Tuple2D) -> Tuple2D:
+        if self.is_identity():
+            return tuple(point)
+        return point[0] * self.scale + self.shift[0], point[1] * self.scale + self.shift[1]
+
+    def to_world(self, point: Tuple2D) -> Tuple2D:
+        return (point[0] - self.shift[0]) / self.scale, (point[1] - self.shift[1]) / self.scale
+
+    def size_to_screen(self, size: Tuple2D) -> Tuple2D:
+        if self.scale == 1.0:
+            return tuple(size)
+        return size[0] * self.scale, size[1] * self.scale
+
+    def size_to_world(self, size: Tuple2D) -> Tuple2D:
+        return size[0] / self.scale, size[1] / self.scale
+
+    def rect_to_screen(self, rect: Rect4) -> Rect4:
+        x, y = self.to_screen(rect[:2])
+        return x, y, rect[2] * self.scale, rect[3] * self.scale
+
+    def rect_to_world(self, rect: Rect4) -> Rect4:
+        x, y = self.to_world(rect[:2])
+        return x, y, rect[2] / self.scale, rect[3] / self.scale
+
+    def dict_to_world(self, data: dict) -> dict:
+        """Переводит в мировые координаты поля position/size сериализованного объекта и вложенных в него."""
+        if self.is_identity():
+            return data
+        if 'position' in data:
+            data['position'] = self.to_world(data['position'])
+        if isinstance(data.get('size'), (list, tuple)):
+            data['size'] = self.size_to_world(data['size'])
+        if isinstance(data.get('radius'), (int, float)):
+            data['radius'] = data['radius'] / self.scale
+        for value in data.values():
+            if isinstance(value, dict):
+                self.dict_to_world(value)
+        return data
@@ -0,0 +1,90 @@
+import os
+import shutil
+import sys
+import time
+from typing import NoReturn, Final, Optional
+
+from assets import format_bytes
+from atlas import MiniatureAtlas, SHEET, INDEX
+from config import Config
+from importer import NameIndex, NAMES
+from loader import iter_project
+from project import Project
+
+config: Final[Config] = Config()
+atlas: Final[MiniatureAtlas] = MiniatureAtlas()
+
+
+class Compaction:
+    """Итог сжатия: какие файлы убраны и сколько места освободилось в папках проекта."""
+
+    def __init__(self, archive: Optional[str]) -> NoReturn:
+        # папка, куда перенесены файлы, или None, если они удалены
+        self.archive: Optional[str] = archive
+        self.files: list[str] = []
+        self.reclaimed: int = 0
+
+    def summary(self) -> str:
+        action: str = f'перенесено в {self.archive}' if self.archive else 'удалено'
+        return f'Файлов {action}: {len(self.files)}, освобождено {format_bytes(self.reclaimed)}'
+
+
+def referenced_images(project: Project) -> set[str]:
+    """Картинки, на которые ссылаются ноды всех глав; файлы глав читаются потоком, без редактора."""
+    images: set[str] = set()
+    for name in project.chapters:
+        path: str = project.chapter_path(name)
+        if not os.path.exists(path):
+            continue
+        for key, value in iter_project(path):
+            if key == 'node' and value[1].get('image_path'):
+                images.add(value[1]['image_path'])
+    return images
+
+
+def compact(path: str, delete: bool = False) -> Compaction:
+    """Убирает из проекта загрузки, на которые не ссылается ни одна нода, миниатюры прежних версий
+    и миниатюры удалённых картинок в атласе. Без delete файлы переносятся в images/archive/<время>,
+    откуда их можно вернуть."""
+    config.set_root(path)
+    upload, mini = config.get_dir_upload(), config.get_dir_mini()
+    images: set[str] = referenced_images(Project())
+    # по именам файлов: загрузка остаётся и тогда, когда в ноде записан полный путь к ней
+    referenced: set[str] = {os.path.basename(image) for image in images}
+    archive: Optional[str] = None if delete else f'{path}/images/archive/{time.strftime("%Y%m%d-%H%M%S")}'
+    result: Compaction = Compaction(archive)
+
+    def discard(file: str, folder: str) -> NoReturn:
+        result.files.append(file)
+        result.reclaimed += os.path.getsize(file)
+        if archive is None:
+            os.remove(file)
+        else:
+            os.makedirs(f'{archive}/{folder}', exist_ok=True)
+            shutil.move(file, f'{archive}/{folder}/{os.path.basename(file)}')
+
+    if os.path.isdir(upload):
+        for entry in list(os.scandir(upload)):
+            if entry.is_file() and entry.name != NAMES and entry.name not in referenced:
+                discard(entry.path, 'upload')
+        names: NameIndex = NameIndex(upload)
+        if names.files:
+            names.files = {name: file for name, file in names.files.items() if file in referenced}
+            names.save()
+
+    if os.path.isdir(mini):
+        for entry in list(os.scandir(mini)):
+            if entry.is_file() and entry.name not in (SHEET, INDEX):
+                discard(entry.path, 'temp_mini')
+        sheet: str = f'{mini}/{SHEET}'
+        before: int = os.path.getsize(sheet) if os.path.exists(sheet) else 0
+        atlas.open(mini)
+        atlas.retain(images)
+        atlas.save(repack=True)
+        result.reclaimed += max(0, before - (os.path.getsize(sheet) if os.path.exists(sheet) else 0))
+    return result
+
+
+if __name__ == '__main__':
+    # python compact.py <папка проекта> [--delete]
+    print(compact(sys.argv[1], '--delete' in sys.argv[2:]).summary())
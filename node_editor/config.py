@@ -1,9 +1,16 @@
 import os
 import sys
-from typing import Optional, NoReturn
+from typing import Optional, NoReturn, Final
+
+from tracing import Tracer
 
 Tuple2D = tuple[float, float]
 
+tracer: Final[Tracer] = Tracer()
+
+# манифест проекта, разбитого на главы
+MANIFEST: Final[str] = 'project.json'
+
 
 def resource_path(relative):
     if hasattr(sys, "_MEIPASS"):
@@ -18,14 +25,27 @@ class Config:
         return cls.instance
 
     def __init__(self) -> NoReturn:
+        # модули экранов импортируются лениво, уже после выбора папки игры: повторный Config() её не сбрасывает
+        if hasattr(self, '_path'):
+            return
         self.screen_size: Tuple2D = (1280, 720)
+        # предел памяти истории отмены, байт
+        self.undo_limit: int = 16 * 1024 * 1024
+        # наибольший размер картинки в игре: крупные при импорте уменьшаются до него
+        self.max_image_size: tuple[int, int] = (1920, 1080)
+        # процессы пакетного импорта картинок
+        self.import_workers: int = os.cpu_count() or 1
         self._path: Optional[str] = ''
         self._game_file: Optional[str] = None
 
+    @tracer.trace('Config.set_root')
     def set_root(self, path: str) -> NoReturn | str:
 
         def _fing_json() -> str:
-            for file in os.listdir(path):
+            files: list[str] = os.listdir(path)
+            if MANIFEST in files:
+                return MANIFEST
+            for file in files:
                 if file.endswith('.json'):
                     return file
 
@@ -43,6 +63,12 @@ class Config:
     def get_file_game(self) -> str:
         return f'{self._path}/{self._game_file}'
 
+    def set_game_file(self, name: str) -> NoReturn:
+        self._game_file = name
+
+    def is_manifest(self) -> bool:
+        return self._game_file == MANIFEST
+
     def get_dir_upload(self) -> str:
         return f'{self._path}/images/upload'
 
@@ -0,0 +1,221 @@
+import re
+from collections import Counter, defaultdict, deque
+from enum import Enum
+from typing import NoReturn, Optional, Iterable, Callable
+
+# тексты, которые собирают VarBox и ConditionBox: «имя операция значение»
+VAR_TEXT: re.Pattern = re.compile(r'\w+ (=|\+=|-=) \S+')
+CONDITION_TEXT: re.Pattern = re.compile(r'\w+ (==|>|<) \S+')
+
+
+class Problem(Enum):
+    unreachable = 'недостижима от начальной'
+    dead_end = 'экран-тупик'
+    empty_answer = 'ответ без перехода'
+    missing_image = 'нет файла изображения'
+    bad_text = 'неверный текст'
+    no_initial = 'нет начальной ноды'
+    many_initial = 'несколько начальных нод'
+
+
+class NodeFacts:
+    """То, что проверке нужно знать о ноде: проверка не зависит от классов редактора."""
+
+    __slots__ = ('id', 'screen', 'answers', 'initial', 'path_image', 'text', 'text_format')
+
+    def __init__(self, node_id: str, screen: bool = False, answers: tuple[str, ...] = (), initial: bool = False,
+                 path_image: Optional[str] = None, text: str = '', text_format: Optional[re.Pattern] = None) -> NoReturn:
+        self.id: str = node_id
+        self.screen: bool = screen
+        self.answers: tuple[str, ...] = answers
+        self.initial: bool = initial
+        self.path_image: Optional[str] = path_image
+        self.text: str = text
+        self.text_format: Optional[re.Pattern] = text_format
+
+
+class StoryChecker:
+    """Инкрементальная проверка сюжета. Хранит степени нод и множество достижимых от начальной нод
+    и при каждой правке пересчитывает только затронутое: добавленная стрелка расширяет достижимость
+    обходом от своего конца, удалённая — перепроверяет только ноды, которые были достижимы через неё.
+    Проблемы собственные у каждой ноды пересчитываются, только когда меняется она или её стрелки."""
+
+    def __init__(self, image_exists: Callable[[str], bool]) -> NoReturn:
+        self.image_exists: Callable[[str], bool] = image_exists
+        self.facts: dict[str, NodeFacts] = {}
+        # ответ -> его нода выбора: стрелка из ответа для достижимости — стрелка из ноды
+        self.parent: dict[str, str] = {}
+        self.succ: defaultdict[str, Counter[str]] = defaultdict(Counter)
+        self.pred: defaultdict[str, Counter[str]] = defaultdict(Counter)
+        # число стрелок из каждой ноды и каждого ответа
+        self.out: Counter[str] = Counter()
+        # корни достижимости: начальные ноды и концы связей из ещё не загруженных глав
+        self.initial: set[str] = set()
+        self.entries: set[str] = set()
+        self.reachable: set[str] = set()
+        self.local: dict[str, set[Problem]] = {}
+        # растёт при каждом изменении результата — по нему редактор обновляет подсветку
+        self.version: int = 0
+
+    def node_of(self, node_id: str) -> str:
+        return self.parent.get(node_id, node_id)
+
+    def roots(self) -> set[str]:
+        return (self.initial | self.entries) & self.facts.keys()
+
+    # --- достижимость
+
+    def spread(self, start: Iterable[str]) -> NoReturn:
+        queue: deque[str] = deque(node for node in start if node not in self.reachable)
+        self.reachable.update(queue)
+        while queue:
+            node: str = queue.popleft()
+            for child in self.succ[node]:
+                if child not in self.reachable:
+                    self.reachable.add(child)
+                    queue.append(child)
+
+    def recompute(self) -> NoReturn:
+        self.reachable = set()
+        self.spread(self.roots())
+        self.version += 1
+
+    def retract(self, node: str) -> NoReturn:
+        """node, возможно, перестала быть достижимой: снимаются все ноды, достижимые через неё,
+        и возвращаются те из них, у которых остался достижимый предшественник вне снятых."""
+        roots: set[str] = self.roots()
+        if node not in self.reachable or node in roots:
+            return
+        affected: set[str] = {node}
+        queue: deque[str] = deque([node])
+        while queue:
+            for child in self.succ[queue.popleft()]:
+                if child in self.reachable and child not in affected and child not in roots:
+                    affected.add(child)
+                    queue.append(child)
+        self.reachable -= affected
+        self.spread(child for child in affected if any(parent in self.reachable for parent in self.pred[child]))
+
+    # --- правки
+
+    def load(self, facts: Iterable[NodeFacts], edges: Iterable[tuple[str, str]]) -> NoReturn:
+        """Добавление загруженных нод и стрелок разом: достижимость считается один раз в конце."""
+        for node in facts:
+            self.put(node)
+        for start, end in edges:
+            self.link(start, end)
+        self.recompute()
+        for node_id in self.facts:
+            self.check(node_id)
+
+    def put(self, node: NodeFacts) -> NoReturn:
+        previous: Optional[NodeFacts] = self.facts.get(node.id)
+        if previous is not None:
+            for answer in set(previous.answers) - set(node.answers):
+                self.parent.pop(answer, None)
+        self.facts[node.id] = node
+        for answer in node.answers:
+            self.parent[answer] = node.id
+        if node.initial:
+            self.initial.add(node.id)
+        else:
+            self.initial.discard(node.id)
+
+    def link(self, start: str, end: str) -> NoReturn:
+        self.out[start] += 1
+        source: str = self.node_of(start)
+        self.succ[source][end] += 1
+        self.pred[end][source] += 1
+
+    def set_node(self, node: NodeFacts) -> NoReturn:
+        was_initial: bool = node.id in self.initial
+        self.put(node)
+        if was_initial != node.initial:
+            self.recompute()
+        self.check(node.id)
+        self.version += 1
+
+    def remove_node(self, node_id: str) -> NoReturn:
+        """Стрелки ноды к этому моменту уже удалены через remove_edge."""
+        node: Optional[NodeFacts] = self.facts.pop(node_id, None)
+        if node is None:
+            return
+        for answer in node.answers:
+            self.parent.pop(answer, None)
+            self.out.pop(answer, None)
+        for table in (self.succ, self.pred, self.out, self.local):
+            table.pop(node_id, None)
+        self.reachable.discard(node_id)
+        if node_id in self.initial:
+            self.initial.discard(node_id)
+            self.recompute()
+        self.version += 1
+
+    def set_entries(self, entries: set[str]) -> NoReturn:
+        if entries != self.entries:
+            self.entries = entries
+            self.recompute()
+
+    def add_edge(self, start: str, end: str) -> NoReturn:
+        self.link(start, end)
+        if self.node_of(start) in self.reachable:
+            self.spread((end,))
+        self.check(self.node_of(start))
+        self.version += 1
+
+    def remove_edge(self, start: str, end: str) -> NoReturn:
+        source: str = self.node_of(start)
+        self.out[start] -= 1
+        for table, key, value in ((self.succ, source, end), (self.pred, end, source)):
+            table[key][value] -= 1
+            if table[key][value] <= 0:
+                del table[key][value]
+        if end not in self.succ[source]:
+            self.retract(end)
+        self.check(source)
+        self.version += 1
+
+    # --- проблемы
+
+    def check(self, node_id: str) -> NoReturn:
+        node: Optional[NodeFacts] = self.facts.get(node_id)
+        if node is None:
+            return
+        problems: set[Problem] = set()
+        if node.screen and not self.succ[node_id]:
+            problems.add(Problem.dead_end)
+        if any(self.out[answer] <= 0 for answer in node.answers):
+            problems.add(Problem.empty_answer)
+        if node.path_image is not None and not self.image_exists(node.path_image):
+            problems.add(Problem.missing_image)
+        if node.text_format is not None and node.text_format.fullmatch(node.text) is None:
+            problems.add(Problem.bad_text)
+        if problems:
+            self.local[node_id] = problems
+        else:
+            self.local.pop(node_id, None)
+
+    def problems_of(self, node_id: str) -> set[Problem]:
+        problems: set[Problem] = set(self.local.get(node_id, ()))
+        if self.initial and node_id not in self.reachable:
+            problems.add(Problem.unreachable)
+        return problems
+
+    def flagged(self) -> list[str]:
+        """Ноды, у которых есть проблемы."""
+        unreachable: Iterable[str] = (self.facts.keys() - self.reachable) if self.initial else ()
+        return list(self.local.keys() | unreachable)
+
+    def global_problems(self) -> list[Problem]:
+        initial: set[str] = self.initial & self.facts.keys()
+        if not initial:
+            return [Problem.no_initial]
+        return [Problem.many_initial] if len(initial) > 1 else []
+
+    def summary(self) -> str:
+        counts: Counter[Problem] = Counter(problem for problems in self.local.values() for problem in problems)
+        if self.initial:
+            counts[Problem.unreachable] = len(self.facts) - len(self.reachable & self.facts.keys())
+        parts: list[str] = [problem.value for problem in self.global_problems()]
+        parts += [f'{problem.value}: {count}' for problem, count in counts.items() if count]
+        return ' · '.join(parts)
@@ -1,33 +1,54 @@
 import glob
-import json
+import multiprocessing
 import os
+import sys
 import time
 from abc import ABC, abstractmethod
-from enum import Enum
-from typing import NoReturn, Optional, Self, Any, Union, Final, TypeVar
+from collections import defaultdict
+from concurrent.futures import Future, ProcessPoolExecutor
+from enum import Enum, IntEnum
+from typing import NoReturn, Optional, Self, Any, Union, Final, TypeVar, Iterable, Hashable, TYPE_CHECKING
 
+import numpy as np
 import pygame as pg
 import pygame_gui
 from pygame import Surface, Color, Rect, Event
 from pygame import gfxdraw
-from pygame_gui.elements import UITextEntryBox, UIButton, UISelectionList
+from pygame_gui.elements import UITextEntryBox, UITextEntryLine, UIButton, UISelectionList, UIDropDownMenu
 
 from ImageLoad import ImageLoadApp
-from app import Screen
-from config import Config, Tuple2D, resource_path
+from app import Screen, ScreenLoading, SharedThemeManager, coalesce_motion
+from assets import AssetLedger, SurfaceRegistry
+from atlas import MiniatureAtlas, canonical_size
+from camera import Camera, Rect4
+from config import Config, Tuple2D
+from diagnostics import StoryChecker, NodeFacts, Problem, VAR_TEXT, CONDITION_TEXT
+import layout
+from geometry import GeometryStore
+from history import Command, Inverse, History
+from loader import BackgroundLoader, iter_project
+from minimap import Minimap
+from project import Project, Chapter
+from search import TextIndex
+import thumbnails
+from tracing import Tracer
+
+if TYPE_CHECKING:
+    # story импортирует этот модуль
+    from story import StoryCompiler, StoryNode, Playtest
 
 config: Final[Config] = Config()
+tracer: Final[Tracer] = Tracer()
+ledger: Final[AssetLedger] = AssetLedger()
+registry: Final[SurfaceRegistry] = SurfaceRegistry()
+atlas: Final[MiniatureAtlas] = MiniatureAtlas()
 
 pg.font.init()
 
 
-def create_miniature(in_path: str, size: Tuple2D = (120, 67)) -> None:
-    image = pg.image.load(f'{config.get_dir_upload()}/{in_path}')
-    scale = pg.transform.smoothscale(image, size)
-    fon = Surface(size).convert_alpha()
-    fon.fill(Color(255, 255, 255, 100))
-    scale.blit(fon, fon.get_rect())
-    pg.image.save(scale, f'{config.get_dir_mini()}/{in_path[: in_path.find(".")]}.jpeg')
+def create_miniature(in_path: str, size: tuple[int, int] = (120, 67)) -> Surface:
+    with tracer.span('create_miniature', path=in_path):
+        return thumbnails.miniature(f'{config.get_dir_upload()}/{in_path}', size)
 
 
 def draw_circle(surface: Surface, x: int, y: int, radius: int, color: Color) -> NoReturn:
@@ -39,13 +60,53 @@ def draw_line(surface: Surface, x1: int, y1: int, x2: int, y2: int, color: Color
     gfxdraw.line(surface, x1, y1, x2, y2, color)
 
 
+_colors: dict[tuple[int, int, int, int], Color] = {}
+
+
+def shared_color(r: int, g: int, b: int, a: int = 255) -> Color:
+    """Один объект Color на каждое значение цвета: цвета моделей не изменяются на месте, поэтому их можно делить."""
+    key: tuple[int, int, int, int] = (r, g, b, a)
+    color: Optional[Color] = _colors.get(key)
+    if color is None:
+        color = _colors[key] = Color(r, g, b, a)
+    return color
+
+
+CONNECTOR_COLOR: Final[Color] = shared_color(0, 0, 0)
+GROUP_COLOR: Final[Color] = shared_color(215, 215, 235)
+GROUP_BORDER: Final[Color] = shared_color(90, 90, 140)
+PROBLEM_COLOR: Final[Color] = shared_color(255, 140, 0)
+
+
+class Detail(IntEnum):
+    """Уровень детализации поля в зависимости от масштаба камеры: чем мельче ноды, тем меньше в них рисуется."""
+    points = 0      # точка на ноду, без стрелок
+    shapes = 1      # цветные прямоугольники и тонкие линии стрелок, без объектов нод
+    no_text = 2     # ноды целиком, но без подписей
+    full = 3
+
+    @staticmethod
+    def of_scale(scale: float) -> 'Detail':
+        if scale >= 0.6:
+            return Detail.full
+        if scale >= 0.3:
+            return Detail.no_text
+        if scale >= 0.12:
+            return Detail.shapes
+        return Detail.points
+
+
 class ISerialisable(ABC):
+    __slots__ = ()
+
     @abstractmethod
     def __my_dict__(self) -> dict[str, Any]:
         pass
 
 
 class Graphic(ISerialisable, ABC):
+    __slots__ = ('color',)
+
     def __init__(self, color: Color, position: Tuple2D) -> NoReturn:
         self.color: Color = color
         self.pos: Tuple2D = position
@@ -62,9 +123,7 @@ class Graphic(ISerialisable, ABC):
 
 
 class Figure(Graphic, ABC):
-    def __init__(self, color: Color, position: Tuple2D):
-        super().__init__(color, position)
-        self.geom: Any = None
+    __slots__ = ()
 
     def set_pos(self, position: Tuple2D) -> NoReturn:
         self.pos = position
@@ -76,24 +135,107 @@ class Figure(Graphic, ABC):
         pass
 
 
+class StoredFigure(Figure, ABC):
+    """Фигура, позиция и размер которой лежат в строке GeometryStore; рамка geom строится по ним."""
+
+    __slots__ = ('store', 'index')
+    border: int = 2
+
+    def __init__(self, store: GeometryStore, color: Color, position: Tuple2D) -> NoReturn:
+        self.store: GeometryStore = store
+        self.index: int = store.allocate(self, position)
+        store.paint(self.index, color)
+        super().__init__(color, position)
+
+    @property
+    def pos(self) -> Tuple2D:
+        return tuple(self.store.pos[self.index].tolist())
+
+    @pos.setter
+    def pos(self, position: Tuple2D) -> NoReturn:
+        # по числу: присваивание кортежа строке NumPy строит из него временный массив
+        pos: np.ndarray = self.store.pos
+        pos[self.index, 0] = position[0]
+        pos[self.index, 1] = position[1]
+
+    @property
+    def size(self) -> Tuple2D:
+        return tuple(self.store.size[self.index].tolist())
+
+    @size.setter
+    def size(self, size: Tuple2D) -> NoReturn:
+        store: np.ndarray = self.store.size
+        store[self.index, 0] = size[0]
+        store[self.index, 1] = size[1]
+
+    @property
+    def geom(self) -> Rect:
+        (x, y), (w, h) = self.pos, self.size
+        return pg.Rect(x - self.border, y - self.border, w + self.border * 2, h + self.border * 2)
+
+    @classmethod
+    def layout(cls, pos: Tuple2D, size: Tuple2D) -> dict[str, Tuple2D]:
+        """Точки крепления коннекторов (по имени атрибута) у фигуры с такими позицией и размером."""
+        return {}
+
+    def shift(self, dx: float, dy: float) -> NoReturn:
+        """Сдвиг на месте, без чтения позиции в кортеж и сборки новой."""
+        pos: np.ndarray = self.store.pos
+        pos[self.index, 0] += dx
+        pos[self.index, 1] += dy
+
+    def anchor(self, connector) -> Tuple2D:
+        for name, point in self.layout(self.pos, self.size).items():
+            if getattr(self, name) is connector:
+                return point
+
+    def take_row(self, index: int) -> NoReturn:
+        """Переезд в уже выделенную строку хранилища — строку записи, из которой материализована нода."""
+        self.store.pos[index] = self.store.pos[self.index]
+        self.store.size[index] = self.store.size[self.index]
+        self.store.color[index] = self.store.color[self.index]
+        self.store.release(self.index)
+        self.index = index
+        self.store.owners[index] = self
+
+    def release(self) -> NoReturn:
+        self.store.release(self.index)
+
+
 class Connector(Figure):
+    """Позиция коннектора не хранится, а вычисляется по фигуре-владельцу, когда нужна."""
+
+    __slots__ = ('is_receiver', 'node', 'mode')
+    size: int = 20
+
     def __init__(self, node, is_receiver: bool, mode: int = 0) -> NoReturn:
-        super().__init__(Color(0, 0, 0), (0, 0))
+        self.color: Color = CONNECTOR_COLOR
         self.is_receiver: bool = is_receiver
         self.node: Node = node
         self.mode: int = mode
-        self.size: int = 20
-        self.geom: Rect = pg.Rect(self.pos[0], self.pos[1], self.size, self.size)
 
-    def set_pos(self, position: Tuple2D) -> NoReturn:
-        self.pos = (position[0] - self.size / 2, position[1])
-        self.geom = pg.Rect(self.pos[0], self.pos[1], self.size, self.size)
+    @property
+    def pos(self) -> Tuple2D:
+        x, y = self.node.anchor(self)
+        return x - self.size / 2, y
+
+    @property
+    def geom(self) -> Rect:
+        x, y = self.pos
+        return pg.Rect(x, y, self.size, self.size)
 
     def draw(self, surface: Surface) -> NoReturn:
         pg.draw.rect(surface, self.color, self.geom)
 
+    def is_point_below(self, point: Tuple2D) -> bool:
+        # те же границы, что у pg.Rect: координаты усекаются до целых
+        x, y = self.pos
+        x, y = int(x), int(y)
+        return x <= point[0] < x + self.size and y <= point[1] < y + self.size
+
     def get_center(self) -> Tuple2D:
-        return self.pos[0] + self.size // 2, self.pos[1] + self.size // 2
+        x, y = self.pos
+        return x + self.size // 2, y + self.size // 2
 
     def __my_dict__(self) -> dict[str, Any]:
         _dict = super().__my_dict__()
@@ -104,8 +246,15 @@ class Connector(Figure):
 
 
 class IText(ISerialisable, ABC):
+    __slots__ = ()
+    font: Optional[pg.font.Font] = None
+    # подписи не рисуются, когда поле слишком мелкое, чтобы их прочитать (см. Detail)
+    hidden: bool = False
+    empty: Optional[Surface] = None
+
     def __init__(self, text: str = '') -> NoReturn:
         self.text: str = text
+        self._rendered: Optional[tuple[str, Surface]] = None
 
     def set_text(self, text: str) -> NoReturn:
         self.text = text
@@ -116,27 +265,43 @@ class IText(ISerialisable, ABC):
         }
 
     def render_text(self) -> Surface:
-        text: str = self.text if len(self.text) <= 12 else self.text[:10] + '...'
-        f1 = pg.font.SysFont('consolas', 16)
+        if IText.hidden:
+            if IText.empty is None:
+                IText.empty = Surface((0, 0))
+            return IText.empty
+        if self._rendered is not None and self._rendered[0] == self.text:
+            return self._rendered[1]
+        if IText.font is None:
+            IText.font = pg.font.SysFont('consolas', 16)
 
-        return f1.render(text, True, (0, 0, 0))
+        text: str = self.text if len(self.text) <= 12 else self.text[:10] + '...'
+        rendered: Surface = ledger.track(IText.font.render(text, True, (0, 0, 0)), self, kind='text')
+        self._rendered = (self.text, rendered)
+        return rendered
 
 
 Text = TypeVar("Text", bound=IText)
 
 
-class Node(Figure, ABC):
-    id: int = 0
+class Node(StoredFigure, ABC):
+    __slots__ = ('connector1', 'connector2', 'choosen', 'initial', 'chapter', 'id')
+    next_id: int = 0
 
-    def __init__(self, position: Tuple2D, color: Color = Color(255, 255, 255)) -> NoReturn:
-        super().__init__(color, position)
+    def __init__(self, store: GeometryStore, position: Tuple2D, color: Color = Color(255, 255, 255)) -> NoReturn:
+        super().__init__(store, color, position)
         self.connector1: Connector = Connector(self, True)
         self.connector2: Connector = Connector(self, False)
         self.choosen: bool = False
         self.initial: bool = False
+        self.chapter: Optional[str] = None
         # self.set_pos(position)
-        self.id: int = Node.id
-        Node.id += 1
+        self.id: int = Node.next_id
+        Node.next_id += 1
+
+    @classmethod
+    def layout(cls, pos: Tuple2D, size: Tuple2D) -> dict[str, Tuple2D]:
+        (x, y), (w, h) = pos, size
+        return {'connector1': (x + w // 2, y - Connector.size), 'connector2': (x + w // 2, y + h)}
 
     def __my_dict__(self) -> dict[str, Any]:
         _dict = super().__my_dict__()
@@ -155,26 +320,39 @@ class Node(Figure, ABC):
 
 
 class CircleNode(Node):
-    def __init__(self, position: Tuple2D, radius: float, color: Color = Color(255, 255, 255)) -> NoReturn:
-        super().__init__(position, color)
-        self.radius: float = radius
-        self.set_pos(position)
+    __slots__ = ()
+    node_type: int = 1
+
+    def __init__(self, store: GeometryStore, position: Tuple2D, radius: float,
+                 color: Color = Color(255, 255, 255)) -> NoReturn:
+        super().__init__(store, position, color)
+        self.radius = radius
+
+    @property
+    def radius(self) -> float:
+        return float(self.store.size[self.index][0])
+
+    @radius.setter
+    def radius(self, radius: float) -> NoReturn:
+        self.store.size[self.index] = (radius, radius)
 
     def draw(self, surface: Surface) -> NoReturn:
         # pg.draw.circle(surface, self.color, self.pos, self.radius)
+        x, y = self.pos
         self.connector1.draw(surface)
         self.connector2.draw(surface)
-        draw_circle(surface, int(self.pos[0]), int(self.pos[1]), int(self.radius), self.color)
+        draw_circle(surface, int(x), int(y), int(self.radius), self.color)
         if self.choosen:
-            gfxdraw.aacircle(surface, int(self.pos[0]), int(self.pos[1]), int(self.radius), Color(255, 0, 0))
+            gfxdraw.aacircle(surface, int(x), int(y), int(self.radius), Color(255, 0, 0))
 
-    def set_pos(self, position: Tuple2D) -> NoReturn:
-        super().set_pos(position)
-        self.connector1.set_pos((position[0], position[1] - self.radius - self.connector1.size + 1))
-        self.connector2.set_pos((position[0], position[1] + self.radius))
+    @classmethod
+    def layout(cls, pos: Tuple2D, size: Tuple2D) -> dict[str, Tuple2D]:
+        (x, y), radius = pos, size[0]
+        return {'connector1': (x, y - radius - Connector.size + 1), 'connector2': (x, y + radius)}
 
     def is_point_below(self, point: Tuple2D) -> bool:
-        return ((self.pos[0] - point[0]) ** 2 + (self.pos[1] - point[1]) ** 2) ** 0.5 <= self.radius
+        x, y = self.pos
+        return ((x - point[0]) ** 2 + (y - point[1]) ** 2) ** 0.5 <= self.radius
 
     def get_center(self) -> Tuple2D:
         return self.pos
@@ -189,6 +367,8 @@ class CircleNode(Node):
 
 
 class I2Sized(ISerialisable, ABC):
+    __slots__ = ()
+
     def __init__(self, size: Tuple2D = (120, 67)) -> NoReturn:
         self.size: Tuple2D = size
 
@@ -205,13 +385,15 @@ Node2Sized = TypeVar("Node2Sized", bound=[Node, I2Sized])
 
 
 class ImageNode(Node, IText, I2Sized):
-    def __init__(self, position: Tuple2D, color: Color = Color(255, 255, 255), path_image: str = None,
-                 size: Tuple2D = (120, 67), centering: bool = True, is_mini_should: bool = True) -> NoReturn:
-        Node.__init__(self, position, color)
+    __slots__ = ('text', '_rendered', 'image_mini', 'path_image')
+    node_type: int = 2
+
+    def __init__(self, store: GeometryStore, position: Tuple2D, color: Color = Color(255, 255, 255),
+                 path_image: str = None, size: Tuple2D = (120, 67), centering: bool = True,
+                 is_mini_should: bool = True) -> NoReturn:
+        Node.__init__(self, store, position, color)
         IText.__init__(self)
         I2Sized.__init__(self, size)
-        self.geom: Rect = pg.Rect(self.pos[0] - 2, self.pos[1] - 2, self.size[0] + 4, self.size[1] + 4)
-        self.set_pos(position)
         if centering:
             self.set_pos(self.get_center())
 
@@ -223,29 +405,26 @@ class ImageNode(Node, IText, I2Sized):
                 self.replace_image(path_image, is_mini_should)
 
     def draw(self, surface: Surface) -> NoReturn:
+        (x, y), (w, h) = self.pos, self.size
         color: Color = self.color
         if self.choosen:
             color = Color(255, 0, 0)
         pg.draw.rect(surface, color, self.geom)
         if self.image_mini is not None:
-            surface.blit(self.image_mini, self.image_mini.get_rect(
-                center=(self.pos[0] + self.size[0] // 2, self.pos[1] + self.size[1] // 2)))
+            if self.image_mini.get_size() != (int(w), int(h)):
+                # после масштабирования миниатюра пересоздаётся, только когда нода попала на экран
+                self.refresh_miniature()
+            surface.blit(self.image_mini, self.image_mini.get_rect(center=(x + w // 2, y + h // 2)))
 
         text: Surface = self.render_text()
-        surface.blit(text, text.get_rect(center=(self.pos[0] + self.size[0] // 2, self.pos[1] + self.size[1] - 10)))
+        surface.blit(text, text.get_rect(center=(x + w // 2, y + h - 10)))
 
         self.connector1.draw(surface)
         self.connector2.draw(surface)
         if self.initial:
-            pg.draw.polygon(surface, color, ((self.pos[0] - 20, self.pos[1] + self.size[1] // 2 - 20),
-                                             (self.pos[0] - 20, self.pos[1] + self.size[1] // 2 + 20),
-                                             (self.pos[0], self.pos[1] + self.size[1] // 2)))
-
-    def set_pos(self, position: Tuple2D) -> NoReturn:
-        super().set_pos(position)
-        self.geom = pg.Rect(self.pos[0] - 2, self.pos[1] - 2, self.size[0] + 4, self.size[1] + 4)
-        self.connector1.set_pos((position[0] + self.size[0] // 2, position[1] - self.connector1.size))
-        self.connector2.set_pos((position[0] + self.size[0] // 2, position[1] + self.size[1]))
+            pg.draw.polygon(surface, color, ((x - 20, y + h // 2 - 20),
+                                             (x - 20, y + h // 2 + 20),
+                                             (x, y + h // 2)))
 
     def get_center(self) -> Tuple2D:
         return self.pos[0] - self.size[0] // 2, self.pos[1] - self.size[1] // 2
@@ -261,13 +440,27 @@ class ImageNode(Node, IText, I2Sized):
         return _dict
 
     def replace_image(self, path_image: str, is_mini_should: bool = True) -> NoReturn:
-        path_mini: str = f'{config.get_dir_mini()}/{path_image[: path_image.find(".")]}.jpeg'
+        self.path_image: str = path_image
         if is_mini_should:
-            if not os.path.exists(path_mini):
-                create_miniature(path_image, self.size)
+            self.refresh_miniature()
 
-            self.image_mini: Surface = pg.image.load(path_mini).convert()
-        self.path_image: str = path_image
+    def refresh_miniature(self) -> NoReturn:
+        """Миниатюра под текущий размер ноды — масштабированная из канонической миниатюры атласа, а если её
+        там нет или картинка с тех пор менялась, из новой, которая кладётся в атлас. Ноды с той же картинкой
+        того же размера делят одну поверхность."""
+        w, h = self.size
+        size: tuple[int, int] = (max(1, int(w)), max(1, int(h)))
+        stamp: int = os.stat(f'{config.get_dir_upload()}/{self.path_image}').st_mtime_ns
+
+        def load() -> Surface:
+            miniature: Optional[Surface] = atlas.get(self.path_image, size, stamp)
+            if miniature is None:
+                miniature = atlas.put(self.path_image, stamp, create_miniature(self.path_image, canonical_size(size)))
+            if miniature.get_size() == size:
+                return miniature
+            return ledger.track(pg.transform.smoothscale(miniature, size), self, self.path_image, 'miniature')
+
+        self.image_mini = registry.acquire(('miniature', self.path_image, size, stamp), load)
 
 
 # class InputBox(Figure):
@@ -293,37 +486,39 @@ class ImageNode(Node, IText, I2Sized):
 #         pass
 
 class VarNode(Node, IText, I2Sized):
-    def __init__(self, position: Tuple2D, color: Color = Color(255, 255, 255), size: Tuple2D = (120, 67),
-                 centering: bool = True) -> NoReturn:
-        Node.__init__(self, position, color)
+    __slots__ = ('text', '_rendered')
+    node_type: int = 4
+
+    def __init__(self, store: GeometryStore, position: Tuple2D, color: Color = Color(255, 255, 255),
+                 size: Tuple2D = (120, 67), centering: bool = True) -> NoReturn:
+        Node.__init__(self, store, position, color)
         IText.__init__(self)
         I2Sized.__init__(self, size)
         self.connector2 = None
-        self.geom: Rect = pg.Rect(self.pos[0] - 4, self.pos[1] - 4, self.size[0] + 8, self.size[1] + 8)
-        self.set_pos(position)
         if centering:
             self.set_pos(self.get_center())
 
+    @classmethod
+    def layout(cls, pos: Tuple2D, size: Tuple2D) -> dict[str, Tuple2D]:
+        (x, y), w = pos, size[0]
+        return {'connector1': (x + w // 2, y - Connector.size)}
+
     def draw(self, surface: Surface) -> NoReturn:
+        (x, y), (w, h) = self.pos, self.size
         color: Color = self.color
         if self.choosen:
             color = Color(255, 0, 0)
         pg.draw.rect(surface, color, self.geom)
-        pg.draw.rect(surface, Color(255, 255, 200), pg.Rect(self.pos[0], self.pos[1], self.size[0], self.size[1]))
+        pg.draw.rect(surface, Color(255, 255, 200), pg.Rect(x, y, w, h))
 
         text: Surface = self.render_text()
-        surface.blit(text, text.get_rect(center=(self.pos[0] + self.size[0] // 2, self.pos[1] + self.size[1] // 2)))
+        surface.blit(text, text.get_rect(center=(x + w // 2, y + h // 2)))
 
         self.connector1.draw(surface)
         if self.initial:
-            pg.draw.polygon(surface, color, ((self.pos[0] - 20, self.pos[1] + self.size[1] // 2 - 20),
-                                             (self.pos[0] - 20, self.pos[1] + self.size[1] // 2 + 20),
-                                             (self.pos[0], self.pos[1] + self.size[1] // 2)))
-
-    def set_pos(self, position: Tuple2D) -> NoReturn:
-        super().set_pos(position)
-        self.geom = pg.Rect(self.pos[0] - 2, self.pos[1] - 2, self.size[0] + 4, self.size[1] + 4)
-        self.connector1.set_pos((position[0] + self.size[0] // 2, position[1] - self.connector1.size))
+            pg.draw.polygon(surface, color, ((x - 20, y + h // 2 - 20),
+                                             (x - 20, y + h // 2 + 20),
+                                             (x, y + h // 2)))
 
     def get_center(self) -> Tuple2D:
         return self.pos[0] - self.size[0] // 2, self.pos[1] - self.size[1] // 2
@@ -339,44 +534,44 @@ class VarNode(Node, IText, I2Sized):
 
 
 class ConditionNode(Node, IText, I2Sized):
-    def __init__(self, position: Tuple2D, color: Color = Color(255, 255, 255), size: Tuple2D = (120, 67),
-                 centering: bool = True) -> NoReturn:
-        Node.__init__(self, position, color)
+    __slots__ = ('text', '_rendered', 'connector3')
+    node_type: int = 5
+
+    def __init__(self, store: GeometryStore, position: Tuple2D, color: Color = Color(255, 255, 255),
+                 size: Tuple2D = (120, 67), centering: bool = True) -> NoReturn:
+        Node.__init__(self, store, position, color)
         IText.__init__(self)
         I2Sized.__init__(self, size)
         self.connector2.mode = 1
         self.connector3: Connector = Connector(self, False, mode=2)
-        self.geom: Rect = pg.Rect(self.pos[0] - 4, self.pos[1] - 4, self.size[0] + 8, self.size[1] + 8)
-        self.set_pos(position)
         if centering:
             self.set_pos(self.get_center())
 
     def draw(self, surface: Surface) -> NoReturn:
+        (x, y), (w, h) = self.pos, self.size
         color: Color = self.color
         if self.choosen:
             color = Color(255, 0, 0)
         pg.draw.rect(surface, color, self.geom)
-        pg.draw.rect(surface, Color(200, 255, 200), pg.Rect(self.pos[0], self.pos[1], self.size[0], self.size[1]))
+        pg.draw.rect(surface, Color(200, 255, 200), pg.Rect(x, y, w, h))
 
         text: Surface = self.render_text()
-        surface.blit(text, text.get_rect(center=(self.pos[0] + self.size[0] // 2, self.pos[1] + self.size[1] // 2)))
+        surface.blit(text, text.get_rect(center=(x + w // 2, y + h // 2)))
 
         self.connector1.draw(surface)
         self.connector2.draw(surface)
         self.connector3.draw(surface)
         if self.initial:
-            pg.draw.polygon(surface, color, ((self.pos[0] - 20, self.pos[1] + self.size[1] // 2 - 20),
-                                             (self.pos[0] - 20, self.pos[1] + self.size[1] // 2 + 20),
-                                             (self.pos[0], self.pos[1] + self.size[1] // 2)))
+            pg.draw.polygon(surface, color, ((x - 20, y + h // 2 - 20),
+                                             (x - 20, y + h // 2 + 20),
+                                             (x, y + h // 2)))
 
-    def set_pos(self, position: Tuple2D) -> NoReturn:
-        super().set_pos(position)
-        self.geom = pg.Rect(self.pos[0] - 2, self.pos[1] - 2, self.size[0] + 4, self.size[1] + 4)
-        self.connector1.set_pos((position[0] + self.size[0] // 2, position[1] - self.connector1.size))
-        self.connector2.set_pos(
-            (position[0] - self.connector2.size // 2, position[1] + self.size[1] // 2 - self.connector2.size // 2))
-        self.connector3.set_pos(
-            (position[0] + self.size[0] + self.connector3.size // 2, position[1] + self.size[1] // 2 - self.connector3.size // 2))
+    @classmethod
+    def layout(cls, pos: Tuple2D, size: Tuple2D) -> dict[str, Tuple2D]:
+        (x, y), (w, h) = pos, size
+        return {'connector1': (x + w // 2, y - Connector.size),
+                'connector2': (x - Connector.size // 2, y + h // 2 - Connector.size // 2),
+                'connector3': (x + w + Connector.size // 2, y + h // 2 - Connector.size // 2)}
 
     def get_center(self) -> Tuple2D:
         return self.pos[0] - self.size[0] // 2, self.pos[1] - self.size[1] // 2
@@ -499,26 +694,45 @@ class EnumAction(Enum):
     add_answer_node = 'Добавить ответы'
     add_var_node = 'Добавить переменную'
     add_condition_node = 'Добавить условие'
+    move_to_chapter = 'В новую главу'
+    make_group = 'Сгруппировать'
+    collapse_group = 'Свернуть группу'
+    expand_group = 'Развернуть группу'
+    ungroup = 'Разгруппировать'
+    auto_layout = 'Разложить граф'
+    layout_around = 'Разложить соседей'
+    play_here = 'Играть отсюда'
 
 
 class ActionBar(Figure, I2Sized):
-    def __init__(self, color: Color, position: Tuple2D, node: Node) -> NoReturn:
+    def __init__(self, color: Color, position: Tuple2D, node: Node, extra: tuple[EnumAction, ...] = ()) -> NoReturn:
         Figure.__init__(self, color, position)
         I2Sized.__init__(self, (180, 60))
         self.node: Node | None = node
+        # действия, которые зависят не от ноды, а от состояния редактора (выделение, группы)
+        self.extra: tuple[EnumAction, ...] = extra
         self.geom: Rect = pg.Rect(self.pos[0], self.pos[1], self.size[0], self.size[1])
         self.task_selected: int = -1
 
     def _get_tasks(self) -> list[EnumAction]:
+        return self._get_node_tasks() + list(self.extra)
+
+    def _get_node_tasks(self) -> list[EnumAction]:
         if self.node is None:
-            return [EnumAction.add_image_node, EnumAction.add_answer_node, EnumAction.add_var_node, EnumAction.add_condition_node]
+            return [EnumAction.add_image_node, EnumAction.add_answer_node, EnumAction.add_var_node,
+                    EnumAction.add_condition_node, EnumAction.auto_layout]
+        if isinstance(self.node, GroupNode):
+            return [EnumAction.expand_group, EnumAction.replace_text]
         tasks: list[EnumAction] = [EnumAction.delete]
         if isinstance(self.node, IText):
             tasks.append(EnumAction.replace_text)
         if isinstance(self.node, Node):
             tasks.append(EnumAction.set_main)
+            tasks.append(EnumAction.move_to_chapter)
+            tasks.append(EnumAction.layout_around)
         if isinstance(self.node, ImageNode):
             tasks.append(EnumAction.import_image)
+            tasks.append(EnumAction.play_here)
         if isinstance(self.node, Answer):
             tasks.append(EnumAction.delete_answer)
         if isinstance(self.node, ConditionNode):
@@ -567,36 +781,31 @@ class ActionBar(Figure, I2Sized):
         pass
 
 
-class Answer(Figure, IText, I2Sized):
+class Answer(StoredFigure, IText, I2Sized):
+    __slots__ = ('text', '_rendered', 'node', 'connector2', 'id')
+    border: int = 0
+
     def __init__(self, position: Tuple2D, node, color: Color = Color(128, 128, 128)):
-        Figure.__init__(self, color, position)
+        StoredFigure.__init__(self, node.store, color, position)
         IText.__init__(self)
         I2Sized.__init__(self, (node.size[0], node.size[0] / 3))
         self.node: ChoosenNode = node
-        self.geom: Rect = pg.Rect(self.pos[0], self.pos[1], self.size[0], self.size[1])
         self.connector2: Connector = Connector(self, False)
-        self.id: int = Node.id
-        Node.id += 1
+        self.id: int = Node.next_id
+        Node.next_id += 1
 
-        self.set_pos(position)
-
-    def set_size(self, size: Tuple2D) -> NoReturn:
-        self.size: size
-        self.geom: Rect = pg.Rect(self.pos[0], self.pos[1], self.size[0], self.size[1])
-        self.set_pos(self.pos)
-
-    def set_pos(self, position: Tuple2D) -> NoReturn:
-        super().set_pos(position)
-        self.geom: Rect = pg.Rect(self.pos[0], self.pos[1], self.size[0], self.size[1])
-        self.connector2.set_pos((position[0] + self.size[0] + self.connector2.size // 2,
-                                 position[1] + self.size[1] // 2 - self.connector2.size // 2))
+    @classmethod
+    def layout(cls, pos: Tuple2D, size: Tuple2D) -> dict[str, Tuple2D]:
+        (x, y), (w, h) = pos, size
+        return {'connector2': (x + w + Connector.size // 2, y + h // 2 - Connector.size // 2)}
 
     def draw(self, surface: Surface) -> NoReturn:
+        (x, y), (w, h) = self.pos, self.size
         pg.draw.rect(surface, self.color, self.geom)
         self.connector2.draw(surface)
 
         text: Surface = self.render_text()
-        surface.blit(text, text.get_rect(center=(self.pos[0] + self.size[0] // 2, self.pos[1] + self.size[1] // 2)))
+        surface.blit(text, text.get_rect(center=(x + w // 2, y + h // 2)))
 
     def __my_dict__(self) -> dict[str, Any]:
         _dict = Figure.__my_dict__(self)
@@ -609,24 +818,30 @@ class Answer(Figure, IText, I2Sized):
 
 
 class ButtonAdd(Connector):
+    __slots__ = ()
+    size: int = 30
+
     def __init__(self, node):
         super().__init__(node, True)
-        self.size = 30
-        self.color = Color(0, 150, 0)
+        self.color = shared_color(0, 150, 0)
 
     def draw(self, surface: Surface) -> NoReturn:
         super().draw(surface)
+        x, y = self.pos
         pg.draw.rect(surface, Color(200, 200, 200),
-                     pg.Rect(self.pos[0] + self.size // 2 - 2, self.pos[1] + self.size // 2 - 12, 4, 24))
+                     pg.Rect(x + self.size // 2 - 2, y + self.size // 2 - 12, 4, 24))
         pg.draw.rect(surface, Color(200, 200, 200),
-                     pg.Rect(self.pos[0] + self.size // 2 - 12, self.pos[1] + self.size // 2 - 2, 24, 4))
+                     pg.Rect(x + self.size // 2 - 12, y + self.size // 2 - 2, 24, 4))
 
 
 class ChoosenNode(Node, I2Sized):
-    def __init__(self, position: Tuple2D, color: Color = Color(100, 100, 255), create_answer: bool = True) -> NoReturn:
-        Node.__init__(self, position, color)
+    __slots__ = ('button_add', 'answers')
+    node_type: int = 3
+
+    def __init__(self, store: GeometryStore, position: Tuple2D, color: Color = Color(100, 100, 255),
+                 create_answer: bool = True) -> NoReturn:
+        Node.__init__(self, store, position, color)
         I2Sized.__init__(self, (120, 0))
-        self.geom: Rect = pg.Rect(self.pos[0], self.pos[1], 0, 0)
         self.connector2 = None
         self.button_add: ButtonAdd = ButtonAdd(self)
 
@@ -646,28 +861,43 @@ class ChoosenNode(Node, I2Sized):
 
     def remove_answer(self, answer: Answer) -> NoReturn:
         self.answers.remove(answer)
+        answer.release()
         self.set_size((self.size[0], self.size[1] - answer.size[1] - 1))
 
+    @classmethod
+    def layout(cls, pos: Tuple2D, size: Tuple2D) -> dict[str, Tuple2D]:
+        (x, y), (w, h) = pos, size
+        return {'connector1': (x + w // 2, y - Connector.size), 'button_add': (x + w // 2, y + h + 2)}
+
     def set_pos(self, position: Tuple2D) -> NoReturn:
         super().set_pos(position)
-        self.geom = pg.Rect(self.pos[0] - 2, self.pos[1] - 2, self.size[0] + 4, self.size[1] + 4)
-        self.connector1.set_pos((position[0] + self.size[0] // 2, position[1] - self.connector1.size))
-        self.button_add.set_pos((position[0] + self.size[0] // 2, position[1] + self.size[1] + 2))
-
-        i = 0
-        for answer in self.answers:
-            shift: float = self.answers.index(answer) * self.size[0] / 3
-            answer.set_pos((position[0], position[1] + shift + i))
-            i += 1
+        # ответы идут столбиком: высота ответа — треть ширины ноды, между ответами 1 пиксель.
+        # Строки ответов пишутся прямо в хранилище, за один проход
+        x, y = position
+        pos: np.ndarray = self.store.pos
+        step: float = float(self.store.size[self.index, 0]) / 3 + 1
+        for i, answer in enumerate(self.answers):
+            pos[answer.index, 0] = x
+            pos[answer.index, 1] = y + i * step
+
+    def shift(self, dx: float, dy: float) -> NoReturn:
+        # перезапись столбика ответов дешевле, чем сдвиг каждой их строки на месте
+        x, y = self.pos
+        self.set_pos((x + dx, y + dy))
 
     def set_size(self, size: Tuple2D) -> NoReturn:
         self.size = size
-        self.geom = pg.Rect(self.pos[0] - 2, self.pos[1] - 2, self.size[0] + 4, self.size[1] + 4)
+        answer_size: Tuple2D = (size[0], size[0] / 3)
         for ans in self.answers:
-            ans.set_size((self.size[0], self.size[0] / 3))
+            ans.set_size(answer_size)
 
         self.set_pos(self.pos)
 
+    def release(self) -> NoReturn:
+        for answer in self.answers:
+            answer.release()
+        super().release()
+
     def draw(self, surface: Surface) -> NoReturn:
         color: Color = self.color
         if self.choosen:
@@ -697,10 +927,13 @@ class ChoosenNode(Node, I2Sized):
 
 
 class Arrow(Graphic):
+    __slots__ = ('pos', 'start', 'end', 'record')
+
     def __init__(self, first: Connector, second: Connector, color: Color = Color(0, 0, 0)) -> NoReturn:
         super().__init__(color, first.pos)
         self.start: Connector = first
         self.end: Connector | Tuple2D = second
+        self.record: Optional[ArrowRecord] = None
 
     def __eq__(self, other: Self) -> bool:
         return (self.start is other.start and (self.end == other.end or self.end is other.end)) or \
@@ -728,16 +961,18 @@ class Arrow(Graphic):
 
 
 class TextArrow(Arrow, IText):
+    __slots__ = ('text', '_rendered')
+
     def __init__(self, first: Connector, second: Connector, color: Color = Color(0, 0, 0), text: str = '') -> NoReturn:
         Arrow.__init__(self, first, second, color)
         IText.__init__(self, text)
 
         if first.mode == 1:
             self.text = 'Yes'
-            self.color = Color(0, 220, 0)
+            self.color = shared_color(0, 220, 0)
         elif first.mode == 2:
             self.text = 'No'
-            self.color = Color(220, 0, 0)
+            self.color = shared_color(220, 0, 0)
 
     def draw(self, surface: Surface) -> NoReturn:
         Arrow.draw(self, surface)
@@ -753,20 +988,617 @@ class TextArrow(Arrow, IText):
         return _dict
 
 
+class GroupNode(StoredFigure, IText):
+    """Группа нод. Развёрнутая группа — только рамка вокруг своих нод, её строка в хранилище спрятана.
+    Свёрнутая — одна нода со сводными входом и выходом для всех стрелок, ведущих в группу и из неё;
+    строки её нод спрятаны, и сами ноды остаются записями. В игру группы не попадают."""
+
+    __slots__ = ('text', '_rendered', 'id', 'members', 'collapsed', 'chapter', 'choosen', 'rows', 'incoming',
+                 'outgoing')
+    SIZE: Tuple2D = (160, 60)
+
+    def __init__(self, store: GeometryStore, position: Tuple2D, size: Tuple2D, members: list[str],
+                 color: Color = GROUP_COLOR, text: str = '') -> NoReturn:
+        StoredFigure.__init__(self, store, color, position)
+        IText.__init__(self, text)
+        self.size = size
+        self.members: list[str] = members
+        self.collapsed: bool = False
+        self.chapter: Optional[str] = None
+        self.choosen: bool = False
+        # строки хранилища нод свёрнутой группы: они двигаются вместе с ней
+        self.rows: np.ndarray = np.zeros(0, dtype=np.intp)
+        # число стрелок, входящих в свёрнутую группу и выходящих из неё
+        self.incoming: int = 0
+        self.outgoing: int = 0
+        self.id: int = Node.next_id
+        Node.next_id += 1
+
+    @classmethod
+    def layout(cls, pos: Tuple2D, size: Tuple2D) -> dict[str, Tuple2D]:
+        return Node.layout(pos, size)
+
+    def set_pos(self, position: Tuple2D) -> NoReturn:
+        if self.collapsed:
+            x, y = self.pos
+            self.store.pos[self.rows] += (position[0] - x, position[1] - y)
+        self.pos = position
+
+    def shift(self, dx: float, dy: float) -> NoReturn:
+        if self.collapsed:
+            self.store.pos[self.rows] += (dx, dy)
+        super().shift(dx, dy)
+
+    def get_center(self) -> Tuple2D:
+        return self.geom.center
+
+    def get_connector(self, pos: Tuple2D) -> Connector | bool:
+        return False
+
+    def draw(self, surface: Surface) -> NoReturn:
+        (x, y), (w, h) = self.pos, self.size
+        pg.draw.rect(surface, Color(255, 0, 0) if self.choosen else self.color, self.geom, border_radius=6)
+        pg.draw.rect(surface, GROUP_BORDER, self.geom, 2, border_radius=6)
+        # сводные коннекторы рисуются, только если в группу (из группы) действительно ведут стрелки
+        layout: dict[str, Tuple2D] = self.layout(self.pos, self.size)
+        for name, count in (('connector1', self.incoming), ('connector2', self.outgoing)):
+            if count:
+                cx, cy = layout[name]
+                pg.draw.rect(surface, CONNECTOR_COLOR, (cx - Connector.size / 2, cy, Connector.size, Connector.size))
+        text: Surface = self.render_text()
+        surface.blit(text, text.get_rect(center=(x + w // 2, y + h // 2)))
+
+    def draw_frame(self, surface: Surface, bbox: Rect4) -> NoReturn:
+        """Рамка развёрнутой группы вокруг прямоугольника её нод."""
+        x, y, w, h = bbox
+        frame: Rect = pg.Rect(x - 30, y - 50, w + 60, h + 100)
+        pg.draw.rect(surface, GROUP_BORDER, frame, 1, border_radius=6)
+        text: Surface = self.render_text()
+        surface.blit(text, (frame.x + 6, frame.y + 4))
+
+    def __my_dict__(self) -> dict[str, Any]:
+        _dict = Figure.__my_dict__(self)
+        _dict.update(IText.__my_dict__(self))
+        _dict.update({
+            'size': self.size,
+            'members': self.members,
+            'collapsed': self.collapsed
+        })
+        return _dict
+
+
+NODE_TYPES: Final[dict[int, type[Node]]] = {cls.node_type: cls for cls in
+                                            (CircleNode, ImageNode, ChoosenNode, VarNode, ConditionNode)}
+# типы нод, у которых есть свой текст (у ноды выбора тексты только у ответов)
+TEXT_TYPES: Final[frozenset[int]] = frozenset(cls.node_type for cls in NODE_TYPES.values() if issubclass(cls, IText))
+
+
+def color_tuple(color: Color) -> tuple[int, int, int, int]:
+    return color.r, color.g, color.b, color.a
+
+
+def connector_dict(anchor: Tuple2D) -> dict[str, Any]:
+    """Словарь коннектора, прикреплённого к точке anchor, как его сохраняет Connector.__my_dict__."""
+    return {
+        'color': color_tuple(CONNECTOR_COLOR),
+        'position': (anchor[0] - Connector.size / 2, anchor[1]),
+        'size': Connector.size
+    }
+
+
+class AnswerRecord:
+    __slots__ = ('id', 'text', 'color')
+
+    def __init__(self, answer_id: str, text: str, color: Color) -> NoReturn:
+        self.id: str = answer_id
+        self.text: str = text
+        self.color: Color = color
+
+
+class NodeRecord(ISerialisable):
+    """Лёгкая запись ноды: всё, что нужно для сохранения, поиска и игры, без коннекторов и поверхностей.
+    Позиция и размер лежат в строке GeometryStore; пока нода у экрана, node — её интерактивный объект."""
+
+    __slots__ = ('id', 'type', 'store', 'index', 'color', 'text', 'path_image', 'chapter', 'initial', 'answers', 'node')
+
+    def __init__(self, store: GeometryStore, index: int, node_id: str, node_type: int, color: Color,
+                 text: str = '', path_image: Optional[str] = None, answers: tuple[AnswerRecord, ...] = ()) -> NoReturn:
+        self.store: GeometryStore = store
+        self.index: int = index
+        store.owners[index] = self
+        store.paint(index, color)
+        self.id: str = node_id
+        self.type: int = node_type
+        self.color: Color = color
+        self.text: str = text
+        self.path_image: Optional[str] = path_image
+        self.chapter: Optional[str] = None
+        self.initial: bool = False
+        self.answers: tuple[AnswerRecord, ...] = answers
+        self.node: Optional[Node] = None
+
+    @staticmethod
+    def of(node: Node) -> 'NodeRecord':
+        """Запись для ноды, созданной в редакторе; строка хранилища остаётся за нодой."""
+        record: NodeRecord = NodeRecord(node.store, node.index, str(node.id), node.node_type, node.color)
+        record.sync(node)
+        record.node = node
+        node.store.owners[node.index] = node
+        return record
+
+    @property
+    def pos(self) -> Tuple2D:
+        return tuple(self.store.pos[self.index].tolist())
+
+    @property
+    def size(self) -> Tuple2D:
+        return tuple(self.store.size[self.index].tolist())
+
+    def ids(self) -> list[str]:
+        return [self.id] + [answer.id for answer in self.answers]
+
+    def sync(self, node: Node) -> NoReturn:
+        """Переносит в запись изменения, сделанные через интерактивную ноду."""
+        self.color = node.color
+        self.text = getattr(node, 'text', self.text)
+        self.path_image = getattr(node, 'path_image', None)
+        self.chapter = node.chapter
+        self.initial = node.initial
+        if isinstance(node, ChoosenNode):
+            self.answers = tuple(AnswerRecord(str(answer.id), answer.text, answer.color) for answer in node.answers)
+
+    def materialize(self, is_mini_should: bool = True) -> Node:
+        # конструкторы нод выдают новые id, а у материализуемой ноды id уже есть
+        next_id: int = Node.next_id
+        pos, size = self.pos, self.size
+        match self.type:
+            case CircleNode.node_type:
+                node = CircleNode(self.store, pos, size[0], self.color)
+            case ImageNode.node_type:
+                node = ImageNode(self.store, pos, self.color, self.path_image, size, centering=False,
+                                 is_mini_should=False)
+            case ChoosenNode.node_type:
+                node = ChoosenNode(self.store, pos, self.color, False)
+                node.size = size
+                for answer in self.answers:
+                    answer_obj: Answer = Answer(pos, node, answer.color)
+                    answer_obj.set_text(answer.text)
+                    answer_obj.id = int(answer.id)
+                    node.answers.append(answer_obj)
+                node.set_pos(pos)
+            case VarNode.node_type:
+                node = VarNode(self.store, pos, self.color, size, centering=False)
+            case _:
+                node = ConditionNode(self.store, pos, self.color, size, centering=False)
+        Node.next_id = next_id
+
+        if isinstance(node, IText):
+            node.text = self.text
+        node.id = int(self.id)
+        node.chapter = self.chapter
+        node.initial = self.initial
+        node.take_row(self.index)
+        # миниатюра грузится, когда у ноды уже есть её id: по нему поверхность учитывается в AssetLedger
+        if isinstance(node, ImageNode) and is_mini_should and self.path_image is not None and \
+                os.path.exists(f'{config.get_dir_upload()}/{self.path_image}'):
+            node.replace_image(self.path_image)
+        self.node = node
+        return node
+
+    def dematerialize(self) -> NoReturn:
+        node: Node = self.node
+        self.sync(node)
+        if isinstance(node, ChoosenNode):
+            for answer in node.answers:
+                answer.release()
+        self.store.owners[self.index] = self
+        self.node = None
+
+    def __my_dict__(self) -> dict[str, Any]:
+        """То же, что __my_dict__ ноды, но без создания её объектов."""
+        if self.node is not None:
+            return self.node.__my_dict__()
+        pos, size = self.pos, self.size
+        layout: dict[str, Tuple2D] = NODE_TYPES[self.type].layout(pos, size)
+        _dict: dict[str, Any] = {
+            'color': color_tuple(self.color),
+            'position': pos,
+            'connector1': connector_dict(layout['connector1']),
+            'connector2': connector_dict(layout['connector2']) if 'connector2' in layout else None
+        }
+        match self.type:
+            case CircleNode.node_type:
+                _dict.update({'type': self.type, 'radius': size[0]})
+            case ImageNode.node_type:
+                _dict.update({'text': self.text, 'size': size, 'type': self.type, 'image_path': self.path_image})
+            case ChoosenNode.node_type:
+                answers: dict[str, dict[str, Any]] = {}
+                for i, answer in enumerate(self.answers):
+                    # ответы раскладываются так же, как в ChoosenNode.set_pos
+                    answer_pos: Tuple2D = (pos[0], pos[1] + i * size[0] / 3 + i)
+                    answer_size: Tuple2D = (size[0], size[0] / 3)
+                    answers[answer.id] = {
+                        'color': color_tuple(answer.color),
+                        'position': answer_pos,
+                        'text': answer.text,
+                        'size': answer_size,
+                        'connector': connector_dict(Answer.layout(answer_pos, answer_size)['connector2'])
+                    }
+                _dict.update({'size': size, 'type': self.type, 'answers': answers})
+            case VarNode.node_type:
+                _dict.update({'text': self.text, 'size': size, 'type': self.type})
+            case ConditionNode.node_type:
+                _dict.update({'text': self.text, 'size': size, 'connector3': connector_dict(layout['connector3']),
+                              'type': self.type})
+        return _dict
+
+
+class ArrowRecord(ISerialisable):
+    """Стрелка между нодами по их id; arrow — её объект, пока обе ноды материализованы."""
+
+    __slots__ = ('start', 'end', 'color', 'position', 'text', 'arrow')
+
+    def __init__(self, start: str, end: str, color: Color, position: Tuple2D, text: Optional[str] = None) -> NoReturn:
+        self.start: str = start
+        self.end: str = end
+        self.color: Color = color
+        self.position: Tuple2D = position
+        self.text: Optional[str] = text
+        self.arrow: Optional[Arrow] = None
+
+    @staticmethod
+    def of(arrow: Arrow) -> 'ArrowRecord':
+        record: ArrowRecord = ArrowRecord(str(arrow.start.node.id), str(arrow.end.node.id), arrow.color, arrow.pos,
+                                          arrow.text if isinstance(arrow, TextArrow) else None)
+        record.arrow = arrow
+        arrow.record = record
+        return record
+
+    @staticmethod
+    def load(arrow: dict) -> 'ArrowRecord':
+        color, position = ProjectBuilder.recognition_graphic(arrow)
+        # id концов — те же объекты строк, что и id в записях нод, а не копии на каждую стрелку
+        return ArrowRecord(sys.intern(arrow['start']), sys.intern(arrow['end']), color, position, arrow.get('text'))
+
+    def materialize(self, start: Node | Answer, end: Node | Answer) -> Arrow:
+        if self.text is not None:
+            conn: Connector = start.connector2 if self.text == 'Yes' else start.connector3
+            arrow: Arrow = TextArrow(conn, end.connector1, self.color, self.text)
+        else:
+            arrow = Arrow(start.connector2, end.connector1, self.color)
+        arrow.pos = self.position
+        arrow.record = self
+        self.arrow = arrow
+        return arrow
+
+    def __my_dict__(self) -> dict[str, Any]:
+        if self.arrow is not None:
+            return self.arrow.__my_dict__()
+        _dict: dict[str, Any] = {
+            'color': color_tuple(self.color),
+            'position': self.position,
+            'start': self.start,
+            'end': self.end
+        }
+        if self.text is not None:
+            _dict['text'] = self.text
+        return _dict
+
+
+class MoveNodes(Command):
+    """Сдвиг нод и групп на мировой вектор; сдвиги одного перетаскивания сливаются в одну команду."""
+
+    __slots__ = ('ids', 'delta')
+
+    def __init__(self, ids: tuple[str, ...], delta: Tuple2D) -> NoReturn:
+        self.ids: tuple[str, ...] = ids
+        self.delta: Tuple2D = delta
+
+    def undo(self, editor: 'Editor') -> NoReturn:
+        editor.move_by(self.ids, (-self.delta[0], -self.delta[1]))
+
+    def redo(self, editor: 'Editor') -> NoReturn:
+        editor.move_by(self.ids, self.delta)
+
+    def merge(self, other: Command) -> bool:
+        if not isinstance(other, MoveNodes) or other.ids != self.ids:
+            return False
+        self.delta = (self.delta[0] + other.delta[0], self.delta[1] + other.delta[1])
+        return True
+
+
+class PlaceNodes(Command):
+    """Новые мировые позиции нод (раскладка графа) и прежние позиции этих же нод."""
+
+    __slots__ = ('before', 'after')
+
+    def __init__(self, before: dict[str, Tuple2D], after: dict[str, Tuple2D]) -> NoReturn:
+        self.before: dict[str, Tuple2D] = before
+        self.after: dict[str, Tuple2D] = after
+
+    def undo(self, editor: 'Editor') -> NoReturn:
+        editor.apply_layout(self.before)
+
+    def redo(self, editor: 'Editor') -> NoReturn:
+        editor.apply_layout(self.after)
+
+
+class AddNode(Command):
+    """Нода в том виде, в каком она пишется в файл главы, и её стрелки; удаление — Inverse(AddNode)."""
+
+    __slots__ = ('id', 'data', 'chapter', 'initial', 'group', 'arrows')
+
+    def __init__(self, node_id: str, data: dict, chapter: Optional[str], initial: bool, group: Optional[str],
+                 arrows: list[dict]) -> NoReturn:
+        self.id: str = node_id
+        self.data: dict = data
+        self.chapter: Optional[str] = chapter
+        self.initial: bool = initial
+        self.group: Optional[str] = group
+        self.arrows: list[dict] = arrows
+
+    def undo(self, editor: 'Editor') -> NoReturn:
+        editor.remove_node(self.id)
+
+    def redo(self, editor: 'Editor') -> NoReturn:
+        editor.restore_node(self.id, self.data, self.chapter, self.initial, self.group)
+        for arrow in self.arrows:
+            editor.restore_arrow(arrow)
+
+
+class AddArrows(Command):
+    __slots__ = ('arrows',)
+
+    def __init__(self, arrows: list[dict]) -> NoReturn:
+        self.arrows: list[dict] = arrows
+
+    def undo(self, editor: 'Editor') -> NoReturn:
+        for arrow in self.arrows:
+            editor.remove_arrow(arrow)
+
+    def redo(self, editor: 'Editor') -> NoReturn:
+        for arrow in self.arrows:
+            editor.restore_arrow(arrow)
+
+
+class AddAnswer(Command):
+    """Ответ ноды выбора с его местом среди ответов и стрелками из него."""
+
+    __slots__ = ('node', 'id', 'text', 'color', 'index', 'arrows')
+
+    def __init__(self, node_id: str, answer_id: str, text: str, color: tuple[int, int, int, int], index: int,
+                 arrows: list[dict]) -> NoReturn:
+        self.node: str = node_id
+        self.id: str = answer_id
+        self.text: str = text
+        self.color: tuple[int, int, int, int] = color
+        self.index: int = index
+        self.arrows: list[dict] = arrows
+
+    def undo(self, editor: 'Editor') -> NoReturn:
+        editor.remove_answer(self.id)
+
+    def redo(self, editor: 'Editor') -> NoReturn:
+        editor.insert_answer(self.node, self.id, self.text, self.color, self.index)
+        for arrow in self.arrows:
+            editor.restore_arrow(arrow)
+
+
+class SetText(Command):
+    __slots__ = ('id', 'before', 'after')
+
+    def __init__(self, key: str, before: str, after: str) -> NoReturn:
+        self.id: str = key
+        self.before: str = before
+        self.after: str = after
+
+    def undo(self, editor: 'Editor') -> NoReturn:
+        editor.set_text_of(self.id, self.before)
+
+    def redo(self, editor: 'Editor') -> NoReturn:
+        editor.set_text_of(self.id, self.after)
+
+
+class SetInitial(Command):
+    __slots__ = ('before', 'after')
+
+    def __init__(self, before: tuple[str, ...], after: tuple[str, ...]) -> NoReturn:
+        self.before: tuple[str, ...] = before
+        self.after: tuple[str, ...] = after
+
+    def undo(self, editor: 'Editor') -> NoReturn:
+        editor.set_initial(self.before)
+
+    def redo(self, editor: 'Editor') -> NoReturn:
+        editor.set_initial(self.after)
+
+
+class SetChapters(Command):
+    """Перенос нод и групп в другую главу: прежняя глава каждой и новая глава. created — глава создана
+    этим переносом: отмена удаляет её вместе с файлом, повтор создаёт заново."""
+
+    __slots__ = ('before', 'chapter', 'created')
+
+    def __init__(self, before: dict[str, str], chapter: str, created: bool = False) -> NoReturn:
+        self.before: dict[str, str] = before
+        self.chapter: str = chapter
+        self.created: bool = created
+
+    def undo(self, editor: 'Editor') -> NoReturn:
+        editor.set_chapters(self.before)
+        if self.created:
+            editor.remove_chapter(self.chapter)
+
+    def redo(self, editor: 'Editor') -> NoReturn:
+        if self.created:
+            editor.add_chapter(self.chapter)
+        editor.set_chapters(dict.fromkeys(self.before, self.chapter))
+
+
+class AddGroup(Command):
+    __slots__ = ('id', 'chapter', 'data')
+
+    def __init__(self, group_id: str, chapter: Optional[str], data: dict) -> NoReturn:
+        self.id: str = group_id
+        self.chapter: Optional[str] = chapter
+        self.data: dict = data
+
+    def undo(self, editor: 'Editor') -> NoReturn:
+        group: Optional[GroupNode] = editor.groups.get(self.id)
+        if group is not None:
+            editor.ungroup(group)
+
+    def redo(self, editor: 'Editor') -> NoReturn:
+        editor.restore_group(self.id, self.chapter, self.data)
+
+
+class FoldGroup(Command):
+    __slots__ = ('id', 'collapsed')
+
+    def __init__(self, group_id: str, collapsed: bool) -> NoReturn:
+        self.id: str = group_id
+        self.collapsed: bool = collapsed
+
+    def undo(self, editor: 'Editor') -> NoReturn:
+        editor.fold_group(self.id, not self.collapsed)
+
+    def redo(self, editor: 'Editor') -> NoReturn:
+        editor.fold_group(self.id, self.collapsed)
+
+
+class ProjectBuilder:
+    """Читает файлы глав потоково и собирает из них записи нод и стрелок; объекты редактора не создаются."""
+
+    def __init__(self, chapters: list[tuple[str, str]], camera: Optional[Camera] = None,
+                 store: Optional[GeometryStore] = None) -> NoReturn:
+        self.chapters: list[tuple[str, str]] = chapters
+        self.camera: Camera = camera if camera is not None else Camera()
+        self.store: GeometryStore = store if store is not None else GeometryStore()
+        self.records: dict[str, NodeRecord] = {}
+        self.arrows: list[ArrowRecord] = []
+        # группы редактора: (глава, id, словарь); игре они не нужны, и она их не читает
+        self.groups: list[tuple[str, str, dict]] = []
+        self.initial: Optional[str] = None
+        self.chapter: Optional[str] = None
+
+    @staticmethod
+    def recognition_graphic(graphic: dict) -> tuple[Color, Tuple2D]:
+        color: list[int] = graphic['color']
+        return shared_color(color[0], color[1], color[2], color[3]), tuple(graphic['position'])
+
+    @staticmethod
+    def keep_id(node_hash: str) -> NoReturn:
+        # id сохраняются между загрузками: на них ссылаются связи из других глав
+        Node.next_id = max(Node.next_id, int(node_hash) + 1)
+
+    def build(self, loader: BackgroundLoader) -> NoReturn:
+        for i, (name, path) in enumerate(self.chapters):
+            self.chapter = name
+            self.build_chapter(path, lambda value: loader.set_progress((i + value) / len(self.chapters)))
+
+    def build_chapter(self, path: str, progress) -> NoReturn:
+        for key, value in iter_project(path, progress):
+            match key:
+                case 'node':
+                    self.add_node(*value)
+                case 'arrow':
+                    self.arrows.append(ArrowRecord.load(value))
+                case 'initial':
+                    self.initial = str(value)
+                case 'groups':
+                    for group_hash, group in value.items():
+                        self.keep_id(group_hash)
+                        self.groups.append((self.chapter, sys.intern(group_hash), group))
+
+    def add_node(self, node_hash: str, node: dict) -> NoReturn:
+        c, p = self.recognition_graphic(node)
+        if node['type'] == CircleNode.node_type:
+            size: Tuple2D = (node['radius'] * self.camera.scale,) * 2
+        else:
+            size = self.camera.size_to_screen(node['size'])
+        index: int = self.store.allocate(None, self.camera.to_screen(p), size)
+
+        answers: list[AnswerRecord] = []
+        for ans_hash, answer in node.get('answers', {}).items():
+            answers.append(AnswerRecord(sys.intern(ans_hash), answer.get('text', ''), self.recognition_graphic(answer)[0]))
+            self.keep_id(ans_hash)
+
+        node_hash = sys.intern(node_hash)
+        record: NodeRecord = NodeRecord(self.store, index, node_hash, node['type'], c, node.get('text') or '',
+                                        node.get('image_path'), tuple(answers))
+        record.chapter = self.chapter
+        self.keep_id(node_hash)
+        self.records[node_hash] = record
+
+
 class Editor(Screen):
+    # запас вокруг экрана (в пикселях), в котором записи превращаются в интерактивные ноды;
+    # обратно — только за двойным запасом, чтобы ноды не пересоздавались при каждом сдвиге поля
+    MATERIALIZE_MARGIN: int = 200
+
     def __init__(self) -> NoReturn:
         super().__init__()
-        self.nodes: list[Node2Sized] = []
+        atlas.open(config.get_dir_mini())
+        # все ноды проекта — лёгкие записи; интерактивные объекты есть только у нод около экрана
+        self.records: dict[str, NodeRecord] = {}
+        self.answer_records: dict[str, NodeRecord] = {}
+        self.materialized: set[NodeRecord] = set()
+        self.is_mini_should: bool = True
+        self.view_dirty: bool = True
+        # все стрелки проекта (словарь как упорядоченное множество) и стрелки по id их концов
+        self.arrow_records: dict[ArrowRecord, None] = {}
+        self.incident: defaultdict[str, list[ArrowRecord]] = defaultdict(list)
+        self.arrows_version: int = 0
+        # объекты стрелок, оба конца которых материализованы
         self.arrows: list[Arrow] = []
         self.choosen_nodes: dict[Node2Sized, bool] = {}
+        # группы по id и группа каждой ноды по id ноды
+        self.groups: dict[str, GroupNode] = {}
+        self.group_of: dict[str, GroupNode] = {}
         self.choosen_arrow: Optional[Arrow] = None
         self.action_bar: Optional[ActionBar] = None
         self.action_bar_focus: bool = False
 
         self.image_app: ImageLoadApp = ImageLoadApp(self)
         self.load_input: bool = False
-
-        self.ui_manager = pygame_gui.UIManager(self.surface.get_size(), resource_path('theme.json'))
+        self.show_memory: bool = False
+
+        self.camera: Camera = Camera()
+        self.geometry: GeometryStore = GeometryStore()
+        self.minimap: Minimap = Minimap(self.geometry, self.camera)
+        # номера строк GeometryStore у начала и конца каждой стрелки, пересчитываются при изменении стрелок;
+        # стрелки, которые ведут в свёрнутые группы, лежат отдельно — по одной на каждую пару строк
+        self.arrow_rows: Optional[tuple[int, list[ArrowRecord], np.ndarray, np.ndarray,
+                                        list[ArrowRecord], np.ndarray, np.ndarray]] = None
+        self.project: Optional[Project] = None
+        self.current_chapter: str = 'main'
+        # межглавные связи, у которых ещё не загружена одна из глав
+        self.pending_links: list[dict[str, Any]] = []
+        self.dirty: set[str] = set()
+        self.manifest_dirty: bool = False
+        # граф для пробы игры собирается по частям: id нод, изменённых с прошлой сборки (None — собрать заново),
+        # и экран, с которого игрок попросил играть
+        self.story_compiler: Optional['StoryCompiler'] = None
+        self.story_changes: Optional[set[str]] = None
+        self.play_from: Optional[str] = None
+        # раскладка графа считается в отдельном процессе; ноды, у которых с прошлой раскладки
+        # появились или изменились связи, — центры для инкрементальной раскладки
+        self.layout_pool: Optional[ProcessPoolExecutor] = None
+        self.layout_job: Optional[Future] = None
+        self.layout_dirty: set[str] = set()
+        # диагностика сюжета обновляется при каждой правке; подсветка — строки нод с проблемами
+        self.checker: StoryChecker = StoryChecker(lambda path: os.path.exists(f'{config.get_dir_upload()}/{path}'))
+        self.problem_rows: Optional[tuple[int, np.ndarray]] = None
+        self.problem_text: Optional[tuple[int, Optional[str], Surface]] = None
+        self.problem_focus: Optional[str] = None
+        # отмена и повтор правок
+        self.history: History = History(config.undo_limit)
+        # поиск по текстам нод, ответов и подписей стрелок: ключ — id ноды или ответа либо запись стрелки
+        self.search_index: TextIndex = TextIndex()
+        self.search_hits: dict[str, Hashable] = {}
+        self.chapter_menu: Optional[UIDropDownMenu] = None
+
+        self.ui_manager = SharedThemeManager(self.surface.get_size(), 'theme.json')
         self.input_box: Optional[InputBox] = InputBox(
             (self.surface.get_width() / 2 - 200, self.surface.get_height() / 2 - 50), self.ui_manager, None)
         self.var_box: Optional[VarBox] = VarBox(
@@ -786,22 +1618,207 @@ class Editor(Screen):
                                                   'right': 'right',
                                                   'top': 'top',
                                                   'bottom': 'bottom'})
+        self.search_entry: UITextEntryLine = UITextEntryLine(pg.Rect(370, 0, 300, 30), manager=self.ui_manager,
+                                                             placeholder_text='Поиск по тексту')
+        self.search_results: UISelectionList = UISelectionList(pg.Rect(370, 30, 300, 300), [], manager=self.ui_manager)
+        self.search_entry.hide()
+        self.search_results.hide()
+
+    @staticmethod
+    def chapter_of(node: Node | Answer | NodeRecord | GroupNode) -> Optional[str]:
+        return node.node.chapter if isinstance(node, Answer) else node.chapter
+
+    def mark_dirty(self, node: Node | Answer | NodeRecord | GroupNode) -> NoReturn:
+        self.dirty.add(self.chapter_of(node))
+        if self.story_changes is not None:
+            self.story_changes.add(str((node.node if isinstance(node, Answer) else node).id))
+
+    def record_of(self, node_id: str) -> Optional[NodeRecord]:
+        """Запись ноды по id; для ответа — запись его ноды выбора."""
+        record: Optional[NodeRecord] = self.records.get(node_id)
+        return record if record is not None else self.answer_records.get(node_id)
+
+    def current_of(self, node_id: str) -> Node | NodeRecord:
+        """Актуальное состояние ноды: её объект, если она материализована, иначе запись."""
+        record: NodeRecord = self.record_of(node_id)
+        return record.node if record.node is not None else record
+
+    def view_of(self, node_id: str) -> Node | Answer:
+        record: NodeRecord = self.record_of(node_id)
+        if record.id == node_id:
+            return record.node
+        return next(answer for answer in record.node.answers if str(answer.id) == node_id)
+
+    def mark_arrow_dirty(self, arrow: ArrowRecord) -> NoReturn:
+        start: Optional[str] = self.current_of(arrow.start).chapter
+        end: Optional[str] = self.current_of(arrow.end).chapter
+        if self.story_changes is not None:
+            # переходы меняются у экрана, из которого ведёт стрелка, или у читающих её ноду выбора
+            self.story_changes.add(self.record_of(arrow.start).id)
+        if start == end:
+            self.dirty.add(start)
+        else:
+            self.manifest_dirty = True
+
+    def add_record(self, record: NodeRecord) -> NoReturn:
+        self.records[record.id] = record
+        for answer in record.answers:
+            self.answer_records[answer.id] = record
+        if record.node is not None:
+            self.materialized.add(record)
+        self.view_dirty = True
+
+    def add_arrow_record(self, arrow: ArrowRecord) -> NoReturn:
+        self.arrow_records[arrow] = None
+        self.incident[arrow.start].append(arrow)
+        self.incident[arrow.end].append(arrow)
+        self.arrows_version += 1
+        if arrow.text is not None:
+            self.search_index.put(arrow, arrow.text)
+        if arrow.arrow is not None:
+            self.arrows.append(arrow.arrow)
+        else:
+            self.view_dirty = True
+
+    def add_arrow(self, arrow: Arrow) -> NoReturn:
+        self.link(ArrowRecord.of(arrow))
+
+    def link(self, arrow: ArrowRecord) -> NoReturn:
+        self.add_arrow_record(arrow)
+        self.mark_arrow_dirty(arrow)
+        self.layout_dirty.update(self.record_of(node_id).id for node_id in (arrow.start, arrow.end))
+        self.checker.add_edge(arrow.start, arrow.end)
+
+    def restore_arrow(self, data: dict) -> NoReturn:
+        """Стрелка по её словарю; концы, которых уже нет, стрелку не восстанавливают."""
+        if self.record_of(data['start']) is not None and self.record_of(data['end']) is not None:
+            self.link(ArrowRecord.load(data))
+
+    def remove_arrow(self, data: dict) -> NoReturn:
+        self.remove_arrows({arrow for arrow in self.incident.get(data['start'], ())
+                            if arrow.end == data['end'] and arrow.text == data.get('text')})
+
+    def remove_arrows(self, arrows: set[ArrowRecord]) -> NoReturn:
+        if not arrows:
+            return
+        for arrow in arrows:
+            self.mark_arrow_dirty(arrow)
+            self.checker.remove_edge(arrow.start, arrow.end)
+            self.search_index.remove(arrow)
+            del self.arrow_records[arrow]
+            for node_id in (arrow.start, arrow.end):
+                self.incident[node_id].remove(arrow)
+                if not self.incident[node_id]:
+                    del self.incident[node_id]
+        self.arrows = [arrow for arrow in self.arrows if arrow.record not in arrows]
+        self.arrows_version += 1
+
+    def set_arrows(self, arrows: list[Arrow]) -> NoReturn:
+        """Замена списка стрелок с пометкой глав, в которых стрелки пропали."""
+        kept: set[int] = set(map(id, arrows))
+        self.remove_arrows({arrow.record for arrow in self.arrows if id(arrow) not in kept})
+
+    @staticmethod
+    def ids_of(node: Node) -> list[str]:
+        ids: list[str] = [str(node.id)]
+        if isinstance(node, ChoosenNode):
+            ids += [str(answer.id) for answer in node.answers]
+        return ids
+
+    def touch_node(self, node: Node) -> NoReturn:
+        """Сообщает миникарте, что строки ноды (и её ответов) изменились."""
+        self.minimap.touch(node.index)
+        if isinstance(node, ChoosenNode):
+            for answer in node.answers:
+                self.minimap.touch(answer.index)
+
+    def facts_of(self, node: Node | NodeRecord) -> NodeFacts:
+        node_type: int = node.node_type if isinstance(node, Node) else node.type
+        ids: list[str] = self.ids_of(node) if isinstance(node, Node) else node.ids()
+        text_format: Optional[Any] = VAR_TEXT if node_type == VarNode.node_type else \
+            CONDITION_TEXT if node_type == ConditionNode.node_type else None
+        return NodeFacts(ids[0], node_type == ImageNode.node_type, tuple(ids[1:]), node.initial,
+                         getattr(node, 'path_image', None), getattr(node, 'text', ''), text_format)
+
+    @staticmethod
+    def texts_of(node: Node | NodeRecord) -> list[tuple[str, str]]:
+        """Тексты ноды и её ответов для поиска: (id, текст)."""
+        if isinstance(node, NodeRecord):
+            texts: list[tuple[str, str]] = [(node.id, node.text)] if node.type in TEXT_TYPES else []
+            return texts + [(answer.id, answer.text) for answer in node.answers]
+        texts = [(str(node.id), node.text)] if isinstance(node, IText) else []
+        if isinstance(node, ChoosenNode):
+            texts += [(str(answer.id), answer.text) for answer in node.answers]
+        return texts
+
+    def node_changed(self, node: Node | Answer | NodeRecord) -> NoReturn:
+        """Сообщает диагностике и поиску, что у ноды изменились текст, картинка, ответы или флаг начальной."""
+        node = node.node if isinstance(node, Answer) else node
+        self.checker.set_node(self.facts_of(node))
+        for key, text in self.texts_of(node):
+            self.search_index.put(key, text)
+
+    def add_node(self, node: Node) -> NoReturn:
+        node.chapter = self.chapter_at(node.pos) or self.current_chapter
+        self.add_record(NodeRecord.of(node))
+        self.layout_dirty.add(str(node.id))
+        self.node_changed(node)
+        self.touch_node(node)
+        self.mark_dirty(node)
 
     def delete_node(self, node: Node) -> NoReturn:
-        self.arrows = list(filter(lambda arrow: not arrow.contain_node(node), self.arrows))
         if isinstance(node, Answer):
             node = node.node
+        ids: list[str] = self.ids_of(node)
+        self.remove_arrows({arrow for node_id in ids for arrow in self.incident.get(node_id, ())})
         if node in self.choosen_nodes:
             self.remove_choosen_node(node)
-        self.nodes.remove(node)
+        record: NodeRecord = self.records.pop(ids[0])
+        self.layout_dirty.discard(ids[0])
+        self.checker.remove_node(ids[0])
+        for node_id in ids:
+            self.search_index.remove(node_id)
+        for answer_id in ids[1:]:
+            self.answer_records.pop(answer_id, None)
+        self.materialized.discard(record)
+        record.node = None
+        self.touch_node(node)
+        node.release()
+        self.mark_dirty(node)
+        self.view_dirty = True
+        group: Optional[GroupNode] = self.group_of.pop(ids[0], None)
+        if group is not None:
+            group.members.remove(ids[0])
+            self.mark_dirty(group)
+            if len(group.members) < 2:
+                self.ungroup(group)
+
+    def delete_answer(self, answer: Answer) -> NoReturn:
+        answer_id: str = str(answer.id)
+        self.remove_arrows({arrow for arrow in self.incident.get(answer_id, ()) if arrow.start == answer_id})
+        self.minimap.touch(answer.index)
+        answer.node.remove_answer(answer)
+        self.search_index.remove(answer_id)
+        self.node_changed(answer.node)
+        self.touch_node(answer.node)
+        self.answer_records.pop(answer_id, None)
+        self.mark_dirty(answer)
 
     def set_main_node(self, node: Node) -> NoReturn:
+        self.manifest_dirty = True
+        self.mark_dirty(node)
         if node.initial:
             node.initial = False
+            self.node_changed(node)
             return
-        for i in self.nodes:
-            i.initial = False
+        for record in self.records.values():
+            current: Node | NodeRecord = record.node if record.node is not None else record
+            if current.initial:
+                self.mark_dirty(current)
+                current.initial = False
+                self.node_changed(current)
         node.initial = True
+        self.node_changed(node)
 
     def add_choosen_node(self, node: Node, mode: bool = False) -> NoReturn:
         if node in self.choosen_nodes:
@@ -814,12 +1831,19 @@ class Editor(Screen):
         node.choosen = False
 
     def activate_action_bar(self, pos: Tuple2D, node: Node = None) -> NoReturn:
+        extra: list[EnumAction] = []
+        if len([n for n in list(self.choosen_nodes) + [node] if isinstance(n, Node)]) >= 2:
+            extra.append(EnumAction.make_group)
+        if isinstance(node, GroupNode):
+            extra.append(EnumAction.ungroup)
+        elif node is not None and self.group_at(node) is not None:
+            extra += [EnumAction.collapse_group, EnumAction.ungroup]
         if isinstance(node, ChoosenNode):
             for answer in node.answers:
                 if answer.is_point_below(pos):
                     node = answer
                     break
-        self.action_bar = ActionBar(Color(128, 128, 128), pos, node)
+        self.action_bar = ActionBar(Color(128, 128, 128), pos, node, tuple(extra))
         self.action_bar_focus = True
 
     def action_bar_handler(self, pos: Tuple2D) -> NoReturn:
@@ -827,9 +1851,14 @@ class Editor(Screen):
         if task:
             match task:
                 case EnumAction.set_main:
+                    before: tuple[str, ...] = self.initial_ids()
                     self.set_main_node(self.action_bar.node)
+                    self.history.push(SetInitial(before, self.initial_ids()))
                 case EnumAction.delete:
-                    self.delete_node(self.action_bar.node)
+                    node: Node | Answer = self.action_bar.node
+                    command: AddNode = self.snapshot_node(str((node.node if isinstance(node, Answer) else node).id))
+                    self.delete_node(node)
+                    self.history.push(Inverse(command))
                 case EnumAction.replace_text:
                     self.input_box.activate(self.action_bar.node)
                 case EnumAction.edit_var:
@@ -841,19 +1870,61 @@ class Editor(Screen):
                     self.image_app.node = self.action_bar.node
                     # self.image_app.run()
                 case EnumAction.delete_answer:
-                    self.action_bar.node.node.remove_answer(self.action_bar.node)
-                    self.arrows = list(filter(lambda arrow: arrow.start is not self.action_bar.node.connector2, self.arrows))
+                    command: AddAnswer = self.snapshot_answer(self.action_bar.node)
+                    self.delete_answer(self.action_bar.node)
+                    self.history.push(Inverse(command))
                 case EnumAction.add_image_node:
-                    self.nodes.append(ImageNode(pos, Color(100, 100, 255)))
+                    self.create_node(ImageNode(self.geometry, pos, Color(100, 100, 255)))
                 case EnumAction.add_answer_node:
-                    self.nodes.append(ChoosenNode(pos))
+                    self.create_node(ChoosenNode(self.geometry, pos))
                 case EnumAction.add_var_node:
-                    self.nodes.append(VarNode(pos, Color(255, 180, 100)))
+                    self.create_node(VarNode(self.geometry, pos, Color(255, 180, 100)))
                 case EnumAction.add_condition_node:
-                    self.nodes.append(ConditionNode(pos, Color(100, 200, 120)))
-
-    def node_handler(self, pos: Tuple2D) -> Node | Connector:
-        for node in self.nodes:
+                    self.create_node(ConditionNode(self.geometry, pos, Color(100, 200, 120)))
+                case EnumAction.move_to_chapter:
+                    nodes: list[Node] = list(self.choosen_nodes) or [self.action_bar.node]
+                    self.history.push(self.move_to_new_chapter(nodes))
+                case EnumAction.auto_layout:
+                    self.start_layout()
+                case EnumAction.layout_around:
+                    node: Node | Answer = self.action_bar.node
+                    self.start_layout({str((node.node if isinstance(node, Answer) else node).id)})
+                case EnumAction.play_here:
+                    self.play_from = str(self.action_bar.node.id)
+                case EnumAction.make_group:
+                    group: Optional[GroupNode] = self.make_group(list(self.choosen_nodes) + [self.action_bar.node])
+                    if group is not None:
+                        self.history.push(self.snapshot_group(group))
+                case EnumAction.collapse_group:
+                    self.history.do(FoldGroup(str(self.group_at(self.action_bar.node).id), True), self)
+                case EnumAction.expand_group:
+                    self.history.do(FoldGroup(str(self.action_bar.node.id), False), self)
+                case EnumAction.ungroup:
+                    group = self.group_at(self.action_bar.node)
+                    command: AddGroup = self.snapshot_group(group)
+                    self.ungroup(group)
+                    self.history.push(Inverse(command))
+
+    def create_node(self, node: Node) -> NoReturn:
+        self.add_node(node)
+        self.history.push(self.snapshot_node(str(node.id)))
+
+    def nodes_near(self, pos: Tuple2D) -> list[Node | GroupNode]:
+        """Ноды, рядом с которыми лежит точка; запас покрывает выступающие коннекторы и кнопку ответа."""
+        owners: list[Any] = self.geometry.owners
+        rows: np.ndarray = self.geometry.in_rect((pos[0], pos[1], 0, 0), margin=40)
+        # при мелкой детализации нода под курсором может быть ещё записью
+        records: list[NodeRecord] = [owners[i] for i in rows if isinstance(owners[i], NodeRecord)]
+        if records:
+            for record in self.with_neighbours(records):
+                if record.node is None:
+                    self.materialize(record)
+            self.refresh_arrows()
+            self.view_dirty = True
+        return [owners[i] for i in rows if isinstance(owners[i], (Node, GroupNode))]
+
+    def node_handler(self, pos: Tuple2D) -> Node | GroupNode | Connector:
+        for node in self.nodes_near(pos):
             if node.is_point_below(pos):
                 return node
             match node:
@@ -877,6 +1948,11 @@ class Editor(Screen):
                         return node.connector1
                     elif node.button_add.is_point_below(pos):
                         node.add_answer()
+                        self.answer_records[str(node.answers[-1].id)] = self.records[str(node.id)]
+                        self.node_changed(node)
+                        self.touch_node(node)
+                        self.mark_dirty(node)
+                        self.history.push(self.snapshot_answer(node.answers[-1]))
                     else:
                         for ans in node.answers:
                             if ans.connector2.is_point_below(pos):
@@ -886,22 +1962,747 @@ class Editor(Screen):
         self.action_bar = None
         self.action_bar_focus = False
 
+    def move_all_nodes(self, move: Tuple2D, pause: bool = False) -> NoReturn:
+        if pause:
+            time.sleep(0.0001)
+        self.camera.move(move)
+        self.geometry.move(move)
+        self.view_dirty = True
+        self.load_visible_chapters()
+
+    def zoom(self, koef: float) -> NoReturn:
+        koef = self.camera.zoom(koef)
+        if koef == 1.0:
+            return
+        self.geometry.zoom(koef)
+        self.view_dirty = True
+        self.load_visible_chapters()
+
+    def jump_to(self, point: Tuple2D) -> NoReturn:
+        """Сдвигает поле так, чтобы мировая точка оказалась в центре экрана."""
+        x, y = self.camera.to_screen(point)
+        self.move_all_nodes((self.surface.get_width() / 2 - x, self.surface.get_height() / 2 - y))
+
+    # --- правки по id: их выполняют команды отмены и повтора, когда объектов нод может уже не быть
+
+    def node_by_id(self, node_id: str) -> Optional[Node]:
+        record: Optional[NodeRecord] = self.records.get(node_id)
+        if record is None:
+            return None
+        if record.node is None:
+            self.materialize(record)
+            self.view_dirty = True
+        return record.node
+
+    def move_by(self, ids: Iterable[str], delta: Tuple2D) -> NoReturn:
+        """Сдвиг нод и групп на мировой вектор delta."""
+        dx, dy = delta[0] * self.camera.scale, delta[1] * self.camera.scale
+        for node_id in ids:
+            obj: Optional[Node | NodeRecord | GroupNode] = self.groups.get(node_id)
+            if obj is None and node_id in self.records:
+                obj = self.current_of(node_id)
+            if obj is None:
+                continue
+            if isinstance(obj, NodeRecord):
+                self.geometry.pos[obj.index] += (dx, dy)
+                self.minimap.touch(obj.index)
+                # запись могла въехать на экран или уехать с него
+                self.view_dirty = True
+            else:
+                obj.shift(dx, dy)
+                self.touch_node(obj)
+            if isinstance(obj, GroupNode):
+                self.mark_group_dirty(obj)
+            else:
+                self.mark_dirty(obj)
+
+    def snapshot_node(self, node_id: str) -> AddNode:
+        """Команда, которая заново создаёт ноду такой, какая она сейчас, со всеми её стрелками."""
+        record: NodeRecord = self.records[node_id]
+        current: Node | NodeRecord = self.current_of(node_id)
+        ids: list[str] = self.ids_of(current) if isinstance(current, Node) else record.ids()
+        arrows: dict[ArrowRecord, None] = dict.fromkeys(arrow for answer_id in ids
+                                                        for arrow in self.incident.get(answer_id, ()))
+        group: Optional[GroupNode] = self.group_of.get(node_id)
+        data: dict = self.camera.dict_to_world(record.__my_dict__())
+        # у объекта ноды выбора ключи ответов — числа, в файле главы они строки
+        if 'answers' in data:
+            data['answers'] = {str(answer_id): answer for answer_id, answer in data['answers'].items()}
+        return AddNode(node_id, data, current.chapter, current.initial, str(group.id) if group is not None else None,
+                       [arrow.__my_dict__() for arrow in arrows])
+
+    def restore_node(self, node_id: str, data: dict, chapter: Optional[str], initial: bool,
+                     group_id: Optional[str]) -> NoReturn:
+        builder: ProjectBuilder = ProjectBuilder([], self.camera, self.geometry)
+        builder.chapter = chapter
+        builder.add_node(node_id, data)
+        record: NodeRecord = builder.records[node_id]
+        record.initial = initial
+        self.add_record(record)
+        self.node_changed(record)
+        self.layout_dirty.add(node_id)
+        self.minimap.touch(record.index)
+        self.mark_dirty(record)
+        if initial:
+            self.manifest_dirty = True
+        group: Optional[GroupNode] = self.groups.get(group_id) if group_id is not None else None
+        if group is not None:
+            group.members.append(node_id)
+            self.group_of[node_id] = group
+            if group.collapsed:
+                self.fold(group)
+            self.mark_group_dirty(group)
+
+    def remove_node(self, node_id: str) -> NoReturn:
+        node: Optional[Node] = self.node_by_id(node_id)
+        if node is not None:
+            self.delete_node(node)
+
+    def snapshot_answer(self, answer: Answer) -> AddAnswer:
+        answer_id: str = str(answer.id)
+        arrows: list[dict] = [arrow.__my_dict__() for arrow in self.incident.get(answer_id, ())
+                              if arrow.start == answer_id]
+        return AddAnswer(str(answer.node.id), answer_id, answer.text, color_tuple(answer.color),
+                         answer.node.answers.index(answer), arrows)
+
+    def insert_answer(self, node_id: str, answer_id: str, text: str, color: tuple[int, int, int, int],
+                      index: int) -> NoReturn:
+        node: Optional[Node] = self.node_by_id(node_id)
+        if not isinstance(node, ChoosenNode):
+            return
+        next_id: int = Node.next_id
+        node.add_answer()
+        Node.next_id = next_id
+        answer: Answer = node.answers.pop()
+        answer.id = int(answer_id)
+        answer.set_text(text)
+        answer.color = shared_color(*color)
+        self.geometry.paint(answer.index, answer.color)
+        node.answers.insert(min(index, len(node.answers)), answer)
+        # ответы раскладываются по своему порядку
+        node.set_pos(node.pos)
+        self.answer_records[answer_id] = self.records[node_id]
+        self.node_changed(node)
+        self.touch_node(node)
+        self.mark_dirty(node)
+
+    def remove_answer(self, answer_id: str) -> NoReturn:
+        record: Optional[NodeRecord] = self.answer_records.get(answer_id)
+        node: Optional[Node] = self.node_by_id(record.id) if record is not None else None
+        if isinstance(node, ChoosenNode):
+            self.delete_answer(next(answer for answer in node.answers if str(answer.id) == answer_id))
+
+    def text_of(self, key: str) -> str:
+        if key in self.groups:
+            return self.groups[key].text
+        current: Node | NodeRecord = self.current_of(key)
+        if isinstance(current, Node):
+            return self.view_of(key).text
+        return current.text if current.id == key else next(answer.text for answer in current.answers
+                                                            if answer.id == key)
+
+    def set_text_of(self, key: str, text: str) -> NoReturn:
+        """Текст ноды, ответа или группы по id."""
+        group: Optional[GroupNode] = self.groups.get(key)
+        if group is not None:
+            group.set_text(text)
+            self.mark_dirty(group)
+            return
+        record: Optional[NodeRecord] = self.record_of(key)
+        if record is None:
+            return
+        if record.node is not None:
+            view: Node | Answer = self.view_of(key)
+            view.set_text(text)
+            self.mark_dirty(view)
+            self.node_changed(view)
+            return
+        if record.id == key:
+            record.text = text
+        else:
+            next(answer for answer in record.answers if answer.id == key).text = text
+        self.mark_dirty(record)
+        self.node_changed(record)
+
+    def initial_ids(self) -> tuple[str, ...]:
+        return tuple(node_id for node_id in self.records if self.current_of(node_id).initial)
+
+    def set_initial(self, ids: tuple[str, ...]) -> NoReturn:
+        for node_id in set(self.initial_ids()) | set(ids):
+            if node_id not in self.records:
+                continue
+            current: Node | NodeRecord = self.current_of(node_id)
+            current.initial = node_id in ids
+            self.mark_dirty(current)
+            self.node_changed(current)
+        self.manifest_dirty = True
+
+    def set_chapters(self, chapters: dict[str, str]) -> NoReturn:
+        for node_id, chapter in chapters.items():
+            obj: Optional[Node | NodeRecord | GroupNode] = self.groups.get(node_id)
+            if obj is None and node_id in self.records:
+                obj = self.current_of(node_id)
+            if obj is None or chapter not in self.project.chapters:
+                continue
+            self.mark_dirty(obj)
+            obj.chapter = chapter
+            self.dirty.add(chapter)
+        self.manifest_dirty = True
+
+    def snapshot_group(self, group: GroupNode) -> AddGroup:
+        return AddGroup(str(group.id), group.chapter, self.camera.dict_to_world(group.__my_dict__()))
+
+    def restore_group(self, group_id: str, chapter: Optional[str], data: dict) -> NoReturn:
+        group: GroupNode = self.load_group(chapter, group_id, data)
+        group.members = [member for member in group.members if member in self.records and member not in self.group_of]
+        self.add_group(group)
+        if group.collapsed:
+            self.fold(group)
+        self.minimap.touch(group.index)
+        self.mark_group_dirty(group)
+
+    def fold_group(self, group_id: str, collapsed: bool) -> NoReturn:
+        group: Optional[GroupNode] = self.groups.get(group_id)
+        if group is None or group.collapsed == collapsed:
+            return
+        if collapsed:
+            self.collapse_group(group)
+        else:
+            self.expand_group(group)
+
+    def undo(self, redo: bool = False) -> NoReturn:
+        # объекты нод, с которыми работал пользователь, могут исчезнуть вместе с отменённой правкой
+        self.clear_action_bar()
+        for node in list(self.choosen_nodes):
+            self.remove_choosen_node(node)
+        for box in (self.input_box, self.var_box, self.cond_box):
+            box.deactivate()
+            box.node = None
+        if self.history.redo(self) if redo else self.history.undo(self):
+            self.view_dirty = True
+
+    def edit_text(self, node: Node | Answer | GroupNode, text: str) -> NoReturn:
+        key: str = str(node.id)
+        if node.text != text:
+            self.history.do(SetText(key, node.text, text), self)
+
+    def typing(self) -> bool:
+        """Фокус в поле ввода: Ctrl+Z там относится к тексту, а не к полю нод."""
+        return any(isinstance(element, (UITextEntryLine, UITextEntryBox))
+                   for element in self.ui_manager.get_focus_set() or ())
+
+    def chapter_at(self, pos: Tuple2D) -> Optional[str]:
+        if self.project is None:
+            return None
+        name: Optional[str] = self.project.chapter_at(self.camera.to_world(pos))
+        return name if name is not None and self.project.chapters[name].loaded else None
+
+    def load_chapters(self, names: list[str], screen: Optional[ScreenLoading] = None) -> NoReturn:
+        with tracer.span('Editor.load_chapters', chapters=names):
+            builder: ProjectBuilder = ProjectBuilder([(name, self.project.chapter_path(name)) for name in names],
+                                                     self.camera, self.geometry)
+            loader: BackgroundLoader = BackgroundLoader(builder.build)
+            if screen is None:
+                loader.run_here()
+            else:
+                loader.wait(screen)
+
+            for record in builder.records.values():
+                self.add_record(record)
+            for arrow in builder.arrows:
+                self.add_arrow_record(arrow)
+            for chapter, group_hash, data in builder.groups:
+                self.add_group(self.load_group(chapter, group_hash, data))
+            # ноды свёрнутых групп могли прийти и с новыми главами
+            for group in self.groups.values():
+                if group.collapsed:
+                    self.fold(group)
+            for name in names:
+                self.project.chapters[name].loaded = True
+            # у экранов, которые ссылались на новые главы, меняются переходы: граф пробы собирается заново
+            self.story_changes = None
+            if self.project.legacy:
+                self.project.initial = builder.initial
+            if self.project.initial in builder.records:
+                builder.records[self.project.initial].initial = True
+            self.checker.load(map(self.facts_of, builder.records.values()),
+                              ((arrow.start, arrow.end) for arrow in builder.arrows))
+            self.search_index.load(item for record in builder.records.values() for item in self.texts_of(record))
+            self.resolve_links()
+            self.minimap.invalidate(chapter.bbox for chapter in self.project.chapters.values()
+                                    if not chapter.loaded and chapter.bbox is not None)
+
+    def resolve_links(self) -> NoReturn:
+        """Превращает в стрелки межглавные связи, обе главы которых загружены."""
+        chapters: dict[str, Chapter] = self.project.chapters
+        ready: list[dict] = [link for link in self.pending_links
+                             if chapters[link['start_chapter']].loaded and chapters[link['end_chapter']].loaded]
+        for link in ready:
+            self.pending_links.remove(link)
+            if self.record_of(link['start']) is not None and self.record_of(link['end']) is not None:
+                self.add_arrow_record(ArrowRecord.load(link))
+                self.checker.add_edge(link['start'], link['end'])
+            else:
+                # одна из нод была удалена, пока её глава не была загружена
+                self.manifest_dirty = True
+        # в ноды, куда ведут связи из незагруженных глав, сюжет может прийти оттуда
+        self.checker.set_entries({link['end'] for link in self.pending_links})
+
+    def load_visible_chapters(self) -> NoReturn:
+        if self.project is None:
+            return
+        width, height = self.surface.get_size()
+        view: Rect = pg.Rect(-width // 2, -height // 2, width * 2, height * 2)
+        names: list[str] = [chapter.name for chapter in self.project.chapters.values()
+                            if not chapter.loaded and chapter.bbox is not None and
+                            view.colliderect(self.camera.rect_to_screen(chapter.bbox))]
+        if names:
+            self.load_chapters(names)
+            self.refresh_chapter_menu()
+
+    def open_chapter(self, name: str) -> NoReturn:
+        self.current_chapter = name
+        chapter: Chapter = self.project.chapters[name]
+        if chapter.bbox is not None:
+            x, y, w, h = self.camera.rect_to_screen(chapter.bbox)
+            self.move_all_nodes((self.surface.get_width() / 2 - x - w / 2, self.surface.get_height() / 2 - y - h / 2))
+        if not chapter.loaded:
+            self.load_chapters([name])
+
+    def add_chapter(self, name: str) -> NoReturn:
+        if name not in self.project.chapters:
+            self.project.add_chapter(name)
+            self.manifest_dirty = True
+            self.refresh_chapter_menu()
+
+    def remove_chapter(self, name: str) -> NoReturn:
+        """Убирает опустевшую главу: запись в манифесте и файл. Глава, где остались ноды или группы, остаётся."""
+        if name not in self.project.chapters or \
+                any(self.current_of(node_id).chapter == name for node_id in self.records) or \
+                any(group.chapter == name for group in self.groups.values()):
+            return
+        self.project.remove_chapter(name)
+        self.dirty.discard(name)
+        self.manifest_dirty = True
+        if self.current_chapter == name:
+            # начальная нода могла быть среди перенесённых: тогда initial_chapter ещё указывает на эту главу
+            self.current_chapter = self.project.initial_chapter if self.project.initial_chapter in self.project.chapters \
+                else next(iter(self.project.chapters))
+        self.refresh_chapter_menu()
+
+    def move_to_new_chapter(self, nodes: list[Node]) -> SetChapters:
+        name: str = self.project.new_chapter_name()
+        before: dict[str, str] = {}
+        was_legacy: bool = self.project.legacy
+        self.project.add_chapter(name)
+        for node in nodes:
+            if isinstance(node, Answer):
+                node = node.node
+            # группа переезжает вместе со своими нодами
+            moved: list[Node | NodeRecord | GroupNode] = [node]
+            if isinstance(node, GroupNode):
+                moved += [self.current_of(member) for member in node.members if member in self.records]
+            for obj in moved:
+                before[str(obj.id)] = obj.chapter
+                self.mark_dirty(obj)
+                obj.chapter = name
+        self.dirty.add(name)
+        if was_legacy:
+            self.dirty.update(self.project.chapters)
+        self.manifest_dirty = True
+        self.current_chapter = name
+        self.refresh_chapter_menu()
+        return SetChapters(before, name, created=True)
+
+    def refresh_chapter_menu(self) -> NoReturn:
+        if self.chapter_menu is not None:
+            self.chapter_menu.kill()
+            self.chapter_menu = None
+        if self.project is None or len(self.project.chapters) < 2:
+            return
+        names: list[str] = list(self.project.chapters)
+        self.chapter_menu = UIDropDownMenu(names, self.current_chapter if self.current_chapter in names else names[0],
+                                           pg.Rect(185, 0, 180, 30), manager=self.ui_manager)
+
+    def group_at(self, node: Node | Answer | GroupNode) -> Optional[GroupNode]:
+        if isinstance(node, GroupNode):
+            return node
+        if isinstance(node, Answer):
+            node = node.node
+        return self.group_of.get(str(node.id))
+
+    def folded(self, node_id: str) -> Optional[GroupNode]:
+        """Свёрнутая группа, в которой лежит нода (или ответ) node_id."""
+        if not self.group_of:
+            return None
+        record: Optional[NodeRecord] = self.record_of(node_id)
+        group: Optional[GroupNode] = self.group_of.get(record.id) if record is not None else None
+        return group if group is not None and group.collapsed else None
+
+    def mark_group_dirty(self, group: GroupNode) -> NoReturn:
+        """Помечает главу группы и главы её нод: вместе с группой двигаются и они."""
+        self.mark_dirty(group)
+        for member in group.members:
+            if member in self.records:
+                self.mark_dirty(self.current_of(member))
+
+    def add_group(self, group: GroupNode) -> NoReturn:
+        self.groups[str(group.id)] = group
+        for member in group.members:
+            self.group_of[member] = group
+        self.geometry.hide((group.index,), not group.collapsed)
+
+    def load_group(self, chapter: str, group_hash: str, data: dict) -> GroupNode:
+        color, position = ProjectBuilder.recognition_graphic(data)
+        next_id: int = Node.next_id
+        group: GroupNode = GroupNode(self.geometry, self.camera.to_screen(position),
+                                     self.camera.size_to_screen(data['size']), list(data['members']), color,
+                                     data.get('text', ''))
+        Node.next_id = next_id
+        group.id = int(group_hash)
+        group.chapter = chapter
+        group.collapsed = bool(data.get('collapsed', False))
+        return group
+
+    def fold(self, group: GroupNode) -> NoReturn:
+        """Прячет ноды свёрнутой группы: они перестают рисоваться и ловить курсор и остаются записями."""
+        records: list[NodeRecord] = [self.records[member] for member in group.members if member in self.records]
+        for record in records:
+            if record.node is not None:
+                if record.node in self.choosen_nodes:
+                    self.remove_choosen_node(record.node)
+                self.dematerialize(record)
+        group.rows = np.fromiter((record.index for record in records), dtype=np.intp, count=len(records))
+        self.geometry.hide(group.rows)
+        for index in group.rows.tolist():
+            self.minimap.touch(index)
+        self.arrows_version += 1
+        self.view_dirty = True
+
+    def make_group(self, nodes: list[Node | Answer | None]) -> Optional[GroupNode]:
+        """Группирует выделенные ноды одной главы и сразу сворачивает группу."""
+        members: list[Node] = []
+        for node in nodes:
+            if isinstance(node, Answer):
+                node = node.node
+            if isinstance(node, Node) and node not in members and str(node.id) not in self.group_of:
+                members.append(node)
+        members = [node for node in members if node.chapter == members[0].chapter] if members else []
+        if len(members) < 2:
+            return None
+        for node in members:
+            if node in self.choosen_nodes:
+                self.remove_choosen_node(node)
+        x, y, _, _ = self.geometry.bbox(node.index for node in members)
+        group: GroupNode = GroupNode(self.geometry, (x, y), self.camera.size_to_screen(GroupNode.SIZE),
+                                     [str(node.id) for node in members], text=f'Группа ({len(members)})')
+        group.chapter = members[0].chapter
+        self.add_group(group)
+        self.collapse_group(group)
+        return group
+
+    def collapse_group(self, group: GroupNode) -> NoReturn:
+        bbox: Optional[Rect4] = self.geometry.bbox(self.records[member].index for member in group.members
+                                                   if member in self.records)
+        if bbox is not None:
+            group.pos = bbox[:2]
+        group.size = self.camera.size_to_screen(GroupNode.SIZE)
+        group.collapsed = True
+        self.geometry.hide((group.index,), False)
+        self.minimap.touch(group.index)
+        self.fold(group)
+        self.mark_group_dirty(group)
+
+    def expand_group(self, group: GroupNode) -> NoReturn:
+        group.collapsed = False
+        if group in self.choosen_nodes:
+            self.remove_choosen_node(group)
+        self.geometry.hide(group.rows, False)
+        self.geometry.hide((group.index,))
+        for index in group.rows.tolist() + [group.index]:
+            self.minimap.touch(index)
+        group.rows = np.zeros(0, dtype=np.intp)
+        group.incoming = group.outgoing = 0
+        self.arrows_version += 1
+        self.view_dirty = True
+        self.mark_group_dirty(group)
+
+    def ungroup(self, group: GroupNode) -> NoReturn:
+        if group.collapsed:
+            self.expand_group(group)
+        self.mark_group_dirty(group)
+        del self.groups[str(group.id)]
+        for member in group.members:
+            self.group_of.pop(member, None)
+        self.minimap.touch(group.index)
+        group.release()
+
+    def layout_graph(self) -> tuple[dict[str, Tuple2D], dict[str, Tuple2D], list[layout.Edge]]:
+        """Мировые позиции и размеры нод и рёбра между ними для layout: стрелка из ответа — ребро из его ноды
+        выбора с портом по порядку ответа, стрелки «Да»/«Нет» условия выходят слева и справа."""
+        positions: dict[str, Tuple2D] = {}
+        sizes: dict[str, Tuple2D] = {}
+        for node_id, record in self.records.items():
+            positions[node_id] = self.camera.to_world(record.pos)
+            sizes[node_id] = self.camera.size_to_world(record.size)
+        edges: list[layout.Edge] = []
+        for arrow in self.arrow_records:
+            start: NodeRecord = self.record_of(arrow.start)
+            port: float = 0.5
+            if start.id != arrow.start:
+                answers: list[str] = self.ids_of(start.node)[1:] if start.node is not None else start.ids()[1:]
+                port = (answers.index(arrow.start) + 0.5) / len(answers)
+            elif arrow.text is not None:
+                port = 0.25 if arrow.text == 'Yes' else 0.75
+            edges.append((start.id, self.record_of(arrow.end).id, port))
+        return positions, sizes, edges
+
+    def start_layout(self, around: Optional[set[str]] = None) -> NoReturn:
+        """Запускает раскладку в рабочем процессе: всего загруженного графа или (around) только окрестности
+        этих нод и нод, связи которых менялись с прошлой раскладки. Результат применяет update."""
+        if self.layout_job is not None:
+            return
+        if self.layout_pool is None:
+            # spawn: рабочему процессу не достаются копии окна и шрифтов pygame
+            self.layout_pool = ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn'))
+        positions, sizes, edges = self.layout_graph()
+        if not positions:
+            return
+        if around is None:
+            origin: Tuple2D = (min(x for x, _ in positions.values()), min(y for _, y in positions.values()))
+            self.layout_job = self.layout_pool.submit(layout.layered, sizes, edges, origin)
+        else:
+            self.layout_job = self.layout_pool.submit(layout.relayout, positions, sizes, edges,
+                                                      around | self.layout_dirty)
+        self.layout_dirty.clear()
+
+    @tracer.trace('Editor.apply_layout')
+    def apply_layout(self, positions: dict[str, Tuple2D]) -> NoReturn:
+        for node_id, point in positions.items():
+            # нода могла быть удалена, пока считалась раскладка
+            record: Optional[NodeRecord] = self.records.get(node_id)
+            if record is None:
+                continue
+            screen: Tuple2D = self.camera.to_screen(point)
+            if record.node is not None:
+                record.node.set_pos(screen)
+            else:
+                self.geometry.pos[record.index] = screen
+            self.mark_dirty(self.current_of(node_id))
+        for group in self.groups.values():
+            if group.collapsed and len(group.rows):
+                group.pos = self.geometry.bbox(group.rows.tolist())[:2]
+        self.minimap.invalidate(self.minimap.chapters)
+        self.view_dirty = True
+
+    def flagged_rows(self) -> np.ndarray:
+        if self.problem_rows is None or self.problem_rows[0] != self.checker.version:
+            flagged: list[str] = [node_id for node_id in self.checker.flagged() if node_id in self.records]
+            self.problem_rows = (self.checker.version, np.fromiter((self.records[node_id].index for node_id in flagged),
+                                                                   dtype=np.intp, count=len(flagged)))
+        return self.problem_rows[1]
+
+    def draw_problems(self, view: Rect4) -> NoReturn:
+        """Рамки вокруг нод с проблемами и строка-сводка внизу экрана."""
+        store: GeometryStore = self.geometry
+        rows: np.ndarray = self.flagged_rows()
+        rows = rows[store.shown(rows)]
+        pos: np.ndarray = store.pos[rows]
+        end: np.ndarray = pos + store.size[rows]
+        x, y, w, h = view
+        inside: np.ndarray = (end[:, 0] >= x) & (end[:, 1] >= y) & (pos[:, 0] <= x + w) & (pos[:, 1] <= y + h)
+        for (left, top), (right, bottom) in zip(pos[inside].tolist(), end[inside].tolist()):
+            pg.draw.rect(self.surface, PROBLEM_COLOR, (left - 5, top - 5, right - left + 10, bottom - top + 10), 2)
+
+        if self.problem_text is None or self.problem_text[:2] != (self.checker.version, self.problem_focus):
+            text: str = self.checker.summary()
+            if self.problem_focus is not None and self.problem_focus in self.records:
+                problems: set[Problem] = self.checker.problems_of(self.problem_focus)
+                text = f'{self.problem_focus}: {", ".join(problem.value for problem in problems) or "нет проблем"}' \
+                       f' | {text}'
+            if IText.font is None:
+                IText.font = pg.font.SysFont('consolas', 16)
+            rendered: Surface = ledger.track(IText.font.render(text, True, PROBLEM_COLOR), self, kind='text') \
+                if text else Surface((0, 0))
+            self.problem_text = (self.checker.version, self.problem_focus, rendered)
+        self.surface.blit(self.problem_text[2], (10, self.surface.get_height() - self.problem_text[2].get_height() - 10))
+
+    def next_problem(self) -> NoReturn:
+        flagged: list[str] = sorted((node_id for node_id in self.checker.flagged() if node_id in self.records), key=int)
+        if not flagged:
+            self.problem_focus = None
+            return
+        later: list[str] = [node_id for node_id in flagged
+                            if self.problem_focus is not None and int(node_id) > int(self.problem_focus)]
+        self.problem_focus = later[0] if later else flagged[0]
+        self.center_on(self.records[self.problem_focus])
+
+    def center_on(self, record: NodeRecord) -> NoReturn:
+        (x, y), (w, h) = record.pos, record.size
+        self.jump_to(self.camera.to_world((x + w / 2, y + h / 2)))
+
+    def toggle_search(self) -> NoReturn:
+        if self.search_entry.visible:
+            self.search_entry.hide()
+            self.search_results.hide()
+            self.search_entry.unfocus()
+            return
+        self.search_entry.show()
+        self.search_results.show()
+        self.search_entry.focus()
+        self.search(self.search_entry.get_text())
+
+    def search(self, query: str) -> NoReturn:
+        """Заполняет список результатов поиска; подпись результата — его текст и то, где он."""
+        self.search_hits = {}
+        for i, key in enumerate(self.search_index.search(query)):
+            text: str = self.search_index.texts[key]
+            text = text if len(text) <= 30 else text[:28] + '...'
+            if isinstance(key, ArrowRecord):
+                where: str = f'стрелка {key.start} → {key.end}'
+            elif key in self.records:
+                where = f'нода {key}'
+            else:
+                where = f'ответ ноды {self.answer_records[key].id}'
+            self.search_hits[f'{i + 1}. {text} — {where}'] = key
+        self.search_results.set_item_list(list(self.search_hits))
+
+    def show_search_hit(self, label: str) -> NoReturn:
+        key: Optional[Hashable] = self.search_hits.get(label)
+        if key is None:
+            return
+        record: Optional[NodeRecord] = self.record_of(key.start if isinstance(key, ArrowRecord) else key)
+        if record is not None:
+            self.center_on(record)
+
+    def pinned_nodes(self) -> set[Node]:
+        """Ноды, с которыми сейчас работает пользователь: они остаются объектами, даже уйдя с экрана."""
+        pinned: set[Node | Answer] = set(self.choosen_nodes)
+        pinned.update(obj for obj in (self.action_bar.node if self.action_bar is not None else None,
+                                      self.input_box.node, self.var_box.node, self.cond_box.node, self.image_app.node,
+                                      self.choosen_arrow.start.node if self.choosen_arrow is not None else None)
+                      if obj is not None)
+        return {obj.node if isinstance(obj, Answer) else obj for obj in pinned}
+
+    def materialize(self, record: NodeRecord) -> NoReturn:
+        self.touch_node(record.materialize(self.is_mini_should))
+        self.materialized.add(record)
+
+    def dematerialize(self, record: NodeRecord) -> NoReturn:
+        for node_id in record.ids():
+            for arrow in self.incident.get(node_id, ()):
+                arrow.arrow = None
+        self.touch_node(record.node)
+        record.dematerialize()
+        self.materialized.discard(record)
+
+    def with_neighbours(self, records: Iterable[NodeRecord]) -> set[NodeRecord]:
+        """Записи вместе с нодами на других концах их стрелок: у интерактивной ноды должны быть все её стрелки."""
+        result: set[NodeRecord] = set(records)
+        for record in list(result):
+            for node_id in record.ids():
+                for arrow in self.incident.get(node_id, ()):
+                    # ноды свёрнутой группы не материализуются: их стрелки ведут в саму группу
+                    for end in (arrow.start, arrow.end):
+                        if self.folded(end) is None:
+                            result.add(self.record_of(end))
+        return result
+
+    def refresh_arrows(self) -> NoReturn:
+        """Создаёт объекты стрелок, оба конца которых материализованы, и собирает их в self.arrows."""
+        arrows: dict[ArrowRecord, None] = {}
+        for record in self.materialized:
+            for node_id in record.ids():
+                arrows.update(dict.fromkeys(self.incident.get(node_id, ())))
+        self.arrows = []
+        for arrow in arrows:
+            if arrow.arrow is None:
+                start: NodeRecord = self.record_of(arrow.start)
+                end: NodeRecord = self.record_of(arrow.end)
+                if start.node is None or end.node is None:
+                    continue
+                arrow.materialize(self.view_of(arrow.start), self.view_of(arrow.end))
+            self.arrows.append(arrow.arrow)
+
+    @tracer.trace('Editor.sync_viewport')
+    def sync_viewport(self, view: Rect4, visible_arrows: list[ArrowRecord]) -> NoReturn:
+        """Материализует записи около экрана (и концы стрелок, пересекающих его) и освобождает объекты ушедших.
+        На мелких уровнях детализации поле рисуется прямо из хранилища, и объекты остаются только у нод в работе."""
+        self.view_dirty = False
+        owners: list[Any] = self.geometry.owners
+        margin: int = self.MATERIALIZE_MARGIN
+        detailed: bool = self.detail() >= Detail.no_text
+
+        candidates: list[Any] = list(self.pinned_nodes())
+        if detailed:
+            candidates += [owners[i] for i in self.geometry.in_rect(view, margin)]
+        near: set[NodeRecord] = set()
+        for owner in candidates:
+            if isinstance(owner, NodeRecord):
+                near.add(owner)
+            elif isinstance(owner, Node) and str(owner.id) in self.records:
+                near.add(self.records[str(owner.id)])
+        wanted: set[NodeRecord] = self.with_neighbours(near)
+        if self.groups:
+            wanted = {record for record in wanted if self.folded(record.id) is None}
+        keep: set[int] = set()
+        if detailed:
+            for arrow in visible_arrows:
+                wanted.add(self.record_of(arrow.start))
+                wanted.add(self.record_of(arrow.end))
+            keep = set(self.geometry.in_rect(view, margin * 2).tolist())
+
+        for record in [record for record in self.materialized if record not in wanted and record.index not in keep]:
+            self.dematerialize(record)
+        for record in wanted:
+            if record.node is None:
+                self.materialize(record)
+        self.refresh_arrows()
+
+    def detail(self) -> Detail:
+        return Detail.of_scale(self.camera.scale)
+
     def update(self) -> NoReturn:
         if self.load_input:
             self.image_app.update()
             return
 
+        if self.layout_job is not None and self.layout_job.done():
+            job, self.layout_job = self.layout_job, None
+            positions: dict[str, Tuple2D] = {node_id: point for node_id, point in job.result().items()
+                                             if node_id in self.records}
+            before: dict[str, Tuple2D] = {node_id: self.camera.to_world(self.records[node_id].pos)
+                                          for node_id in positions}
+            self.history.do(PlaceNodes(before, positions), self)
+
+        view: tuple[int, int, int, int] = (0, 0, config.screen_size[0], config.screen_size[1])
+        detail: Detail = self.detail()
+        visible_arrows: list[ArrowRecord] = self.visible_arrows(view) if detail > Detail.points else []
+        if self.view_dirty:
+            self.sync_viewport(view, visible_arrows)
         self.surface.fill('white')
-        for arrow in self.arrows:
-            arrow.draw(self.surface)
+        if detail >= Detail.no_text:
+            IText.hidden = detail < Detail.full
+            self.draw_group_frames(view)
+            for arrow in visible_arrows:
+                if arrow.arrow is not None:
+                    arrow.arrow.draw(self.surface)
+            self.draw_folded_arrows(view)
+            owners: list[Any] = self.geometry.owners
+            for i in self.geometry.in_rect(view):
+                if isinstance(owners[i], (Node, GroupNode)):
+                    owners[i].draw(self.surface)
+            IText.hidden = False
+        else:
+            self.draw_overview(view, visible_arrows, detail)
+        self.draw_problems(view)
         if self.choosen_arrow:
             self.choosen_arrow.draw(self.surface)
-        for node in self.nodes:
-            if node.pos[0] + node.size[0] < 0 or node.pos[1] + node.size[1] < 0 or node.pos[0] > config.screen_size[0] or node.pos[1] > config.screen_size[1]:
-                continue
-            node.draw(self.surface)
+        self.minimap.draw(self.surface)
         if self.action_bar:
             self.action_bar.draw(self.surface)
+        if self.show_memory:
+            ledger.draw_report(self.surface)
 
         self.ui_manager.update(1.371)
         self.ui_manager.draw_ui(self.surface)
@@ -909,103 +2710,265 @@ class Editor(Screen):
         pg.display.update()
         self.serialize()
 
-    def serialize(self) -> NoReturn:
-        initial: tuple[Node, ...] = tuple(filter(lambda node: node.initial, self.nodes))
-        _dict = {
-            'version': '1.1',
-            'nodes': {node.id: node.__my_dict__() for node in self.nodes},
-            'arrows': [i.__my_dict__() for i in self.arrows],
-            'initial': initial[0].id if len(initial) > 0 else 0
-        }
-        with open(config.get_file_game(), mode='w') as file:
-            json.dump(_dict, file, indent=' ' * 4)
+    def draw_overview(self, view: Rect4, visible_arrows: list[ArrowRecord], detail: Detail) -> NoReturn:
+        """Поле без объектов нод: прямоугольники цвета ноды и тонкие линии стрелок или только точки."""
+        store: GeometryStore = self.geometry
+        rows: np.ndarray = store.in_rect(view)
+        if detail == Detail.points:
+            pixels: np.ndarray = pg.surfarray.pixels3d(self.surface)
+            store.draw_points(pixels, rows)
+            # поверхность заблокирована, пока жив массив её пикселей
+            del pixels
+            return
+
+        # линия от низа ноды-начала к верху ноды-конца, координаты сразу для всех стрелок
+        starts: np.ndarray = np.fromiter((self.record_of(arrow.start).index for arrow in visible_arrows),
+                                         dtype=np.intp, count=len(visible_arrows))
+        ends: np.ndarray = np.fromiter((self.record_of(arrow.end).index for arrow in visible_arrows),
+                                       dtype=np.intp, count=len(visible_arrows))
+        first: np.ndarray = np.take(store.pos, starts, axis=0) + np.take(store.size, starts, axis=0) * (0.5, 1)
+        second: np.ndarray = np.take(store.pos, ends, axis=0) + np.take(store.size, ends, axis=0) * (0.5, 0)
+        for arrow, one, two in zip(visible_arrows, first.tolist(), second.tolist()):
+            pg.draw.line(self.surface, arrow.color, one, two)
+        self.draw_folded_arrows(view)
+        owners: list[Any] = store.owners
+        for i, (x, y), (w, h), color in zip(rows.tolist(), store.pos[rows].tolist(), store.size[rows].tolist(),
+                                            store.color[rows].tolist()):
+            owner: Any = owners[i]
+            if getattr(owner, 'choosen', False):
+                color = (255, 0, 0)
+            if isinstance(owner, CircleNode) or isinstance(owner, NodeRecord) and owner.type == CircleNode.node_type:
+                pg.draw.circle(self.surface, color, (x, y), max(w, 1))
+            else:
+                self.surface.fill(color, (x, y, max(w, 1), max(h, 1)))
+
+    def draw_group_frames(self, view: Rect4) -> NoReturn:
+        for group in self.groups.values():
+            if group.collapsed:
+                continue
+            bbox: Optional[Rect4] = self.geometry.bbox(self.records[member].index for member in group.members
+                                                       if member in self.records)
+            if bbox is not None and pg.Rect(view).colliderect(pg.Rect(bbox).inflate(60, 100)):
+                group.draw_frame(self.surface, bbox)
+
+    def draw_folded_arrows(self, view: Rect4) -> NoReturn:
+        """Стрелки в свёрнутые группы и из них: по одной линии на каждую пару строк."""
+        _, _, _, _, folded, starts, ends = self.arrow_rows
+        if not folded:
+            return
+        store: GeometryStore = self.geometry
+        rows: np.ndarray = np.flatnonzero(store.spans_rect(starts, ends, view, margin=30))
+        first: np.ndarray = store.pos[starts[rows]] + store.size[starts[rows]] * (0.5, 1)
+        second: np.ndarray = store.pos[ends[rows]] + store.size[ends[rows]] * (0.5, 0)
+        for i, one, two in zip(rows.tolist(), first.tolist(), second.tolist()):
+            pg.draw.line(self.surface, folded[i].color, one, two, width=2)
+
+    def fold_arrows(self, arrows: list[ArrowRecord], starts: np.ndarray,
+                    ends: np.ndarray) -> tuple[np.ndarray, list[ArrowRecord], np.ndarray, np.ndarray]:
+        """Переводит концы стрелок, лежащие в свёрнутых группах, на строки групп. Возвращает маску обычных стрелок
+        и стрелки групп без повторов; стрелки внутри одной группы не рисуются вовсе."""
+        normal: np.ndarray = np.ones(len(arrows), dtype=bool)
+        lines: dict[tuple[int, int], ArrowRecord] = {}
+        # обходятся только стрелки нод из свёрнутых групп, а не все стрелки проекта
+        touched: set[ArrowRecord] = set()
+        for group in self.groups.values():
+            group.incoming = group.outgoing = 0
+            if group.collapsed:
+                for member in group.members:
+                    if member in self.records:
+                        for node_id in self.records[member].ids():
+                            touched.update(self.incident.get(node_id, ()))
+        position: dict[ArrowRecord, int] = {arrow: i for i, arrow in enumerate(arrows)}
+        for i in sorted(position[arrow] for arrow in touched):
+            arrow: ArrowRecord = arrows[i]
+            start: Optional[GroupNode] = self.folded(arrow.start)
+            end: Optional[GroupNode] = self.folded(arrow.end)
+            normal[i] = False
+            if start is end:
+                continue
+            if start is not None:
+                starts[i] = start.index
+                start.outgoing += 1
+            if end is not None:
+                ends[i] = end.index
+                end.incoming += 1
+            lines.setdefault((int(starts[i]), int(ends[i])), arrow)
+        pairs: np.ndarray = np.array(list(lines), dtype=np.intp).reshape(-1, 2)
+        return normal, list(lines.values()), pairs[:, 0], pairs[:, 1]
+
+    def visible_arrows(self, view: Rect4) -> list[ArrowRecord]:
+        if self.arrow_rows is None or self.arrow_rows[0] != self.arrows_version:
+            arrows: list[ArrowRecord] = list(self.arrow_records)
+            # ответ лежит внутри своей ноды выбора, поэтому для отсечения хватает строки ноды
+            starts: np.ndarray = np.fromiter((self.record_of(arrow.start).index for arrow in arrows), dtype=np.intp,
+                                             count=len(arrows))
+            ends: np.ndarray = np.fromiter((self.record_of(arrow.end).index for arrow in arrows), dtype=np.intp,
+                                           count=len(arrows))
+            folded: list[ArrowRecord] = []
+            folded_starts: np.ndarray = np.zeros(0, dtype=np.intp)
+            folded_ends: np.ndarray = np.zeros(0, dtype=np.intp)
+            if any(group.collapsed for group in self.groups.values()):
+                normal, folded, folded_starts, folded_ends = self.fold_arrows(arrows, starts, ends)
+                arrows = [arrow for arrow, keep in zip(arrows, normal.tolist()) if keep]
+                starts, ends = starts[normal], ends[normal]
+            self.arrow_rows = (self.arrows_version, arrows, starts, ends, folded, folded_starts, folded_ends)
+        _, arrows, starts, ends, _, _, _ = self.arrow_rows
+        return [arrows[i] for i in np.flatnonzero(self.geometry.spans_rect(starts, ends, view, margin=30))]
+
+    @tracer.trace('Editor.serialize')
+    def serialize(self, force: bool = False) -> NoReturn:
+        """Записывает изменённые главы (force — все загруженные) и, при необходимости, манифест."""
+        if self.project is None:
+            return
+        chapters: set[str] = {name for name, chapter in self.project.chapters.items() if chapter.loaded} \
+            if force else set(self.dirty)
+        if not chapters and not self.manifest_dirty and not force:
+            return
+
+        nodes: dict[str, list[NodeRecord]] = {name: [] for name in chapters}
+        initial: list[Node | NodeRecord] = []
+        for record in self.records.values():
+            current: Node | NodeRecord = record.node if record.node is not None else record
+            if current.chapter in nodes:
+                nodes[current.chapter].append(record)
+            if current.initial:
+                initial.append(current)
+        groups: dict[str, dict[str, dict]] = {name: {} for name in chapters}
+        for group in self.groups.values():
+            if group.chapter in groups:
+                groups[group.chapter][str(group.id)] = self.camera.dict_to_world(group.__my_dict__())
+        arrows: dict[str, list[dict]] = {name: [] for name in chapters}
+        links: list[dict] = []
+        for arrow in self.arrow_records:
+            start: str = self.current_of(arrow.start).chapter
+            end: str = self.current_of(arrow.end).chapter
+            if start != end:
+                links.append(dict(arrow.__my_dict__(), start_chapter=start, end_chapter=end))
+            elif start in arrows:
+                arrows[start].append(arrow.__my_dict__())
+
+        if self.project.legacy:
+            _dict = {
+                'version': '1.1',
+                'nodes': {record.id: self.camera.dict_to_world(record.__my_dict__()) for record in nodes.get('main', ())},
+                'arrows': arrows.get('main', []),
+                'initial': int(initial[0].id) if len(initial) > 0 else 0
+            }
+            # ключ, которого не знают старые версии, пишется только при наличии групп
+            if groups.get('main'):
+                _dict['groups'] = groups['main']
+            if 'main' in chapters:
+                self.project.write_chapter('main', _dict)
+        else:
+            for name in chapters:
+                _dict = {
+                    'version': '2.0',
+                    'nodes': {record.id: self.camera.dict_to_world(record.__my_dict__()) for record in nodes[name]},
+                    'arrows': arrows[name]
+                }
+                if groups[name]:
+                    _dict['groups'] = groups[name]
+                bbox: Optional[Rect4] = self.geometry.bbox(record.index for record in nodes[name])
+                self.project.chapters[name].bbox = self.camera.rect_to_world(bbox) if bbox is not None else None
+                self.project.write_chapter(name, _dict)
+
+            if len(initial) > 0:
+                self.project.initial, self.project.initial_chapter = str(initial[0].id), initial[0].chapter
+            elif self.project.initial_chapter in self.project.chapters and \
+                    self.project.chapters[self.project.initial_chapter].loaded:
+                self.project.initial = None
+            self.project.links = links + self.pending_links
+            self.project.next_id = Node.next_id
+            self.project.save_manifest()
+
+        self.dirty.clear()
+        self.manifest_dirty = False
 
     @staticmethod
-    def deserialize(is_mini_should: bool = True) -> Self:
+    @tracer.trace('Editor.deserialize')
+    def deserialize(is_mini_should: bool = True, screen: Optional[ScreenLoading] = None) -> Self:
+        project: Project = Project()
         editor: Editor = Editor()
+        editor.project = project
+        editor.pending_links = list(project.links)
+        Node.next_id = max(Node.next_id, project.next_id)
+
+        # сначала открываются только глава с начальной нодой и главы, видимые на экране
+        view: Rect = editor.surface.get_rect()
+        names: list[str] = [chapter.name for chapter in project.chapters.values()
+                            if chapter.name == project.initial_chapter or
+                            chapter.bbox is not None and view.colliderect(chapter.bbox)]
+        if not names and project.chapters:
+            names = [next(iter(project.chapters))]
+        editor.current_chapter = project.initial_chapter if project.initial_chapter in names else names[0]
+        editor.is_mini_should = is_mini_should
+        editor.load_chapters(names, screen)
+        editor.refresh_chapter_menu()
+        return editor
+
+    def playtest(self) -> 'Playtest':
+        """Проба игры с экрана play_from по нодам и стрелкам в памяти, без сохранения и разбора глав:
+        граф пересобирается только для экранов, изменённых с прошлой пробы."""
+        from story import StoryCompiler, Playtest
+        with tracer.span('Editor.playtest', changes=-1 if self.story_changes is None else len(self.story_changes)):
+            if self.story_compiler is None:
+                self.story_compiler = StoryCompiler()
+            changed: Optional[set[str]] = self.story_changes
+            # интерактивные ноды правятся мимо записей
+            for record in self.materialized if changed is None else map(self.record_of, changed):
+                if record is not None and record.node is not None:
+                    record.sync(record.node)
+            links: defaultdict[str, list[str]] = defaultdict(list)
+            for link in self.pending_links:
+                links[link['start']].append(link['end'])
+
+            def outgoing(node_id: str) -> list[str]:
+                return [arrow.end for arrow in self.incident.get(node_id, ()) if arrow.start == node_id] + \
+                    links.get(node_id, [])
+
+            story: dict[str, 'StoryNode'] = self.story_compiler.compile(self.records, self.answer_records, outgoing, changed)
+            self.story_changes = set()
+        start, self.play_from = self.play_from, None
+        return Playtest(story, start, self.project,
+                        [name for name, chapter in self.project.chapters.items() if chapter.loaded])
+
+    def suspend(self) -> list[str]:
+        """Изменённые главы и атлас сохраняются; ноды, миниатюры, история отмены и процессы остаются."""
+        self.serialize()
+        atlas.save()
+        if self.project is None:
+            return []
+        return [config.get_file_game()] + [self.project.chapter_path(name) for name in self.project.chapters]
 
-        def recognition_graphic(graphic: dict) -> tuple[Color, Tuple2D]:
-            color: list[int] = graphic['color']
-            return Color(color[0], color[1], color[2], color[3]), tuple(graphic['position'])
-
-        with open(config.get_file_game(), mode='r', encoding='utf-8') as file:
-            data: dict = json.load(file)
-        if data == {}:
-            return editor
-        nodes: dict = data['nodes']
-        arrows: dict = data['arrows']
-        initial: str = str(data['initial'])
-        final_nodes: dict[str, Node] = {}
-        final_arrows: list[Arrow] = []
-        for node_hash in nodes.keys():
-            node: dict = nodes[node_hash]
-            c, p = recognition_graphic(node)
-            node_obj = None
-            match node['type']:
-                case 1:
-                    node_obj = CircleNode(p, node['radius'], c)
-                case 2:
-                    node_obj = ImageNode(p, c, node['image_path'], tuple(node['size']), centering=False,
-                                         is_mini_should=is_mini_should)
-                case 3:
-                    node_obj = ChoosenNode(p, c, False)
-                    node_obj.size = node['size']
-
-                    answers = node['answers']
-                    for ans_hash in answers:
-                        answer = answers[ans_hash]
-                        c, p = recognition_graphic(answer)
-
-                        answer_obj = Answer(p, node_obj, c)
-                        answer_obj.set_text(answer['text'])
-                        final_nodes[ans_hash] = answer_obj
-                        node_obj.answers.append(answer_obj)
-                    node_obj.set_pos(node_obj.pos)
-
-                case 4:
-                    node_obj = VarNode(p, c, tuple(node['size']), centering=False)
-
-                case 5:
-                    node_obj = ConditionNode(p, c, tuple(node['size']), centering=False)
-
-            if node.get('text'):
-                text: str = node['text']
-                node_obj.text = text
-            if node_hash == initial:
-                node_obj.initial = True
-            final_nodes[node_hash] = node_obj
+    def resume(self) -> NoReturn:
+        super().resume()
+        self.view_dirty = True
 
-        for arrow in arrows:
-            c, _ = recognition_graphic(arrow)
-            start_hash: str = arrow['start']
-            end_hash: str = arrow['end']
-
-            if 'text' in arrow:
-                text = arrow['text']
-                if text == 'Yes':
-                    conn = final_nodes[start_hash].connector2
-                else:
-                    conn = final_nodes[start_hash].connector3
-                final_arrows.append(TextArrow(conn, final_nodes[end_hash].connector1, c, text))
-            else:
-                final_arrows.append(Arrow(final_nodes[start_hash].connector2, final_nodes[end_hash].connector1, c))
-        editor.nodes = list(v for v in final_nodes.values() if not isinstance(v, Answer))
-        editor.arrows = final_arrows
-        return editor
+    def release(self) -> NoReturn:
+        if self.layout_pool is not None:
+            self.layout_pool.shutdown(wait=False, cancel_futures=True)
+            self.layout_pool = None
+        self.image_app.shutdown()
 
     def close_editor(self) -> NoReturn:
-        self.serialize()
-        files = glob.glob(f'{config.get_dir_mini()}/*')
-        for f in files:
+        self.release()
+        self.serialize(force=True)
+        atlas.save()
+        # миниатюры прежних версий лежали отдельными файлами
+        for f in glob.glob(f'{config.get_dir_mini()}/*.jpeg'):
             os.remove(f)
 
     def control(self, events: list[Event]) -> bool | str:
+        # пакет импорта после «Назад» доделывается в фоне: готовые картинки собираются каждый кадр
+        self.image_app.poll()
         if self.load_input:
             return self.image_app.control(events)
 
         pos: Tuple2D = pg.mouse.get_pos()
-        mouse: tuple[bool, ...] = pg.mouse.get_pressed()
         keys = pg.key.get_pressed()
+        # при медленном кадре в очереди копятся десятки движений мыши: каждое двигало бы выделение
+        # и всё поле отдельно, поэтому серии движений обрабатываются одним сдвигом
+        events = coalesce_motion(events)
 
         not_change_state: tuple[int, ...] = (
             pg.MOUSEMOTION,
@@ -1016,12 +2979,6 @@ class Editor(Screen):
             pg.WINDOWCLOSE
         )
 
-        def move_all_nodes(move: Tuple2D, pause: bool = False) -> NoReturn:
-            if pause:
-                time.sleep(0.0001)
-            for node in self.nodes:
-                node.set_pos((node.pos[0] + move[0], node.pos[1] + move[1]))
-
         for event in events:
             # print(event)
             # action bar
@@ -1030,15 +2987,45 @@ class Editor(Screen):
                     if event.type == pg.MOUSEBUTTONDOWN and event.button == 1:
                         self.action_bar_handler(pos)
                     self.clear_action_bar()
+                    if self.play_from is not None:
+                        return 'play'
                     break
 
             match event.type:
+                case pg.KEYDOWN if event.key == pg.K_F2:
+                    # отчёт о памяти, занятой поверхностями ассетов
+                    self.show_memory = not self.show_memory
+
+                case pg.KEYDOWN if event.key == pg.K_F3:
+                    self.minimap.visible = not self.minimap.visible
+
+                case pg.KEYDOWN if event.key == pg.K_F6:
+                    # переход к следующей ноде с проблемой
+                    self.next_problem()
+
+                case pg.KEYDOWN if event.key == pg.K_f and event.mod & pg.KMOD_CTRL:
+                    self.toggle_search()
+
+                case pg.KEYDOWN if event.key in (pg.K_z, pg.K_y) and event.mod & pg.KMOD_CTRL and not self.typing():
+                    # Ctrl+Z — отмена, Ctrl+Y и Ctrl+Shift+Z — повтор
+                    self.undo(redo=event.key == pg.K_y or bool(event.mod & pg.KMOD_SHIFT))
+
+                case pygame_gui.UI_TEXT_ENTRY_CHANGED if event.ui_element is self.search_entry:
+                    self.search(event.text)
+
+                case pygame_gui.UI_SELECTION_LIST_NEW_SELECTION if event.ui_element is self.search_results:
+                    # переход к найденной ноде
+                    self.show_search_hit(event.text)
+
                 case pg.MOUSEBUTTONDOWN:
                     match event.button:
+                        # переход к месту поля, на которое нажали на миникарте
+                        case 1 if (point := self.minimap.hit(pos, self.surface.get_size())) is not None:
+                            self.jump_to(point)
                         # выбор ноды или начало стрелки
                         case 1:
                             match self.node_handler(pos):
-                                case Node() as node:
+                                case Node() | GroupNode() as node:
                                     mode: bool = True if keys[pg.K_LSHIFT] else False
                                     self.add_choosen_node(node, mode)
                                 case Connector() as conn:
@@ -1053,28 +3040,35 @@ class Editor(Screen):
                         # отмена выбора ноды и удаление связей с коннектором
                         case 3:
                             match self.node_handler(pos):
-                                case Node() as node:
+                                case Node() | GroupNode() as node:
                                     self.activate_action_bar(pos, node)
                                     if node in self.choosen_nodes.keys():
                                         node.choosen = False
                                         self.choosen_nodes.pop(node)
                                 case Connector() as conn:
-                                    self.arrows = [arrow for arrow in self.arrows if
-                                                   arrow.start is not conn and arrow.end is not conn]
+                                    removed: list[dict] = [arrow.__my_dict__() for arrow in self.arrows
+                                                           if arrow.start is conn or arrow.end is conn]
+                                    self.set_arrows([arrow for arrow in self.arrows if
+                                                     arrow.start is not conn and arrow.end is not conn])
+                                    if removed:
+                                        self.history.push(Inverse(AddArrows(removed)))
                                 case None:
                                     self.activate_action_bar(pos)
 
                 case pg.MOUSEBUTTONUP:
+                    self.view_dirty = True
+                    self.history.seal()
                     match event.button:
                         case 1:
                             # отмена выбора ноды и завершение стрелки
                             if len(self.choosen_nodes) > 0:
-                                self.choosen_nodes = dict((k, v) for k, v in self.choosen_nodes.items() if v)
-                                for node in self.nodes:
-                                    if node not in self.choosen_nodes.keys():
+                                kept: dict[Node, bool] = dict((k, v) for k, v in self.choosen_nodes.items() if v)
+                                for node in self.choosen_nodes:
+                                    if node not in kept:
                                         node.choosen = False
+                                self.choosen_nodes = kept
                             if self.choosen_arrow is not None:
-                                for node in self.nodes:
+                                for node in self.nodes_near(pos):
                                     connector: Connector = node.get_connector(pos)
                                     if connector:
                                         self.choosen_arrow.end = connector
@@ -1092,62 +3086,39 @@ class Editor(Screen):
                                         if self.choosen_arrow.start.is_receiver:
                                             self.choosen_arrow.end = self.choosen_arrow.start
                                             self.choosen_arrow.start = connector
-                                        self.arrows.append(self.choosen_arrow)
+                                        self.add_arrow(self.choosen_arrow)
+                                        self.history.push(AddArrows([self.choosen_arrow.record.__my_dict__()]))
                                         break
                                 self.choosen_arrow = None
 
                 case pg.MOUSEMOTION:
                     # перемещение выбранных нод и перемещение конца стрелки и перемещение всего поля
+                    # кнопки — из самого события: состояние до цикла не видит отпусканий внутри кадра
                     if pg.mouse.get_focused():
-                        if mouse[0]:
+                        if event.buttons[0]:
 
                             if len(self.choosen_nodes) > 0:
-                                for cnode in self.choosen_nodes:
-                                    cnode.set_pos((cnode.pos[0] + event.rel[0], cnode.pos[1] + event.rel[1]))
+                                ids: tuple[str, ...] = tuple(str(cnode.id) for cnode in self.choosen_nodes)
+                                scale: float = self.camera.scale
+                                self.history.do(MoveNodes(ids, (event.rel[0] / scale, event.rel[1] / scale)), self)
 
                             if self.choosen_arrow is not None:
-                                self.choosen_arrow.end = pos
+                                self.choosen_arrow.end = event.pos
 
-                        elif mouse[1]:
-                            move_all_nodes(event.rel)
+                        elif event.buttons[1]:
+                            self.move_all_nodes(event.rel)
 
                 case pg.MOUSEWHEEL:
-                    def calculations(size: tuple[float, float], dy: float) -> tuple[float, float]:
-                        x = size[0] + dy * 5
-                        koef = (x - size[0]) / 100 / 2 + 1
-                        return x, koef
-
-                    for node in self.nodes:
-                        if isinstance(node, ImageNode) and node.image_mini is not None:
-                            x, koef = calculations(node.size, event.y)
-                            y = x * 9 / 16
-                            if y < 10:
-                                continue
-                            create_miniature(node.path_image, (x, y))
-                            path_mini = f'{config.get_dir_mini()}/{node.path_image[: node.path_image.find(".")]}.jpeg'
-                            node.image_mini = pg.image.load(path_mini).convert()
-                            node.size = (x, y)
-                            node.set_pos((node.pos[0] * koef, node.pos[1] * koef))
-                        elif isinstance(node, VarNode) or isinstance(node, ConditionNode):
-                            x, koef = calculations(node.size, event.y)
-                            y = x * 9 / 16
-                            if y < 10:
-                                continue
-                            node.size = (x, y)
-                            node.set_pos((node.pos[0] * koef, node.pos[1] * koef))
-                        elif isinstance(node, ChoosenNode):
-                            x, koef = calculations(node.answers[0].size, event.y)
-                            node.size = (x, x / 3 * len(node.answers) + len(node.answers))
-                            for answer in node.answers:
-                                answer.size = (x, x / 3)
-                            node.set_pos((node.pos[0] * koef, node.pos[1] * koef))
-                    print(event.y)
+                    self.zoom(1 + event.y / 40)
+
+                case pygame_gui.UI_DROP_DOWN_MENU_CHANGED if event.ui_element is self.chapter_menu:
+                    self.open_chapter(event.text)
 
             if event.type == pygame_gui.UI_BUTTON_PRESSED:
                 match event.ui_element:
                     case self.input_box.button_ok:
                         self.input_box.deactivate()
-                        self.input_box.node.set_text(self.input_box.entry.get_text())
+                        self.edit_text(self.input_box.node, self.input_box.entry.get_text())
                     case self.input_box.button_cancel:
                         self.input_box.deactivate()
                     case self.button_menu:
@@ -1155,13 +3126,13 @@ class Editor(Screen):
 
                     case self.var_box.button_ok:
                         self.var_box.deactivate()
-                        self.var_box.node.set_text(f'{self.var_box.entry.get_text()} {"=" if self.var_box.mode.get_single_selection() == "Установить" else "+=" if self.var_box.mode.get_single_selection() == "Увеличить" else "-="} {self.var_box.input_value.get_text()}')
+                        self.edit_text(self.var_box.node, f'{self.var_box.entry.get_text()} {"=" if self.var_box.mode.get_single_selection() == "Установить" else "+=" if self.var_box.mode.get_single_selection() == "Увеличить" else "-="} {self.var_box.input_value.get_text()}')
                     case self.var_box.button_cancel:
                         self.var_box.deactivate()
 
                     case self.cond_box.button_ok:
                         self.cond_box.deactivate()
-                        self.cond_box.node.set_text(f'{self.cond_box.entry.get_text()} {self.cond_box.mode.get_single_selection()} {self.cond_box.input_value.get_text()}')
+                        self.edit_text(self.cond_box.node, f'{self.cond_box.entry.get_text()} {self.cond_box.mode.get_single_selection()} {self.cond_box.input_value.get_text()}')
                     case self.cond_box.button_cancel:
                         self.cond_box.deactivate()
 
@@ -1170,16 +3141,16 @@ class Editor(Screen):
         if keys[pg.K_RIGHT] or keys[pg.K_LEFT] or keys[pg.K_UP] or keys[pg.K_DOWN]:
             speed: int = 20
             if keys[pg.K_RIGHT]:
-                move_all_nodes((-speed, 0), True)
+                self.move_all_nodes((-speed, 0), True)
 
             if keys[pg.K_LEFT]:
-                move_all_nodes((speed, 0), True)
+                self.move_all_nodes((speed, 0), True)
 
             if keys[pg.K_UP]:
-                move_all_nodes((0, speed), True)
+                self.move_all_nodes((0, speed), True)
 
             if keys[pg.K_DOWN]:
-                move_all_nodes((0, -speed), True)
+                self.move_all_nodes((0, -speed), True)
             return True
 
         # подсветка кнопок экшен бара
@@ -1187,6 +3158,7 @@ class Editor(Screen):
             if self.action_bar is not None:
                 self.action_bar.backlight(pos)
 
-        if len(events) > 0:
+        # готовая раскладка применяется в update
+        if len(events) > 0 or self.layout_job is not None and self.layout_job.done():
             return True
         return False
@@ -1,56 +1,41 @@
-import os
-from enum import Enum, auto
-from typing import NoReturn, TypeVar, Final, Self, Optional
+from typing import NoReturn, Final, Optional
 
 import pygame as pg
 import pygame_gui
 from pygame import Surface, Event
 
-from app import Screen
-from config import Config, resource_path
-from editor import Editor, Node, ImageNode, ChoosenNode, Answer
+from app import Screen, ScreenLoading, SharedThemeManager
+from assets import AssetLedger, SurfaceRegistry
+from bundle import Bundle
+from config import Config
+from editor import NodeRecord, ArrowRecord, ProjectBuilder
+from loader import BackgroundLoader
+from project import Project, resolve_image
+from session import Session, stamp_of
+from story import StoryNode, Transition, TransitionType, Playtest, compile_story
+from tracing import Tracer
 
 config: Final[Config] = Config()
+tracer: Final[Tracer] = Tracer()
+ledger: Final[AssetLedger] = AssetLedger()
+registry: Final[SurfaceRegistry] = SurfaceRegistry()
+session: Final[Session] = Session()
 
 pg.font.init()
 
 
-EN = TypeVar("EN", bound=Node)
-
-
 class GameNode:
-    def __init__(self, node: EN) -> NoReturn:
-        self.editor_node: EN = node
-        self.nexts: list[Transition | Self] = []
-
-        if isinstance(node, Answer):
-            self.initial: bool = node.node.initial
-        else:
-            self.initial: bool = node.initial
-
-
-class TransitionType(Enum):
-    null = auto()
-    press_button = auto()
-    expression = auto()
-
-
-class Transition:
-    def __init__(self, result: GameNode, t_type: TransitionType = TransitionType.null,
-                 button_text: str = None) -> NoReturn:
-        self.condition = None
-        self.result: GameNode = result
-        self.t_type: TransitionType = t_type
-        self.button_text: str = button_text
-
-    def __repr__(self):
-        return f'{self.result}, {self.t_type}, {self.button_text}'
+    def __init__(self, node: StoryNode) -> NoReturn:
+        self.story_node: StoryNode = node
+        self.nexts: list[Transition] = node.transitions
+        self.initial: bool = node.initial
 
 
 class ImageGameNode(GameNode):
-    def __init__(self, node: ImageNode, manager: pygame_gui.UIManager) -> NoReturn:
+    def __init__(self, node: StoryNode, manager: pygame_gui.UIManager, bundle: Optional[Bundle] = None) -> NoReturn:
         super().__init__(node)
         self.manager: pygame_gui.UIManager = manager
+        self.bundle: Optional[Bundle] = bundle
 
         self.image: Optional[Surface] = None
         self.textbox = None
@@ -65,11 +50,22 @@ class ImageGameNode(GameNode):
     def setup(self) -> NoReturn:
         if self.textbox is not None:
             self.textbox.kill()
-        if self.editor_node.path_image is not None and os.path.exists(self.editor_node.path_image):
-            self.image: Surface = pg.image.load(self.editor_node.path_image).convert()
-            self.image: Surface = pg.transform.scale(self.image, config.screen_size)
-
-        text: str = f"<font face='freesans' size=6.5> {self.editor_node.text} </font>"
+        image: Optional[str] = self.story_node.path_image
+        if self.bundle is not None and image in self.bundle.assets:
+            # фон уже уменьшен при сборке и читается прямо из её файла
+            self.image: Surface = registry.acquire(
+                ('bundle', self.bundle.path, image, config.screen_size),
+                lambda: ledger.track(self.bundle.background(image, config.screen_size),
+                                     self.story_node, f'{self.bundle.path}:{image}', 'background'), keep=True)
+        path: Optional[str] = resolve_image(image) if self.bundle is None else None
+        if path is not None:
+            # экраны с одним фоном делят одну поверхность: переход между ними ничего не декодирует
+            self.image: Surface = registry.acquire(
+                ('background', path, config.screen_size, stamp_of(path)),
+                lambda: ledger.track(pg.transform.scale(pg.image.load(path).convert(), config.screen_size),
+                                     self.story_node, path, 'background'), keep=True)
+
+        text: str = f"<font face='freesans' size=6.5> {self.story_node.text} </font>"
         self.textbox = pygame_gui.elements.UITextBox(html_text=text,
                                                      relative_rect=pg.Rect(0, config.screen_size[1] * 0.8, config.screen_size[0], config.screen_size[1] * 0.2),
                                                      manager=self.manager,
@@ -78,7 +74,7 @@ class ImageGameNode(GameNode):
                                                          'right': 'right',
                                                          'top': 'top',
                                                          'bottom': 'bottom'})
-        if self.editor_node.text == '':
+        if self.story_node.text == '':
             self.textbox.hide()
 
     def setup_buttons(self) -> NoReturn:
@@ -103,6 +99,12 @@ class ImageGameNode(GameNode):
                                                                  ))
                 x += w + indent
 
+    def kill(self) -> NoReturn:
+        self.textbox.kill()
+        for but in self.buttons:
+            but.kill()
+        self.buttons = []
+
     def is_have_buttons(self) -> bool:
         return len(tuple(filter(lambda tr: tr.t_type is TransitionType.press_button, self.nexts))) > 0
 
@@ -111,97 +113,146 @@ class ImageGameNode(GameNode):
             surface.blit(self.image, self.image.get_rect(center=surface.get_rect().center))
         else:
             surface.fill('white')
-        if self.editor_node.text != '':
+        if self.story_node.text != '':
             self.textbox.show()
 
         if len(self.buttons) <= 0:
             self.setup_buttons()
 
 
-class ChoosenGameNode(GameNode):
-    def __init__(self, node: ChoosenNode, editor: Editor) -> NoReturn:
-        super().__init__(node)
-        self.game_answers: list[tuple[str, Node]] = []
-        for ans in node.answers:
-            cur_arrows = tuple(filter(lambda ar: ans is ar.start.node, editor.arrows))
-            if len(cur_arrows) <= 0:
-                continue
-            arrow = cur_arrows[0]
-
-            self.game_answers.append((ans.text, arrow.end.node))
-
+class GameScreen(Screen):
+    def __init__(self, loading: Optional[ScreenLoading] = None, bundle: Optional[Bundle] = None,
+                 playtest: Optional[Playtest] = None) -> NoReturn:
+        # игра из сборки: граф уже скомпилирован целиком, проекта и глав нет
+        self.bundle: Optional[Bundle] = bundle
+        # проба из редактора: главы редактора уже в графе и не выгружаются
+        self.playtest: Optional[Playtest] = None
+        self.project: Optional[Project] = None
+        # загруженные главы: записи нод и стрелок внутри главы
+        self.chapters: dict[str, tuple[list[NodeRecord], list[ArrowRecord]]] = {}
+        self.story: dict[str, StoryNode] = {}
 
-N = TypeVar("N", bound=GameNode)
+        super().__init__()
+        self.ui_manager = SharedThemeManager(self.surface.get_size(), 'theme1.json')
+        self.show_memory: bool = False
+        self.current_node: Optional[ImageGameNode] = None
+        self.start(loading, playtest)
+
+    def start(self, loading: Optional[ScreenLoading] = None, playtest: Optional[Playtest] = None) -> NoReturn:
+        """Игра с начального экрана или, при пробе, с экрана, выбранного в редакторе. Главы, файлы которых
+        не менялись с прошлого запуска, не разбираются."""
+        if self.current_node is not None:
+            self.current_node.kill()
+            self.current_node = None
+        self.playtest = playtest
+        if self.bundle is not None:
+            self.story = self.bundle.story
+        elif playtest is not None:
+            # граф редактора пересобирается им самим, игра дописывает в копию главы с диска
+            self.project = playtest.project
+            self.story = dict(playtest.story)
+            self.chapters = {name: ([], []) for name in playtest.chapters}
+            self.enter(playtest.start)
+            return
+        else:
+            self.project = Project()
+            self.chapters, self.story = {}, {}
+            start: Optional[str] = self.project.initial_chapter
+            if start is not None:
+                self.load_chapters([start] + sorted(self.project.neighbours(start)), loading)
+
+        initials = tuple(filter(lambda node: node.initial, self.story.values()))
+        if len(initials) > 0:
+            self.enter(initials[0].id)
+
+    def resume(self, playtest: Optional[Playtest] = None) -> NoReturn:
+        super().resume()
+        self.start(playtest=playtest)
+
+    @staticmethod
+    def parse_chapter(name: str, path: str,
+                      loading: Optional[ScreenLoading]) -> tuple[list[NodeRecord], list[ArrowRecord], Optional[str]]:
+        builder: ProjectBuilder = ProjectBuilder([(name, path)])
+        loader: BackgroundLoader = BackgroundLoader(builder.build)
+        if loading is None:
+            loader.run_here()
+        else:
+            loader.wait(loading)
+        return list(builder.records.values()), builder.arrows, builder.initial
 
+    def load_chapters(self, names: list[str], loading: Optional[ScreenLoading] = None) -> NoReturn:
+        names = [name for name in names if name not in self.chapters and name in self.project.chapters]
+        if not names:
+            return
+        for name in names:
+            path: str = self.project.chapter_path(name)
+            # записи глав общие с Session, поэтому начальный экран отмечается в графе, а не в записи
+            records, arrows, initial = session.chapter(path, lambda: self.parse_chapter(name, path, loading))
+            if self.project.legacy:
+                self.project.initial = initial
+            self.chapters[name] = (records, arrows)
+        self.build_graph()
+
+    def unload_unreachable(self, chapter: str) -> bool:
+        reachable: set[str] = self.project.reachable(chapter)
+        unreachable: list[str] = [name for name in self.chapters if name not in reachable]
+        for name in unreachable:
+            del self.chapters[name]
+        return len(unreachable) > 0
+
+    @tracer.trace('GameScreen.build_graph')
+    def build_graph(self) -> NoReturn:
+        records: list[NodeRecord] = [record for chapter_records, _ in self.chapters.values() for record in chapter_records]
+        arrows: list[ArrowRecord] = [arrow for _, chapter_arrows in self.chapters.values() for arrow in chapter_arrows]
+        self.story = compile_story(records, arrows, self.project.links)
+        if self.project.initial in self.story:
+            self.story[self.project.initial].initial = True
+
+    def enter(self, node_id: str) -> bool:
+        """Переход на экран; глава экрана и соседние с ней подгружаются, недостижимые выгружаются."""
+        if self.playtest is not None:
+            self.enter_playtest(node_id)
+        elif self.bundle is None:
+            self.enter_chapter(node_id)
+        if node_id not in self.story:
+            return False
+
+        if self.current_node is not None:
+            self.current_node.kill()
+        self.current_node = ImageGameNode(self.story[node_id], self.ui_manager, self.bundle)
+        return True
 
-class GameScreen(Screen):
-    def __init__(self) -> NoReturn:
-        super().__init__()
-        self.ui_manager = pygame_gui.UIManager(self.surface.get_size(), resource_path('theme1.json'))
-        self.editor: Editor = Editor.deserialize(False)
-        self.initial_node: GameNode = None
-        self.nodes: list[N] = []
-        self.buttons: list[pygame_gui.elements.UIButton]
-
-        for arrow in self.editor.arrows:
-            start: tuple[N] = tuple(filter(lambda node: node.editor_node is arrow.start.node, self.nodes))
-            end: tuple[N] = tuple(filter(lambda node: node.editor_node is arrow.end.node, self.nodes))
-
-            if len(start) <= 0:
-                s_node = self._craft_node(arrow.start.node)
-                if bool(s_node):
-                    self.nodes.append(s_node)
-            else:
-                s_node = start[0]
-
-            if len(end) <= 0:
-                e_node = self._craft_node(arrow.end.node)
-                self.nodes.append(e_node)
-            else:
-                e_node = end[0]
-
-            if bool(s_node):
-                s_node.nexts.append(e_node)
-
-        for node in self.nodes:
-            next_choosen = tuple(filter(lambda next: isinstance(next, ChoosenGameNode), node.nexts))
-            if len(next_choosen) <= 0:
-                new_nexts = [Transition(n) for n in node.nexts]
-                node.nexts = new_nexts
-                continue
-
-            choosen: ChoosenGameNode = next_choosen[0]
-            node.nexts = []
-
-            for text, next_n in choosen.game_answers:
-                result = tuple(filter(lambda n: n.editor_node is next_n, self.nodes))
-                node.nexts.append(Transition(result[0], TransitionType.press_button, button_text=text))
-
-        self.nodes = list(filter(lambda n: isinstance(n, ImageGameNode), self.nodes))
-
-        initials = tuple(filter(lambda node: node.initial, self.nodes))
-        self.current_node: ImageGameNode = initials[0] if len(initials) > 0 else None
-
-    def _craft_node(self, node: Node) -> N | bool:
-        match node:
-            case ImageNode() as node:
-                return ImageGameNode(node, self.ui_manager)
-            case ChoosenNode() as node:
-                return ChoosenGameNode(node, self.editor)
-            case _:
-                return False
+    def enter_chapter(self, node_id: str) -> NoReturn:
+        if node_id not in self.story:
+            chapter: Optional[str] = self.project.find_chapter(node_id)
+            if chapter is not None:
+                self.load_chapters([chapter])
+        if node_id not in self.story:
+            return
+        chapter = self.story[node_id].chapter
+        missing: list[str] = [name for name in [chapter] + sorted(self.project.neighbours(chapter))
+                              if name not in self.chapters]
+        unloaded: bool = self.unload_unreachable(chapter)
+        if missing:
+            self.load_chapters(missing)
+        elif unloaded:
+            self.build_graph()
+
+    def enter_playtest(self, node_id: str) -> NoReturn:
+        """При пробе незагруженная в редакторе глава разбирается с диска и дописывается в граф."""
+        chapter: Optional[str] = self.project.find_chapter(node_id) if node_id not in self.story else None
+        if chapter is None or chapter in self.chapters or chapter not in self.project.chapters:
+            return
+        path: str = self.project.chapter_path(chapter)
+        records, arrows, _ = session.chapter(path, lambda: self.parse_chapter(chapter, path, None))
+        self.chapters[chapter] = (records, arrows)
+        for story_id, story_node in compile_story(records, arrows, self.project.links).items():
+            self.story.setdefault(story_id, story_node)
 
     def step(self, id_result: int = 0) -> NoReturn:
         if len(self.current_node.nexts) <= 0:
             return
-
-        self.current_node.textbox.hide()
-        if self.current_node.is_have_buttons():
-            for but in self.current_node.buttons:
-                but.kill()
-            self.current_node.buttons = []
-
-        self.current_node = self.current_node.nexts[id_result].result
+        self.enter(self.current_node.nexts[id_result].result)
 
     def update(self) -> NoReturn:
         if self.current_node is None:
@@ -210,14 +261,22 @@ class GameScreen(Screen):
 
         self.ui_manager.update(1.371)
         self.ui_manager.draw_ui(self.surface)
+        if self.show_memory:
+            ledger.draw_report(self.surface)
         pg.display.update()
 
     def control(self, events: list[Event]) -> bool | str:
         if self.current_node is None:
-            return 'menu'
+            return 'menu' if self.playtest is None else 'editor'
         for event in events:
             match event.type:
+                case pg.KEYDOWN if event.key == pg.K_ESCAPE and self.playtest is not None:
+                    # проба окончена: назад в редактор, к той же правке
+                    return 'editor'
                 case pg.KEYDOWN:
+                    if event.key == pg.K_F2:
+                        self.show_memory = not self.show_memory
+                        return True
                     if event.key == pg.K_h:
                         if not self.current_node.is_have_buttons():
                             self.step()
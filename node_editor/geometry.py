@@ -0,0 +1,118 @@
+from typing import NoReturn, Optional, Any, Iterable
+
+import numpy as np
+
+from config import Tuple2D
+
+Rect4 = tuple[float, float, float, float]
+
+
+class GeometryStore:
+    """Позиции и размеры нод редактора (в экранных координатах) в массивах NumPy.
+    Нода хранит только номер своей строки, поэтому сдвиг, масштаб и отсечение невидимого —
+    одна векторная операция на всё поле, а не цикл по нодам."""
+
+    def __init__(self, capacity: int = 1024) -> NoReturn:
+        self.pos: np.ndarray = np.zeros((capacity, 2))
+        self.size: np.ndarray = np.zeros((capacity, 2))
+        # цвет строки (RGB) — по нему рисуется обзор поля без объектов нод
+        self.color: np.ndarray = np.zeros((capacity, 3), dtype=np.uint8)
+        self.alive: np.ndarray = np.zeros(capacity, dtype=bool)
+        # живые строки, которые не рисуются и не ловят курсор: ноды внутри свёрнутой группы
+        self.hidden: np.ndarray = np.zeros(capacity, dtype=bool)
+        self.owners: list[Any] = [None] * capacity
+        self.count: int = 0
+        self.free: list[int] = []
+
+    def __len__(self) -> int:
+        return self.count - len(self.free)
+
+    def _grow(self) -> NoReturn:
+        capacity: int = len(self.alive)
+        self.pos = np.concatenate((self.pos, np.zeros((capacity, 2))))
+        self.size = np.concatenate((self.size, np.zeros((capacity, 2))))
+        self.color = np.concatenate((self.color, np.zeros((capacity, 3), dtype=np.uint8)))
+        self.alive = np.concatenate((self.alive, np.zeros(capacity, dtype=bool)))
+        self.hidden = np.concatenate((self.hidden, np.zeros(capacity, dtype=bool)))
+        self.owners += [None] * capacity
+
+    def allocate(self, owner: Any, position: Tuple2D, size: Tuple2D = (0, 0)) -> int:
+        if self.free:
+            index: int = self.free.pop()
+        else:
+            if self.count == len(self.alive):
+                self._grow()
+            index = self.count
+            self.count += 1
+        self.pos[index] = position
+        self.size[index] = size
+        self.alive[index] = True
+        self.hidden[index] = False
+        self.owners[index] = owner
+        return index
+
+    def paint(self, index: int, color: Any) -> NoReturn:
+        self.color[index] = (color[0], color[1], color[2])
+
+    def release(self, index: int) -> NoReturn:
+        if not self.alive[index]:
+            return
+        self.alive[index] = False
+        self.owners[index] = None
+        self.free.append(index)
+
+    def hide(self, indices: Iterable[int], hidden: bool = True) -> NoReturn:
+        self.hidden[np.fromiter(indices, dtype=np.intp)] = hidden
+
+    def shown(self, indices: np.ndarray | slice) -> np.ndarray:
+        """Маска строк из indices, которые живы и не спрятаны."""
+        return self.alive[indices] & ~self.hidden[indices]
+
+    def move(self, delta: Tuple2D) -> NoReturn:
+        self.pos[:self.count] += delta
+
+    def zoom(self, koef: float) -> NoReturn:
+        """Масштабирование относительно левого верхнего угла экрана, как у Camera.zoom."""
+        self.pos[:self.count] *= koef
+        self.size[:self.count] *= koef
+
+    def in_rect(self, rect: Rect4, margin: float = 0) -> np.ndarray:
+        """Номера живых и не спрятанных строк, чей прямоугольник (расширенный на margin) пересекает rect."""
+        x, y, w, h = rect
+        pos: np.ndarray = self.pos[:self.count]
+        end: np.ndarray = pos + self.size[:self.count]
+        mask: np.ndarray = self.alive[:self.count] & ~self.hidden[:self.count] & \
+            (end[:, 0] >= x - margin) & (end[:, 1] >= y - margin) & \
+            (pos[:, 0] <= x + w + margin) & (pos[:, 1] <= y + h + margin)
+        return np.flatnonzero(mask)
+
+    def spans_rect(self, starts: np.ndarray, ends: np.ndarray, rect: Rect4, margin: float = 0) -> np.ndarray:
+        """Маска пар строк (стрелок), общий прямоугольник которых пересекает rect."""
+        x, y, w, h = rect
+        # np.take по оси намного быстрее индексации массивом номеров для таблицы из двух столбцов
+        first: np.ndarray = np.take(self.pos, starts, axis=0)
+        second: np.ndarray = np.take(self.pos, ends, axis=0)
+        high: np.ndarray = np.maximum(first + np.take(self.size, starts, axis=0),
+                                      second + np.take(self.size, ends, axis=0))
+        low: np.ndarray = np.minimum(first, second, out=first)
+        return (high[:, 0] >= x - margin) & (high[:, 1] >= y - margin) & \
+            (low[:, 0] <= x + w + margin) & (low[:, 1] <= y + h + margin)
+
+    def bbox(self, indices: Iterable[int]) -> Optional[Rect4]:
+        rows: np.ndarray = np.fromiter(indices, dtype=np.intp)
+        if len(rows) == 0:
+            return None
+        low: np.ndarray = self.pos[rows].min(axis=0)
+        high: np.ndarray = (self.pos[rows] + self.size[rows]).max(axis=0)
+        return float(low[0]), float(low[1]), float(high[0] - low[0]), float(high[1] - low[1])
+
+    def draw_points(self, pixels: np.ndarray, indices: np.ndarray) -> NoReturn:
+        """Ставит в pixels (массив pygame.surfarray.pixels3d) точку 2x2 цвета строки в центре каждой из строк."""
+        width, height = pixels.shape[:2]
+        centers: np.ndarray = (np.take(self.pos, indices, axis=0) + np.take(self.size, indices, axis=0) / 2).astype(np.intp)
+        inside: np.ndarray = (centers[:, 0] >= 0) & (centers[:, 0] < width - 1) & \
+            (centers[:, 1] >= 0) & (centers[:, 1] < height - 1)
+        xs, ys = centers[inside, 0], centers[inside, 1]
+        colors: np.ndarray = np.take(self.color, indices[inside], axis=0)
+        for dx, dy in ((0, 0), (1, 0), (0, 1), (1, 1)):
+            pixels[xs + dx, ys + dy] = colors
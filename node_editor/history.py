@@ -0,0 +1,104 @@
+import pickle
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import NoReturn, Any
+
+
+class Command(ABC):
+    """Обратимая правка. Хранит только то, что нужно для её отмены и повтора (id, сдвиги, тексты,
+    словари затронутых нод), а не снимок проекта, и применяется к цели, которую ей передают."""
+
+    __slots__ = ()
+
+    @abstractmethod
+    def undo(self, target: Any) -> NoReturn:
+        pass
+
+    @abstractmethod
+    def redo(self, target: Any) -> NoReturn:
+        pass
+
+    def merge(self, other: 'Command') -> bool:
+        """Поглощает следующую команду того же жеста (например, очередной сдвиг при перетаскивании)."""
+        return False
+
+    def weight(self) -> int:
+        """Примерный размер команды в байтах — размер её полей в pickle."""
+        return len(pickle.dumps([getattr(self, name) for name in self.__slots__]))
+
+
+class Inverse(Command):
+    """Обратная команда: удаление — это отменённое добавление с теми же данными."""
+
+    __slots__ = ('command',)
+
+    def __init__(self, command: Command) -> NoReturn:
+        self.command: Command = command
+
+    def undo(self, target: Any) -> NoReturn:
+        self.command.redo(target)
+
+    def redo(self, target: Any) -> NoReturn:
+        self.command.undo(target)
+
+    def weight(self) -> int:
+        return self.command.weight()
+
+
+class History:
+    """Стеки отмены и повтора. Память ограничена суммарным весом команд: старые команды отбрасываются,
+    когда он превышает limit. Отмена и повтор стоят столько же, сколько сама правка."""
+
+    def __init__(self, limit: int) -> NoReturn:
+        self.limit: int = limit
+        self.done: deque[tuple[Command, int]] = deque()
+        self.undone: list[tuple[Command, int]] = []
+        self.used: int = 0
+        # последняя команда ещё может поглотить следующую: жест (перетаскивание) не закончен
+        self.open: bool = False
+
+    def push(self, command: Command) -> NoReturn:
+        """Запоминает уже выполненную правку."""
+        for _, weight in self.undone:
+            self.used -= weight
+        self.undone.clear()
+        if self.open and self.done and self.done[-1][0].merge(command):
+            return
+        weight: int = command.weight()
+        self.done.append((command, weight))
+        self.used += weight
+        self.open = True
+        while self.used > self.limit and len(self.done) > 1:
+            self.used -= self.done.popleft()[1]
+
+    def do(self, command: Command, target: Any) -> NoReturn:
+        command.redo(target)
+        self.push(command)
+
+    def seal(self) -> NoReturn:
+        """Конец жеста: следующая команда не сливается с последней."""
+        self.open = False
+
+    def undo(self, target: Any) -> bool:
+        if not self.done:
+            return False
+        item: tuple[Command, int] = self.done.pop()
+        item[0].undo(target)
+        self.undone.append(item)
+        self.open = False
+        return True
+
+    def redo(self, target: Any) -> bool:
+        if not self.undone:
+            return False
+        item: tuple[Command, int] = self.undone.pop()
+        item[0].redo(target)
+        self.done.append(item)
+        self.open = False
+        return True
+
+    def clear(self) -> NoReturn:
+        self.done.clear()
+        self.undone.clear()
+        self.used = 0
+        self.open = False
@@ -0,0 +1,139 @@
+import hashlib
+import io
+import json
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import NoReturn, Iterable, Final
+
+import pygame as pg
+from pygame import Surface
+
+# файлы, которые берутся из папки при пакетном импорте
+IMAGE_SUFFIXES: tuple[str, ...] = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tga', '.webp')
+# индекс имён в папке загрузок: исходное имя картинки -> файл, под которым она хранится
+NAMES: Final[str] = 'names.json'
+# длина хэша содержимого в имени файла, шестнадцатеричных знаков
+DIGEST: int = 16
+
+
+def fit(size: tuple[int, int], limit: tuple[int, int]) -> tuple[int, int]:
+    """Размер, уменьшенный с сохранением пропорций так, чтобы уместиться в limit. Меньшие не растут."""
+    k: float = min(1.0, limit[0] / size[0], limit[1] / size[1])
+    return max(1, round(size[0] * k)), max(1, round(size[1] * k))
+
+
+def stored_name(data: bytes) -> str:
+    return f'{hashlib.sha256(data).hexdigest()[:DIGEST]}.jpeg'
+
+
+def name_of(source: str) -> str:
+    """Имя картинки без папки и расширения."""
+    return os.path.splitext(os.path.basename(source.replace('\\', '/')))[0]
+
+
+def transcode(source: str, directory: str, limit: tuple[int, int]) -> str:
+    """Сохраняет картинку в папку загрузок под хэшем её содержимого и возвращает имя файла. Такой же файл,
+    импортированный раньше, не декодируется и не пишется второй раз.
+
+    Декодирует, уменьшает до limit и кодирует в JPEG. Выполняется в рабочем процессе, поэтому обходится
+    без окна: convert() недоступен, и глубина цвета выравнивается копированием."""
+    with open(source, 'rb') as file:
+        data: bytes = file.read()
+    name: str = stored_name(data)
+    target: str = f'{directory}/{name}'
+    if os.path.exists(target):
+        return name
+    image: Surface = pg.image.load(io.BytesIO(data), source)
+    size: tuple[int, int] = fit(image.get_size(), limit)
+    if size != image.get_size():
+        if image.get_bitsize() not in (24, 32):
+            # smoothscale работает только с 24- и 32-битными поверхностями
+            full: Surface = Surface(image.get_size(), pg.SRCALPHA, 32)
+            full.blit(image, (0, 0))
+            image = full
+        image = pg.transform.smoothscale(image, size)
+    # запись через временный файл: два процесса с одинаковыми картинками не испортят друг другу результат
+    temporary: str = f'{target}.{os.getpid()}.jpeg'
+    pg.image.save(image, temporary)
+    os.replace(temporary, target)
+    return name
+
+
+def sources_of(path: str) -> list[str]:
+    """Картинки папки (без вложенных) или сам файл."""
+    if not os.path.isdir(path):
+        return [path]
+    return sorted(entry.path for entry in os.scandir(path)
+                  if entry.is_file() and entry.name.lower().endswith(IMAGE_SUFFIXES))
+
+
+class NameIndex:
+    """Исходные имена картинок в папке загрузок, где файлы названы хэшами содержимого."""
+
+    def __init__(self, directory: str) -> NoReturn:
+        self.path: str = f'{directory}/{NAMES}'
+        self.files: dict[str, str] = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as file:
+                self.files = json.load(file)
+
+    def add(self, name: str, file: str) -> NoReturn:
+        """Одно имя у разных картинок не затирает файлы: индекс просто указывает на последнюю."""
+        self.files[name] = file
+
+    def names_of(self, file: str) -> list[str]:
+        return [name for name, stored in self.files.items() if stored == file]
+
+    def save(self) -> NoReturn:
+        with open(self.path, 'w', encoding='utf-8') as file:
+            json.dump(self.files, file, ensure_ascii=False, indent=1, sort_keys=True)
+
+
+class BatchImport:
+    """Пакет картинок, перекодируемых в пуле процессов. Интерфейс не ждёт рабочих: он раз в кадр
+    вызывает poll, который только собирает завершённые задачи для прогресса."""
+
+    def __init__(self, pool: ProcessPoolExecutor, directory: str, limit: tuple[int, int]) -> NoReturn:
+        self.pool: ProcessPoolExecutor = pool
+        self.directory: str = directory
+        self.limit: tuple[int, int] = limit
+        # задача -> исходник
+        self.pending: dict[Future, str] = {}
+        self.total: int = 0
+        # сохранённые файлы в порядке готовности и исходники, которые не удалось прочитать
+        self.imported: list[str] = []
+        self.failed: list[str] = []
+
+    def add(self, sources: Iterable[str]) -> NoReturn:
+        for source in sources:
+            self.total += 1
+            if os.path.dirname(os.path.abspath(source)) == os.path.abspath(self.directory):
+                # файл уже лежит в загрузках: перекодировать его в себя незачем
+                self.imported.append(os.path.basename(source))
+                continue
+            self.pending[self.pool.submit(transcode, source, self.directory, self.limit)] = source
+
+    @property
+    def done(self) -> int:
+        return len(self.imported) + len(self.failed)
+
+    @property
+    def finished(self) -> bool:
+        return not self.pending
+
+    def poll(self) -> list[tuple[str, str]]:
+        """Исходники, сохранённые с прошлого вызова, и имена их файлов в загрузках."""
+        ready: list[Future] = [future for future in self.pending if future.done()]
+        saved: list[tuple[str, str]] = []
+        for future in ready:
+            source: str = self.pending.pop(future)
+            if future.cancelled() or future.exception() is not None:
+                self.failed.append(source)
+            else:
+                saved.append((source, future.result()))
+                self.imported.append(future.result())
+        return saved
+
+    def cancel(self) -> NoReturn:
+        for future in self.pending:
+            future.cancel()
@@ -0,0 +1,243 @@
+from collections import defaultdict, deque
+from typing import Iterable, Optional
+
+Tuple2D = tuple[float, float]
+# ребро графа: (начало, конец, место выхода на нижней стороне начала от 0 до 1 — порядок ответа, Да/Нет)
+Edge = tuple[str, str, float]
+
+GAP: Tuple2D = (60, 100)
+DUMMY_WIDTH: float = 20
+# ребро длиннее стольких слоёв не разбивается фиктивными нодами и не участвует в упорядочивании:
+# иначе редкие далёкие переходы (возвраты в начало сюжета) плодят фиктивных нод больше, чем настоящих
+MAX_SPAN: int = 8
+
+
+def break_cycles(nodes: list[str], succ: dict[str, list[str]]) -> set[tuple[str, str]]:
+    """Обратные рёбра обхода в глубину: развернув их, получаем граф без циклов.
+    Обход начинается с истоков, чтобы развернулись рёбра, ведущие назад по сюжету."""
+    indegree: dict[str, int] = dict.fromkeys(nodes, 0)
+    for node in nodes:
+        for child in succ[node]:
+            indegree[child] += 1
+    roots: list[str] = [node for node in nodes if indegree[node] == 0] + nodes
+    state: dict[str, int] = {}
+    back: set[tuple[str, str]] = set()
+    for root in roots:
+        if root in state:
+            continue
+        state[root] = 1
+        stack: list[tuple[str, int]] = [(root, 0)]
+        while stack:
+            node, i = stack[-1]
+            children: list[str] = succ[node]
+            if i == len(children):
+                state[node] = 2
+                stack.pop()
+                continue
+            stack[-1] = (node, i + 1)
+            child: str = children[i]
+            if child not in state:
+                state[child] = 1
+                stack.append((child, 0))
+            elif state[child] == 1:
+                back.add((node, child))
+    return back
+
+
+def assign_layers(nodes: list[str], succ: dict[str, list[str]]) -> tuple[dict[str, int], list[str]]:
+    """Слой ноды — длина самого длинного пути до неё от истока; возвращает слои и топологический порядок."""
+    indegree: dict[str, int] = dict.fromkeys(nodes, 0)
+    for node in nodes:
+        for child in succ[node]:
+            indegree[child] += 1
+    queue: deque[str] = deque(node for node in nodes if indegree[node] == 0)
+    layer: dict[str, int] = dict.fromkeys(nodes, 0)
+    order: list[str] = []
+    while queue:
+        node = queue.popleft()
+        order.append(node)
+        for child in succ[node]:
+            layer[child] = max(layer[child], layer[node] + 1)
+            indegree[child] -= 1
+            if indegree[child] == 0:
+                queue.append(child)
+    return layer, order
+
+
+def count_crossings(upper: list[str], lower: list[str], succ: dict[str, list[tuple[str, float]]]) -> int:
+    """Число пересечений рёбер между соседними слоями (дерево Фенвика по позициям нижнего слоя)."""
+    position: dict[str, int] = {node: i for i, node in enumerate(lower)}
+    ends: list[int] = []
+    for node in upper:
+        ends += sorted(position[child] for child, _ in succ[node])
+    tree: list[int] = [0] * (len(lower) + 1)
+    crossings: int = 0
+    for seen, end in enumerate(ends):
+        # рёбра выше по порядку, уходящие правее текущего, пересекают его
+        i, before = end + 1, 0
+        while i > 0:
+            before += tree[i]
+            i -= i & -i
+        crossings += seen - before
+        i = end + 1
+        while i <= len(lower):
+            tree[i] += 1
+            i += i & -i
+    return crossings
+
+
+def order_layers(layers: list[list[str]], succ: dict[str, list[tuple[str, float]]],
+                 pred: dict[str, list[tuple[str, float]]], sweeps: int = 4) -> list[list[str]]:
+    """Уменьшение пересечений методом барицентров: проходы сверху вниз и снизу вверх,
+    остаётся порядок с наименьшим числом пересечений. Порт ребра сдвигает барицентр внутри
+    ячейки родителя, поэтому дети ноды выбора идут в порядке ответов, а «Да» — левее «Нет»."""
+
+    def total(layout: list[list[str]]) -> int:
+        return sum(count_crossings(layout[i], layout[i + 1], succ) for i in range(len(layout) - 1))
+
+    best: list[list[str]] = [list(layer) for layer in layers]
+    best_crossings: int = total(best)
+    current: list[list[str]] = [list(layer) for layer in layers]
+    for sweep in range(sweeps):
+        down: bool = sweep % 2 == 0
+        indices: Iterable[int] = range(1, len(current)) if down else range(len(current) - 2, -1, -1)
+        for i in indices:
+            fixed: dict[str, int] = {node: j for j, node in enumerate(current[i - 1 if down else i + 1])}
+            neighbours: dict[str, list[tuple[str, float]]] = pred if down else succ
+            keys: dict[str, float] = {}
+            for j, node in enumerate(current[i]):
+                linked: list[tuple[str, float]] = neighbours[node]
+                if not linked:
+                    keys[node] = j
+                elif down:
+                    keys[node] = sum(fixed[parent] + (port - 0.5) * 0.9 for parent, port in linked) / len(linked)
+                else:
+                    keys[node] = sum(fixed[child] for child, _ in linked) / len(linked)
+            current[i].sort(key=keys.__getitem__)
+        crossings: int = total(current)
+        if crossings < best_crossings:
+            best, best_crossings = [list(layer) for layer in current], crossings
+    return best
+
+
+def place(values: list[float], widths: list[float], gap: float) -> list[float]:
+    """Ставит левые края нод слоя как можно ближе к желаемым, не меняя порядок и не допуская наложений:
+    среднее упаковки слева направо и справа налево тоже не имеет наложений."""
+    left: list[float] = []
+    for i, value in enumerate(values):
+        left.append(value if i == 0 else max(value, left[-1] + widths[i - 1] + gap))
+    right: list[float] = [0.0] * len(values)
+    for i in range(len(values) - 1, -1, -1):
+        right[i] = values[i] if i == len(values) - 1 else min(values[i], right[i + 1] - widths[i] - gap)
+    return [(a + b) / 2 for a, b in zip(left, right)]
+
+
+def assign_x(layers: list[list[str]], widths: dict[str, float], succ: dict[str, list[tuple[str, float]]],
+             pred: dict[str, list[tuple[str, float]]], gap: float, rounds: int = 4) -> dict[str, float]:
+    """Левые края: сначала плотная упаковка, затем каждая нода тянется к медиане соседей по рёбрам."""
+    x: dict[str, float] = {}
+    for layer in layers:
+        offset: float = 0.0
+        for node in layer:
+            x[node] = offset
+            offset += widths[node] + gap
+
+    def center(node: str) -> float:
+        return x[node] + widths[node] / 2
+
+    for sweep in range(rounds):
+        down: bool = sweep % 2 == 0
+        for layer in layers[1:] if down else layers[-2::-1]:
+            wanted: list[float] = []
+            for node in layer:
+                if down:
+                    points: list[float] = sorted(x[parent] + widths[parent] * port for parent, port in pred[node])
+                else:
+                    points = sorted(center(child) for child, _ in succ[node])
+                wanted.append(points[len(points) // 2] - widths[node] / 2 if points else x[node])
+            for node, value in zip(layer, place(wanted, [widths[node] for node in layer], gap)):
+                x[node] = value
+    return x
+
+
+def layered(sizes: dict[str, Tuple2D], edges: list[Edge], origin: Tuple2D = (0, 0),
+            gap: Tuple2D = GAP) -> dict[str, Tuple2D]:
+    """Послойная раскладка (Sugiyama): разрыв циклов, назначение слоёв, уменьшение пересечений и расстановка
+    по горизонтали. Возвращает левые верхние углы нод; рёбра с концами вне sizes пропускаются."""
+    nodes: list[str] = list(sizes)
+    edges = [(start, end, port) for start, end, port in edges if start in sizes and end in sizes and start != end]
+    succ: dict[str, list[str]] = {node: [] for node in nodes}
+    for start, end, _ in edges:
+        succ[start].append(end)
+    back: set[tuple[str, str]] = break_cycles(nodes, succ)
+
+    dag: dict[str, list[str]] = {node: [] for node in nodes}
+    oriented: list[Edge] = []
+    for start, end, port in edges:
+        if (start, end) in back:
+            start, end, port = end, start, 0.5
+        dag[start].append(end)
+        oriented.append((start, end, port))
+    layer, order = assign_layers(nodes, dag)
+
+    # длинные рёбра разбиваются фиктивными нодами, чтобы каждое ребро соединяло соседние слои
+    widths: dict[str, float] = {node: sizes[node][0] for node in nodes}
+    layered_succ: defaultdict[str, list[tuple[str, float]]] = defaultdict(list)
+    layered_pred: defaultdict[str, list[tuple[str, float]]] = defaultdict(list)
+    members: list[list[str]] = [[] for _ in range(max(layer.values(), default=-1) + 1)]
+    for node in order:
+        members[layer[node]].append(node)
+    dummies: int = 0
+    for start, end, port in oriented:
+        if layer[end] - layer[start] > MAX_SPAN:
+            continue
+        previous: str = start
+        for level in range(layer[start] + 1, layer[end]):
+            dummy: str = f'\0{dummies}'
+            dummies += 1
+            widths[dummy] = DUMMY_WIDTH
+            members[level].append(dummy)
+            layered_succ[previous].append((dummy, port))
+            layered_pred[dummy].append((previous, port))
+            previous, port = dummy, 0.5
+        layered_succ[previous].append((end, port))
+        layered_pred[end].append((previous, port))
+
+    layers: list[list[str]] = order_layers(members, layered_succ, layered_pred)
+    x: dict[str, float] = assign_x(layers, widths, layered_succ, layered_pred, gap[0])
+
+    left: float = min(x.values(), default=0.0)
+    positions: dict[str, Tuple2D] = {}
+    y: float = origin[1]
+    for level in layers:
+        height: float = max((sizes[node][1] for node in level if node in sizes), default=0.0)
+        for node in level:
+            if node in sizes:
+                positions[node] = (x[node] - left + origin[0], y)
+        y += height + gap[1]
+    return positions
+
+
+def neighbourhood(changed: Iterable[str], edges: list[Edge], depth: int = 2) -> set[str]:
+    """Ноды не дальше depth рёбер (в любую сторону) от изменённых."""
+    adjacent: defaultdict[str, list[str]] = defaultdict(list)
+    for start, end, _ in edges:
+        adjacent[start].append(end)
+        adjacent[end].append(start)
+    result: set[str] = set(changed)
+    frontier: set[str] = set(result)
+    for _ in range(depth):
+        frontier = {other for node in frontier for other in adjacent[node]} - result
+        result |= frontier
+    return result
+
+
+def relayout(positions: dict[str, Tuple2D], sizes: dict[str, Tuple2D], edges: list[Edge], changed: Iterable[str],
+             depth: int = 2, gap: Tuple2D = GAP) -> dict[str, Tuple2D]:
+    """Инкрементальный режим: раскладывает заново только окрестность изменённых нод и ставит её туда,
+    где она была (левый верхний угол её прежней рамки); остальные ноды не двигаются."""
+    area: set[str] = neighbourhood((node for node in changed if node in sizes), edges, depth) & sizes.keys()
+    if not area:
+        return {}
+    origin: Optional[Tuple2D] = (min(positions[node][0] for node in area), min(positions[node][1] for node in area))
+    return layered({node: sizes[node] for node in area}, edges, origin, gap)
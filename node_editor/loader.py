@@ -0,0 +1,180 @@
+import codecs
+import json
+import os
+import queue
+import threading
+import time
+from typing import NoReturn, Optional, Any, Callable, Iterator, BinaryIO
+
+import pygame as pg
+
+from app import ScreenLoading
+
+WHITESPACE: str = ' \t\n\r'
+# символы, которыми может продолжаться число
+NUMBER_TAIL: str = '0123456789.eE+-'
+
+
+class JsonStream:
+    """Потоковое чтение JSON: объекты и массивы верхних уровней разбираются по одному элементу,
+    так что в памяти не держатся одновременно весь текст файла и весь словарь."""
+
+    CHUNK: int = 64 * 1024
+
+    def __init__(self, file: BinaryIO) -> NoReturn:
+        self._file: BinaryIO = file
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+        self._buffer: str = ''
+        self._pos: int = 0
+        self._eof: bool = False
+        self.bytes_read: int = 0
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        chunk: bytes = self._file.read(self.CHUNK)
+        self.bytes_read += len(chunk)
+        if not chunk:
+            self._eof = True
+        self._buffer = self._buffer[self._pos:] + self._decoder.decode(chunk, final=self._eof)
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char: str) -> NoReturn:
+        if self.peek() != char:
+            raise json.JSONDecodeError(f'Ожидался символ {char!r}', self._buffer, self._pos)
+        self._pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                obj, end = self._json.raw_decode(self._buffer, self._pos)
+                # число у самой границы буфера могло быть прочитано не полностью: '12' от '125', '-0' от '-0.5'
+                cut: bool = end >= len(self._buffer) or \
+                    isinstance(obj, (int, float)) and self._buffer[end] in NUMBER_TAIL
+                if not cut or self._eof:
+                    self._pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill()
+
+    def members(self) -> Iterator[str]:
+        """Ключи объекта; значение каждого ключа вызывающий код обязан прочитать до следующей итерации."""
+        self.expect('{')
+        if self.peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key: str = self.value()
+            self.expect(':')
+            yield key
+            if self.peek() == ',':
+                self._pos += 1
+                continue
+            self.expect('}')
+            return
+
+    def items(self) -> Iterator[Any]:
+        self.expect('[')
+        if self.peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ',':
+                self._pos += 1
+                continue
+            self.expect(']')
+            return
+
+
+def iter_project(path: str, progress: Callable[[float], Any] = lambda value: None) -> Iterator[tuple[str, Any]]:
+    """Файл игры по частям: ('node', (id, dict)), ('arrow', dict), остальные ключи — (ключ, значение)."""
+    size: int = max(os.path.getsize(path), 1)
+    with open(path, mode='rb') as file:
+        stream: JsonStream = JsonStream(file)
+        if stream.peek() == '':
+            return
+        for key in stream.members():
+            if key == 'nodes' and stream.peek() == '{':
+                for node_id in stream.members():
+                    yield 'node', (node_id, stream.value())
+                    progress(stream.bytes_read / size)
+            elif key == 'arrows' and stream.peek() == '[':
+                for arrow in stream.items():
+                    yield 'arrow', arrow
+                    progress(stream.bytes_read / size)
+            else:
+                yield key, stream.value()
+    progress(1.0)
+
+
+class BackgroundLoader(threading.Thread):
+    """Выполняет загрузку в рабочем потоке; всё, что требует дисплея (поверхности, шрифты),
+    рабочий поток кладёт в очередь, а главный поток исполняет её, пока крутит ScreenLoading."""
+
+    def __init__(self, job: Callable[['BackgroundLoader'], Any]) -> NoReturn:
+        super().__init__(daemon=True)
+        self.job: Callable[[BackgroundLoader], Any] = job
+        self.progress: float = 0.0
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.main_jobs: queue.Queue[Callable[[], Any]] = queue.Queue()
+
+    def run(self) -> NoReturn:
+        try:
+            self.result = self.job(self)
+        except BaseException as error:
+            self.error = error
+
+    def set_progress(self, value: float) -> NoReturn:
+        self.progress = value
+
+    def on_main_thread(self, job: Callable[[], Any]) -> NoReturn:
+        self.main_jobs.put(job)
+
+    def run_main_jobs(self, budget: float = 1 / 60) -> NoReturn:
+        deadline: float = time.perf_counter() + budget
+        while time.perf_counter() < deadline:
+            try:
+                job = self.main_jobs.get_nowait()
+            except queue.Empty:
+                return
+            job()
+
+    def wait(self, screen: Optional[ScreenLoading] = None) -> Any:
+        self.start()
+        clock = pg.time.Clock()
+        while self.is_alive() or not self.main_jobs.empty():
+            self.run_main_jobs()
+            if screen is not None:
+                pg.event.pump()
+                screen.progress = self.progress
+                screen.update()
+            clock.tick(60)
+        self.join()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def run_here(self) -> Any:
+        """Та же загрузка без отдельного потока."""
+        self.run()
+        while not self.main_jobs.empty():
+            self.main_jobs.get_nowait()()
+        if self.error is not None:
+            raise self.error
+        return self.result
@@ -1,17 +1,33 @@
+import os
 import sys
+from typing import Final
+
+from startup import StartupProfile
+
+startup: Final[StartupProfile] = StartupProfile()
+# профиль включается до остальных импортов, чтобы в него попали и они
+if '--startup' in sys.argv or os.environ.get('NOVEL_STARTUP'):
+    startup.enable(os.environ.get('NOVEL_STARTUP') or 'startup.json')
+
+import argparse
+import multiprocessing
 from enum import Enum, auto
-from typing import NoReturn, Union, Final
+from typing import NoReturn, Union, Optional, TYPE_CHECKING
 
 import pygame as pg
 from pygame import Event
 
-from app import Screen
+from app import Screen, ScreenLoading
 from config import Config
-from editor import Editor
-from game import GameScreen
-from menu import MenuScreen
+from session import Session
+from tracing import Tracer
+
+if TYPE_CHECKING:
+    from bundle import Bundle
 
 config: Final[Config] = Config()
+tracer: Final[Tracer] = Tracer()
+session: Final[Session] = Session()
 
 
 class AppState(Enum):
@@ -21,70 +37,124 @@ class AppState(Enum):
 
 
 class App:
-    def __init__(self) -> NoReturn:
-        pg.display.set_caption('Novel Application')
+    def __init__(self, bundle: Optional['Bundle'] = None) -> NoReturn:
+        pg.display.set_caption('Novel Application' if bundle is None else bundle.title)
         self.screen: Screen = None
         self.state: AppState = None
         self.path_file: str = config.get_root()
-        self.set_screen(AppState.menu)
-
-    def set_screen(self, screen: AppState) -> NoReturn:
+        # собранная игра: сразу игра, без меню и редактора
+        self.bundle: Optional['Bundle'] = bundle
+        if bundle is not None:
+            config.screen_size = bundle.sizes[0]
+        self.set_screen(AppState.menu if bundle is None else AppState.game)
+        startup.finish()
+
+    def set_screen(self, screen: AppState, **options) -> NoReturn:
+        """options — параметры экрана: при создании передаются в конструктор, при возврате — в resume."""
+        if self.bundle is not None and screen is not AppState.game:
+            self.quit()
         try:
-            if isinstance(self.screen, Editor):
-                self.screen.close_editor()
+            # прежний экран не выбрасывается: при возврате он продолжит работу, если проект не менялся
+            if self.state is not None:
+                session.suspend(self.state.name, self.screen)
 
+            with startup.phase(f'screen {screen.name}'):
+                self.screen = session.resume(screen.name, **options) or self.create_screen(screen, **options)
             self.state: AppState = screen
-
-            match screen:
-                case AppState.editor:
-                    self.screen = Editor.deserialize()
-                case AppState.game:
-                    self.screen = GameScreen()
-                case AppState.menu:
-                    self.screen = MenuScreen()
-            self.screen.update()
+            with startup.phase('draw'):
+                self.screen.update()
         except FileNotFoundError:
             print('Указан неправильный путь к файлу')
-            if isinstance(self.screen, MenuScreen):
+            if self.state is AppState.menu:
                 self.screen.alert.set_text('Не получается открыть файл игры')
 
+    def create_screen(self, screen: AppState, **options) -> Screen:
+        # модули экранов импортируются при первом переходе: до меню не грузятся редактор и игра
+        match screen:
+            case AppState.editor:
+                from editor import Editor
+                return Editor.deserialize(screen=ScreenLoading())
+            case AppState.game:
+                from game import GameScreen
+                return GameScreen(ScreenLoading(), self.bundle, **options)
+            case AppState.menu:
+                from menu import MenuScreen
+                return MenuScreen()
+
     def run(self):
         while True:
-            if pg.event.get(eventtype=(pg.QUIT, pg.WINDOWCLOSE)):
-                if self.state is AppState.editor:
-                    self.screen.close_editor()
-
-                pg.quit()
-                sys.exit()
-
-            events: list[Event] = pg.event.get()
-
-            for event in events:
-                if event.type == pg.KEYDOWN:
-                    match event.key:
-                        # case pg.K_1:
-                        #     self.set_screen(AppState.editor)
-                        # case pg.K_2:
-                        #     self.set_screen(AppState.game)
-                        case pg.K_3:
-                            self.set_screen(AppState.menu)
-                if event.type == pg.VIDEORESIZE:
-                    config.screen_size = self.screen.surface.get_size()
-
-            control: Union[bool, str] = self.screen.control(events)
-            if isinstance(control, str):
-                match control:
-                    case 'start':
-                        self.set_screen(AppState.game)
-                    case 'editor':
-                        self.set_screen(AppState.editor)
-                    case 'menu':
+            begin: int = tracer.now()
+            # цикл без паузы крутит сотни тысяч пустых кадров в секунду: они вытеснили бы из буфера
+            # спаны загрузки, поэтому пишутся только кадры, в которых что-то произошло
+            if self.frame():
+                tracer.record('frame', begin, state=self.state.name)
+
+    def frame(self) -> bool:
+        """Один проход цикла; True, если экран обработал события или перерисовался."""
+        if pg.event.get(eventtype=(pg.QUIT, pg.WINDOWCLOSE)):
+            self.quit()
+
+        events: list[Event] = pg.event.get()
+
+        for event in events:
+            if event.type == pg.KEYDOWN:
+                match event.key:
+                    # case pg.K_1:
+                    #     self.set_screen(AppState.editor)
+                    # case pg.K_2:
+                    #     self.set_screen(AppState.game)
+                    case pg.K_3:
                         self.set_screen(AppState.menu)
+            if event.type == pg.VIDEORESIZE:
+                config.screen_size = self.screen.surface.get_size()
+
+        control: Union[bool, str] = self.screen.control(events)
+        if isinstance(control, str):
+            match control:
+                case 'start':
+                    self.set_screen(AppState.game)
+                case 'editor':
+                    self.set_screen(AppState.editor)
+                case 'play':
+                    # редактор остаётся в Session и после пробы продолжит с того же места
+                    self.set_screen(AppState.game, playtest=self.screen.playtest())
+                case 'menu':
+                    self.set_screen(AppState.menu)
+            return True
+
+        if control:
+            self.screen.update()
+        return bool(control)
 
-            elif control:
-                self.screen.update()
+    def quit(self) -> NoReturn:
+        if self.state is AppState.editor:
+            self.screen.close_editor()
+        session.clear()
+
+        pg.quit()
+        sys.exit()
 
 
 if __name__ == '__main__':
-    app: App = App()
+    # в собранном PyInstaller файле рабочие процессы пулов (раскладка, импорт, сборка) запускают этот же exe:
+    # freeze_support выполняет в них задачу пула, а не редактор
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--trace', nargs='?', const='trace.json', default=os.environ.get('NOVEL_TRACE'),
+                        help='записать трассировку в формате Chrome trace (или переменная NOVEL_TRACE)')
+    parser.add_argument('--bundle', help='запустить игру из файла сборки (python bundle.py собирает его из проекта)')
+    parser.add_argument('--startup', nargs='?', const='startup.json',
+                        help='записать профиль запуска: импорты и фазы до первого кадра (или переменная NOVEL_STARTUP)')
+    args, _ = parser.parse_known_args()
+    if args.trace:
+        tracer.enable(args.trace)
+    if args.startup:
+        startup.enable(args.startup)
+
+    startup.mark('imports')
+    if args.bundle:
+        import bundle
+        app: App = App(bundle.Bundle(args.bundle))
+    else:
+        app: App = App()
     app.run()
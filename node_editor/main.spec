@@ -22,19 +22,18 @@ a = Analysis(
 )
 pyz = PYZ(a.pure)
 
+# сборка в папку, а не в один файл: однофайловый exe при каждом запуске распаковывает pygame, SDL и numpy
+# во временную папку, а сжатые UPX библиотеки ещё и разжимаются при загрузке
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.datas,
     [],
+    exclude_binaries=True,
     name='NovelEditor',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
+    upx=False,
     console=True,
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -42,3 +41,13 @@ exe = EXE(
     codesign_identity=None,
     entitlements_file=None,
 )
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='NovelEditor',
+)
@@ -1,36 +1,40 @@
 import os
-from typing import NoReturn, Final
+from typing import NoReturn, Final, Optional
 
 import pygame_gui
 import pygame as pg
 from pygame import Event
-from pygame_gui.elements import UIButton
+from pygame_gui.elements import UIButton, UIProgressBar
 
-from app import Screen
-from config import Config, resource_path
+from app import Screen, SharedThemeManager
+from config import Config
+from loader import BackgroundLoader
+from project import Project
+from session import Session
 
 config: Final[Config] = Config()
+session: Final[Session] = Session()
 
 
 def create_game_dir(path: str) -> NoReturn:
     if not os.path.isdir(os.path.join(path, 'images')):
         os.makedirs(os.path.join(path, 'images/temp_mini'))
         os.makedirs(os.path.join(path, 'images/upload'))
-    with open(os.path.join(path, 'game.json'), 'w') as file:
-        file.write('{}')
+    Project.create(path)
     config.set_root(path)
 
 
 class MenuScreen(Screen):
     def __init__(self) -> NoReturn:
         super().__init__()
-        self.ui_manager: pygame_gui.UIManager = pygame_gui.UIManager(self.surface.get_size(),
-                                                                     resource_path('theme.json'))
+        self.ui_manager: pygame_gui.UIManager = SharedThemeManager(self.surface.get_size(), 'theme.json')
 
         buttons: dict[str, tuple[int, int, int, int]] = {
             'Создать новую игру': (20, 60, 250, 30),
             'Открыть файл игры в редакторе': (20, 90, 250, 30),
             'Запустить игру из файла': (20, 120, 250, 30),
+            'Убрать неиспользуемые картинки': (20, 225, 250, 30),
+            'Собрать игру в один файл': (20, 255, 250, 30),
         }
 
         def _create_button(name: str) -> UIButton:
@@ -46,6 +50,8 @@ class MenuScreen(Screen):
         self.button_create_game: UIButton = _create_button('Создать новую игру')
         self.button_open_game: UIButton = _create_button('Открыть файл игры в редакторе')
         self.button_start_game: UIButton = _create_button('Запустить игру из файла')
+        self.button_compact: UIButton = _create_button('Убрать неиспользуемые картинки')
+        self.button_export: UIButton = _create_button('Собрать игру в один файл')
 
         self.input_path = pygame_gui.elements.UITextEntryLine(relative_rect=pg.Rect(20, 155, 250, 30),
                                                               initial_text=config.get_root(),
@@ -66,13 +72,57 @@ class MenuScreen(Screen):
                                                      'bottom': 'bottom'}
                                                  )
 
+        self.progress_bar = UIProgressBar(relative_rect=pg.Rect(20, 290, 250, 30),
+                                          manager=self.ui_manager,
+                                          anchors={
+                                              'left': 'left',
+                                              'right': 'right',
+                                              'top': 'top',
+                                              'bottom': 'bottom'},
+                                          visible=0)
+
+        # сборка в рабочем потоке: фоны перекодирует её пул процессов, а меню тем временем рисует прогресс
+        self.export: Optional[BackgroundLoader] = None
+        self.clock: pg.time.Clock = pg.time.Clock()
+
     def update(self) -> NoReturn:
+        if self.export is not None:
+            self.poll_export()
+            self.clock.tick(60)
         self.surface.fill('white')
 
         self.ui_manager.update(1.371)
         self.ui_manager.draw_ui(self.surface)
         pg.display.update()
 
+    def start_export(self) -> NoReturn:
+        from bundle import export
+        root: str = config.get_root()
+        self.export = BackgroundLoader(lambda loader: export(root, progress=loader.set_progress))
+        self.export.start()
+        # сжатие удаляет картинки, которые сборка ещё читает
+        self.button_export.disable()
+        self.button_compact.disable()
+        self.progress_bar.set_current_progress(0)
+        self.progress_bar.show()
+        self.alert.set_text('Идёт сборка игры')
+
+    def poll_export(self) -> NoReturn:
+        self.progress_bar.set_current_progress(100 * self.export.progress)
+        if self.export.is_alive():
+            return
+        export, self.export = self.export, None
+        export.join()
+        self.progress_bar.hide()
+        self.button_export.enable()
+        self.button_compact.enable()
+        if isinstance(export.error, FileNotFoundError):
+            self.alert.set_text('Не получается открыть файл игры')
+        elif export.error is not None:
+            raise export.error
+        else:
+            self.alert.set_text(export.result.summary())
+
     def control(self, events: list[Event]) -> bool | str:
         for event in events:
             if event.type == pygame_gui.UI_BUTTON_PRESSED:
@@ -84,6 +134,18 @@ class MenuScreen(Screen):
                     case self.button_create_game:
                         create_game_dir(config.get_root())
                         return 'editor'
+                    case self.button_compact:
+                        # сжатие и сборка нужны редко: их модули (и редактор за сборкой) не грузятся с меню
+                        from compact import compact
+                        # приостановленный редактор держит общий атлас миниатюр и историю правок со ссылками
+                        # на загрузки; он уже сохранён при уходе в меню и после сжатия откроется заново
+                        session.clear()
+                        try:
+                            self.alert.set_text(compact(config.get_root()).summary())
+                        except FileNotFoundError:
+                            self.alert.set_text('Не получается открыть файл игры')
+                    case self.button_export:
+                        self.start_export()
             if event.type == pygame_gui.UI_TEXT_ENTRY_FINISHED:
                 if event.ui_element == self.input_path:
                     path = event.text.replace('\\', '/')
@@ -94,6 +156,7 @@ class MenuScreen(Screen):
                         self.alert.set_text('')
             self.ui_manager.process_events(event)
 
-        if len(events) > 0:
+        # пока идёт сборка, меню перерисовывается каждый кадр, чтобы показывать прогресс
+        if len(events) > 0 or self.export is not None:
             return True
         return False
@@ -0,0 +1,173 @@
+from typing import NoReturn, Optional, Iterable, Final
+
+import numpy as np
+import pygame as pg
+from pygame import Surface, Color, Rect
+
+from assets import AssetLedger
+from camera import Camera, Rect4
+from config import Tuple2D
+from geometry import GeometryStore
+
+ledger: Final[AssetLedger] = AssetLedger()
+
+BACKGROUND: Color = Color(235, 235, 235)
+CHAPTER_COLOR: Color = Color(170, 170, 170)
+VIEW_COLOR: Color = Color(220, 0, 0)
+
+
+class Minimap:
+    """Всё поле в маленькой поверхности: точка на каждую строку GeometryStore, рамки ещё не загруженных глав
+    и прямоугольник экрана. Холст перерисовывается только при изменении нод (touch) и целиком — лишь когда
+    поле выходит за его границы или загружаются главы; каждый кадр к нему добавляется только рамка экрана."""
+
+    SIZE: Tuple2D = (220, 140)
+    PADDING: float = 0.1
+
+    def __init__(self, store: GeometryStore, camera: Camera) -> NoReturn:
+        self.store: GeometryStore = store
+        self.camera: Camera = camera
+        self.canvas: Surface = ledger.track(Surface(self.SIZE), self, kind='minimap')
+        self.visible: bool = True
+        self.chapters: list[Rect4] = []
+        # мировые координаты, которые показывает холст: (x, y, масштаб)
+        self.bounds: Optional[Rect4] = None
+        self.transform: tuple[float, float, float] = (0.0, 0.0, 1.0)
+        # точка каждой строки на холсте в последней отрисовке; -1 — строка не нарисована
+        self.points: np.ndarray = np.full((0, 2), -1, dtype=np.intp)
+        self.touched: set[int] = set()
+        self.full: bool = True
+
+    def rect(self, screen_size: Tuple2D) -> Rect:
+        return Rect(screen_size[0] - self.SIZE[0] - 10, screen_size[1] - self.SIZE[1] - 10, *self.SIZE)
+
+    def invalidate(self, chapters: Iterable[Rect4] = ()) -> NoReturn:
+        """Полная перерисовка на следующем кадре; chapters — мировые рамки незагруженных глав."""
+        self.chapters = list(chapters)
+        self.full = True
+
+    def touch(self, index: int) -> NoReturn:
+        """Строка index сдвинута, добавлена или освобождена."""
+        self.touched.add(index)
+
+    def world_points(self, indices: np.ndarray) -> np.ndarray:
+        """Мировые координаты центров строк: в хранилище лежат экранные."""
+        scale: float = self.camera.scale
+        shift: np.ndarray = np.array(self.camera.shift)
+        centers: np.ndarray = np.take(self.store.pos, indices, axis=0) + np.take(self.store.size, indices, axis=0) / 2
+        return (centers - shift) / scale
+
+    def to_canvas(self, world: np.ndarray) -> np.ndarray:
+        x, y, k = self.transform
+        return ((world - (x, y)) * k).astype(np.intp)
+
+    def to_world(self, point: Tuple2D) -> Tuple2D:
+        x, y, k = self.transform
+        return point[0] / k + x, point[1] / k + y
+
+    def fit(self, world: np.ndarray) -> NoReturn:
+        low: list[float] = [min(r[0] for r in self.chapters), min(r[1] for r in self.chapters)] if self.chapters else []
+        high: list[float] = [max(r[0] + r[2] for r in self.chapters),
+                             max(r[1] + r[3] for r in self.chapters)] if self.chapters else []
+        if len(world):
+            points_low, points_high = world.min(axis=0).tolist(), world.max(axis=0).tolist()
+            low = [min(a, b) for a, b in zip(low, points_low)] if low else points_low
+            high = [max(a, b) for a, b in zip(high, points_high)] if high else points_high
+        if not low:
+            low, high = [0.0, 0.0], list(self.SIZE)
+        w, h = max(high[0] - low[0], 1.0), max(high[1] - low[1], 1.0)
+        x, y = low[0] - w * self.PADDING, low[1] - h * self.PADDING
+        w, h = w * (1 + 2 * self.PADDING), h * (1 + 2 * self.PADDING)
+        k: float = min(self.SIZE[0] / w, self.SIZE[1] / h)
+        self.bounds = (x, y, w, h)
+        self.transform = (x, y, k)
+
+    def redraw(self) -> NoReturn:
+        self.full = False
+        self.touched.clear()
+        rows: np.ndarray = np.flatnonzero(self.store.shown(slice(0, self.store.count)))
+        world: np.ndarray = self.world_points(rows)
+        self.fit(world)
+
+        self.canvas.fill(BACKGROUND)
+        x, y, k = self.transform
+        for cx, cy, cw, ch in self.chapters:
+            pg.draw.rect(self.canvas, CHAPTER_COLOR, ((cx - x) * k, (cy - y) * k, max(cw * k, 2), max(ch * k, 2)), 1)
+        self.points = np.full((len(self.store.alive), 2), -1, dtype=np.intp)
+        self.points[rows] = self.to_canvas(world)
+        self.paint(rows)
+
+    def paint(self, rows: np.ndarray) -> NoReturn:
+        points: np.ndarray = self.points[rows]
+        inside: np.ndarray = (points[:, 0] >= 0) & (points[:, 0] < self.SIZE[0] - 1) & \
+            (points[:, 1] >= 0) & (points[:, 1] < self.SIZE[1] - 1)
+        xs, ys = points[inside, 0], points[inside, 1]
+        colors: np.ndarray = np.take(self.store.color, rows[inside], axis=0)
+        pixels: np.ndarray = pg.surfarray.pixels3d(self.canvas)
+        for dx, dy in ((0, 0), (1, 0), (0, 1), (1, 1)):
+            pixels[xs + dx, ys + dy] = colors
+        del pixels
+
+    def apply_touched(self) -> NoReturn:
+        """Стирает прежние точки изменённых строк, дорисовывает задетые соседние и рисует новые."""
+        if len(self.points) < len(self.store.alive):
+            grown: np.ndarray = np.full((len(self.store.alive), 2), -1, dtype=np.intp)
+            grown[:len(self.points)] = self.points
+            self.points = grown
+        rows: np.ndarray = np.fromiter(self.touched, dtype=np.intp, count=len(self.touched))
+        self.touched.clear()
+        old: np.ndarray = self.points[rows]
+        old = old[old[:, 0] >= 0]
+        for px, py in old.tolist():
+            self.canvas.fill(BACKGROUND, (px, py, 2, 2))
+        self.points[rows] = -1
+
+        alive: np.ndarray = rows[self.store.shown(rows)]
+        world: np.ndarray = self.world_points(alive)
+        if len(world):
+            x, y, w, h = self.bounds
+            low, high = world.min(axis=0), world.max(axis=0)
+            if low[0] < x or low[1] < y or high[0] > x + w or high[1] > y + h:
+                # нода ушла за край холста: масштаб меняется, и перерисовывается всё
+                self.redraw()
+                return
+            self.points[alive] = self.to_canvas(world)
+
+        # точки других строк, которые задело стирание
+        if len(old):
+            shown: np.ndarray = self.store.shown(slice(0, len(self.points)))
+            drawn: np.ndarray = np.flatnonzero((self.points[:, 0] >= 0) & shown)
+            near: np.ndarray = np.zeros(len(drawn), dtype=bool)
+            for px, py in old.tolist():
+                near |= (np.abs(self.points[drawn, 0] - px) <= 1) & (np.abs(self.points[drawn, 1] - py) <= 1)
+            alive = np.union1d(alive, drawn[near])
+        self.paint(alive)
+
+    def update(self) -> NoReturn:
+        if self.full:
+            self.redraw()
+        elif self.touched:
+            self.apply_touched()
+
+    def draw(self, surface: Surface) -> NoReturn:
+        if not self.visible:
+            return
+        self.update()
+        rect: Rect = self.rect(surface.get_size())
+        surface.blit(self.canvas, rect)
+        pg.draw.rect(surface, CHAPTER_COLOR, rect, 1)
+
+        # рамка экрана в координатах холста
+        vx, vy, vw, vh = self.camera.rect_to_world((0, 0, *surface.get_size()))
+        x, y, k = self.transform
+        view: Rect = Rect((vx - x) * k, (vy - y) * k, max(vw * k, 2), max(vh * k, 2)).move(rect.topleft)
+        surface.set_clip(rect)
+        pg.draw.rect(surface, VIEW_COLOR, view, 1)
+        surface.set_clip(None)
+
+    def hit(self, pos: Tuple2D, screen_size: Tuple2D) -> Optional[Tuple2D]:
+        """Мировая точка под курсором, если он на миникарте."""
+        rect: Rect = self.rect(screen_size)
+        if not self.visible or not rect.collidepoint(pos):
+            return None
+        return self.to_world((pos[0] - rect.x, pos[1] - rect.y))
@@ -0,0 +1,227 @@
+import json
+import os
+import sys
+from collections import deque
+from typing import NoReturn, Optional, Any, Final
+
+from config import Config, MANIFEST, Tuple2D
+from loader import iter_project
+
+config: Final[Config] = Config()
+
+Rect4 = tuple[float, float, float, float]
+
+
+def resolve_image(path: Optional[str]) -> Optional[str]:
+    """Картинки ноды хранятся в папке загрузок проекта; в старых файлах встречаются полные пути."""
+    if path is None:
+        return None
+    if os.path.exists(f'{config.get_dir_upload()}/{path}'):
+        return f'{config.get_dir_upload()}/{path}'
+    return path if os.path.exists(path) else None
+
+
+def nodes_bbox(nodes) -> Optional[Rect4]:
+    """Габариты сериализованных нод (в координатах файла)."""
+    left = top = float('inf')
+    right = bottom = float('-inf')
+    for node in nodes:
+        x, y = node['position']
+        w, h = node.get('size') or (node.get('radius', 0), node.get('radius', 0))
+        left, top = min(left, x), min(top, y)
+        right, bottom = max(right, x + w), max(bottom, y + h)
+    if left == float('inf'):
+        return None
+    return left, top, right - left, bottom - top
+
+
+class Chapter:
+    def __init__(self, name: str, file: str, bbox: Optional[Rect4] = None) -> NoReturn:
+        self.name: str = name
+        self.file: str = file
+        self.bbox: Optional[Rect4] = bbox
+        self.loaded: bool = False
+
+    def contains(self, point: Tuple2D) -> bool:
+        if self.bbox is None:
+            return False
+        x, y, w, h = self.bbox
+        return x <= point[0] <= x + w and y <= point[1] <= y + h
+
+    def __my_dict__(self) -> dict[str, Any]:
+        return {
+            'file': self.file,
+            'bbox': self.bbox
+        }
+
+
+class Project:
+    """Проект из глав: манифест project.json со списком глав и межглавными связями,
+    каждая глава — отдельный файл в формате game.json. Старый проект из одного файла
+    читается как единственная глава main."""
+
+    def __init__(self) -> NoReturn:
+        self.chapters: dict[str, Chapter] = {}
+        self.links: list[dict[str, Any]] = []
+        self.initial: Optional[str] = None
+        self.initial_chapter: Optional[str] = None
+        self.next_id: int = 0
+        self.legacy: bool = not config.is_manifest()
+
+        if self.legacy:
+            file: str = os.path.basename(config.get_file_game())
+            self.chapters['main'] = Chapter('main', file)
+            self.initial_chapter = 'main'
+            return
+
+        with open(config.get_file_game(), mode='r', encoding='utf-8') as file:
+            data: dict = json.load(file)
+        for name, chapter in data.get('chapters', {}).items():
+            bbox = chapter.get('bbox')
+            self.chapters[name] = Chapter(name, chapter['file'], tuple(bbox) if bbox else None)
+        self.links = data.get('links', [])
+        self.initial = str(data['initial']) if data.get('initial') is not None else None
+        self.initial_chapter = data.get('initial_chapter')
+        self.next_id = data.get('next_id', 0)
+
+    @staticmethod
+    def create(path: str) -> NoReturn:
+        os.makedirs(os.path.join(path, 'chapters'), exist_ok=True)
+        with open(os.path.join(path, 'chapters', 'main.json'), 'w') as file:
+            file.write('{}')
+        with open(os.path.join(path, MANIFEST), 'w') as file:
+            json.dump({'version': '2.0', 'chapters': {'main': Chapter('main', 'chapters/main.json').__my_dict__()},
+                       'links': [], 'initial': None, 'initial_chapter': 'main', 'next_id': 0}, file, indent=' ' * 4)
+
+    def chapter_path(self, name: str) -> str:
+        return f'{config.get_root()}/{self.chapters[name].file}'
+
+    def add_chapter(self, name: str) -> Chapter:
+        chapter: Chapter = Chapter(name, f'chapters/{name}.json')
+        chapter.loaded = True
+        self.chapters[name] = chapter
+        if self.legacy:
+            # первый новый раздел переводит проект на манифест; старый файл становится главой main
+            self.legacy = False
+            config.set_game_file(MANIFEST)
+        return chapter
+
+    def remove_chapter(self, name: str) -> NoReturn:
+        """Глава пропадает из манифеста, её файл удаляется."""
+        path: str = self.chapter_path(name)
+        del self.chapters[name]
+        if os.path.exists(path):
+            os.remove(path)
+
+    def new_chapter_name(self) -> str:
+        i: int = len(self.chapters)
+        while f'chapter{i}' in self.chapters:
+            i += 1
+        return f'chapter{i}'
+
+    def chapter_at(self, point: Tuple2D) -> Optional[str]:
+        for chapter in self.chapters.values():
+            if chapter.contains(point):
+                return chapter.name
+        return None
+
+    def neighbours(self, name: str) -> set[str]:
+        return {link['end_chapter'] for link in self.links if link['start_chapter'] == name} - {name}
+
+    def reachable(self, name: str) -> set[str]:
+        result: set[str] = {name}
+        queue: deque[str] = deque([name])
+        while queue:
+            for other in self.neighbours(queue.popleft()):
+                if other not in result:
+                    result.add(other)
+                    queue.append(other)
+        return result
+
+    def find_chapter(self, node_id: str) -> Optional[str]:
+        for link in self.links:
+            if link['end'] == node_id:
+                return link['end_chapter']
+            if link['start'] == node_id:
+                return link['start_chapter']
+        return self.initial_chapter if node_id == self.initial else None
+
+    def write_chapter(self, name: str, data: dict[str, Any]) -> NoReturn:
+        path: str = self.chapter_path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, mode='w') as file:
+            json.dump(data, file, indent=' ' * 4)
+
+    def save_manifest(self) -> NoReturn:
+        if self.legacy:
+            return
+        data: dict[str, Any] = {
+            'version': '2.0',
+            'chapters': {name: chapter.__my_dict__() for name, chapter in self.chapters.items()},
+            'links': self.links,
+            'initial': self.initial,
+            'initial_chapter': self.initial_chapter,
+            'next_id': self.next_id
+        }
+        with open(config.get_file_game(), mode='w') as file:
+            json.dump(data, file, indent=' ' * 4)
+
+
+def split(path: str, cell: float = 2000) -> NoReturn:
+    """Переводит проект из одного game.json в проект из глав, разбивая поле на квадраты cell x cell."""
+    config.set_root(path)
+    if config.is_manifest():
+        print('Проект уже разбит на главы')
+        return
+    source: str = config.get_file_game()
+    chapters: dict[str, dict[str, Any]] = {}
+    node_chapter: dict[str, str] = {}
+    arrows: list[dict] = []
+    initial: Optional[str] = None
+    groups: dict[str, dict] = {}
+    next_id: int = 0
+    for key, value in iter_project(source):
+        match key:
+            case 'node':
+                node_hash, node = value
+                name: str = f'chapter_{int(node["position"][0] // cell)}_{int(node["position"][1] // cell)}'
+                chapters.setdefault(name, {'version': '2.0', 'nodes': {}, 'arrows': []})['nodes'][node_hash] = node
+                node_chapter[node_hash] = name
+                for ans_hash in node.get('answers', {}):
+                    node_chapter[ans_hash] = name
+                next_id = max([next_id, int(node_hash) + 1] + [int(a) + 1 for a in node.get('answers', {})])
+            case 'arrow':
+                arrows.append(value)
+            case 'initial':
+                initial = str(value)
+            case 'groups':
+                groups.update(value)
+
+    # группа редактора попадает в главу своей первой ноды
+    for group_hash, group in groups.items():
+        name = node_chapter[group['members'][0]]
+        chapters[name].setdefault('groups', {})[group_hash] = group
+
+    links: list[dict] = []
+    for arrow in arrows:
+        start, end = node_chapter[arrow['start']], node_chapter[arrow['end']]
+        if start == end:
+            chapters[start]['arrows'].append(arrow)
+        else:
+            links.append(dict(arrow, start_chapter=start, end_chapter=end))
+
+    project: dict[str, Any] = {'version': '2.0', 'chapters': {}, 'links': links, 'initial': initial,
+                               'initial_chapter': node_chapter.get(initial), 'next_id': next_id}
+    os.makedirs(os.path.join(path, 'chapters'), exist_ok=True)
+    for name, data in chapters.items():
+        project['chapters'][name] = Chapter(name, f'chapters/{name}.json', nodes_bbox(data['nodes'].values())).__my_dict__()
+        with open(os.path.join(path, 'chapters', f'{name}.json'), 'w') as file:
+            json.dump(data, file, indent=' ' * 4)
+    with open(os.path.join(path, MANIFEST), 'w') as file:
+        json.dump(project, file, indent=' ' * 4)
+    print(f'Глав: {len(chapters)}, межглавных связей: {len(links)}')
+
+
+if __name__ == '__main__':
+    # python project.py <папка проекта> [размер главы]
+    split(sys.argv[1], *map(float, sys.argv[2:3]))
@@ -0,0 +1,168 @@
+import itertools
+import re
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import NoReturn, Optional, Hashable, Iterable, Iterator
+
+WORD: re.Pattern = re.compile(r'\w+')
+# длина n-грамм, по которым ищутся подстроки слов
+GRAM: int = 3
+
+# вес совпадения слова запроса со словом текста
+EXACT: int = 3
+PREFIX: int = 2
+SUBSTRING: int = 1
+# уровень очков больше стольких ключей не сортируется целиком, а перебирается по длинам текстов
+SORT_LIMIT: int = 2000
+
+
+def words_of(text: str) -> set[str]:
+    return set(WORD.findall(text.lower()))
+
+
+def grams_of(word: str) -> set[str]:
+    return {word[i:i + GRAM] for i in range(len(word) - GRAM + 1)}
+
+
+class TextIndex:
+    """Инвертированный индекс текстов: слово -> ключи текстов, где оно есть. Для поиска по началу слова
+    словарь хранится отсортированным, для поиска подстроки — n-граммы слов: слова-кандидаты находятся
+    пересечением множеств n-грамм запроса и проверяются напрямую. Правка текста меняет только его слова."""
+
+    def __init__(self) -> NoReturn:
+        self.texts: dict[Hashable, str] = {}
+        # длины текстов — ключ сортировки при равных очках — и ключи по длине текста
+        self.lengths: dict[Hashable, int] = {}
+        self.by_length: defaultdict[int, set[Hashable]] = defaultdict(set)
+        self.postings: defaultdict[str, set[Hashable]] = defaultdict(set)
+        self.vocabulary: list[str] = []
+        self.grams: defaultdict[str, set[str]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def add_word(self, word: str) -> NoReturn:
+        insort(self.vocabulary, word)
+        for gram in grams_of(word):
+            self.grams[gram].add(word)
+
+    def drop_word(self, word: str) -> NoReturn:
+        del self.postings[word]
+        del self.vocabulary[bisect_left(self.vocabulary, word)]
+        for gram in grams_of(word):
+            self.grams[gram].discard(word)
+            if not self.grams[gram]:
+                del self.grams[gram]
+
+    def put(self, key: Hashable, text: str) -> NoReturn:
+        old: str = self.texts.get(key, '')
+        if key in self.texts and old == text:
+            return
+        old_words, new_words = words_of(old), words_of(text)
+        self.forget_length(key)
+        for word in old_words - new_words:
+            self.postings[word].discard(key)
+            if not self.postings[word]:
+                self.drop_word(word)
+        for word in new_words - old_words:
+            if word not in self.postings:
+                self.add_word(word)
+            self.postings[word].add(key)
+        self.texts[key] = text
+        self.lengths[key] = len(text)
+        self.by_length[len(text)].add(key)
+
+    def forget_length(self, key: Hashable) -> NoReturn:
+        length: Optional[int] = self.lengths.pop(key, None)
+        if length is not None:
+            self.by_length[length].discard(key)
+            if not self.by_length[length]:
+                del self.by_length[length]
+
+    def remove(self, key: Hashable) -> NoReturn:
+        if key in self.texts:
+            self.put(key, '')
+            self.forget_length(key)
+            del self.texts[key]
+
+    def load(self, items: Iterable[tuple[Hashable, str]]) -> NoReturn:
+        """Добавление многих новых текстов разом: словарь сортируется один раз в конце."""
+        for key, text in items:
+            if key in self.texts:
+                self.put(key, text)
+                continue
+            for word in words_of(text):
+                if word not in self.postings:
+                    for gram in grams_of(word):
+                        self.grams[gram].add(word)
+                self.postings[word].add(key)
+            self.texts[key] = text
+            self.lengths[key] = len(text)
+            self.by_length[len(text)].add(key)
+        self.vocabulary = sorted(self.postings)
+
+    def matching_words(self, term: str) -> Iterator[tuple[str, int]]:
+        """Слова словаря, совпадающие с term целиком, по началу или (для term не короче n-граммы)
+        содержащие его, с весом совпадения."""
+        i: int = bisect_left(self.vocabulary, term)
+        while i < len(self.vocabulary) and self.vocabulary[i].startswith(term):
+            word: str = self.vocabulary[i]
+            yield word, EXACT if word == term else PREFIX
+            i += 1
+        if len(term) < GRAM:
+            return
+        sets: list[set[str]] = sorted((self.grams.get(gram, set()) for gram in grams_of(term)), key=len)
+        for word in set.intersection(*sets) if sets[0] else ():
+            if term in word and not word.startswith(term):
+                yield word, SUBSTRING
+
+    def tiers(self, term: str) -> dict[int, set[Hashable]]:
+        """Ключи текстов, совпавших с term, по весу лучшего совпадения; множества не пересекаются."""
+        words: defaultdict[int, list[set[Hashable]]] = defaultdict(list)
+        for word, weight in self.matching_words(term):
+            words[weight].append(self.postings[word])
+        tiers: dict[int, set[Hashable]] = {}
+        seen: set[Hashable] = set()
+        for weight in (EXACT, PREFIX, SUBSTRING):
+            # единственное множество слова берётся как есть: копировать большие множества дорого
+            keys: set[Hashable] = words[weight][0] if len(words[weight]) == 1 and not seen else \
+                set().union(*words[weight]) - seen
+            if keys:
+                tiers[weight] = keys
+                seen |= keys
+        return tiers
+
+    def search(self, query: str, limit: int = 20) -> list[Hashable]:
+        """Ключи текстов, где каждое слово запроса совпадает с каким-то словом текста. Выше — тексты
+        с более точными совпадениями, при равенстве — более короткие.
+
+        Очки текста — сумма весов по словам запроса, поэтому тексты разбиваются на уровни очков
+        пересечениями множеств (без обхода ключей по одному), и упорядочиваются только ключи уровня,
+        на котором набирается limit."""
+        per_term: list[dict[int, set[Hashable]]] = [self.tiers(term) for term in words_of(query)]
+        if not per_term or not all(per_term):
+            return []
+        levels: defaultdict[int, list[set[Hashable]]] = defaultdict(list)
+        for combination in itertools.product(*(tiers.items() for tiers in per_term)):
+            keys: set[Hashable] = combination[0][1] if len(combination) == 1 else \
+                set.intersection(*(keys for _, keys in combination))
+            if keys:
+                levels[sum(weight for weight, _ in combination)].append(keys)
+        result: list[Hashable] = []
+        for score in sorted(levels, reverse=True):
+            level: set[Hashable] = levels[score][0] if len(levels[score]) == 1 else set().union(*levels[score])
+            result += self.shortest(level, limit - len(result))
+            if len(result) >= limit:
+                break
+        return result
+
+    def shortest(self, keys: set[Hashable], count: int) -> list[Hashable]:
+        """count ключей с самыми короткими текстами."""
+        if len(keys) <= SORT_LIMIT:
+            return sorted(keys, key=self.lengths.__getitem__)[:count]
+        result: list[Hashable] = []
+        for length in sorted(self.by_length):
+            result += keys & self.by_length[length]
+            if len(result) >= count:
+                break
+        return result[:count]
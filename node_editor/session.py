@@ -0,0 +1,83 @@
+import os
+from typing import NoReturn, Optional, Final, Callable, Any, Iterable
+
+from app import Screen
+from config import Config
+
+config: Final[Config] = Config()
+
+Stamp = Optional[tuple[int, int]]
+
+
+def stamp_of(path: str) -> Stamp:
+    """Отметка файла: время изменения и размер; None, если файла нет."""
+    try:
+        stat: os.stat_result = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class Session:
+    """Что приложение держит между экранами одного проекта: приостановленные экраны и разобранные главы.
+
+    Уходя с экрана, приложение приостанавливает его, а не выбрасывает; при возврате экран продолжает работу,
+    если папка игры та же и файлы, от которых он зависит, с тех пор не менялись. Разобранная глава
+    отдаётся из памяти, пока отметка её файла совпадает с отметкой при разборе. Смена папки игры
+    сбрасывает всё."""
+
+    def __new__(cls, *args, **kwargs):
+        if not hasattr(cls, 'instance'):
+            cls.instance = super(Session, cls).__new__(cls)
+        return cls.instance
+
+    def __init__(self) -> NoReturn:
+        if hasattr(self, 'screens'):
+            return
+        self.root: Optional[str] = None
+        # экран -> (экран, отметки файлов, от которых он зависит)
+        self.screens: dict[str, tuple[Screen, dict[str, Stamp]]] = {}
+        # файл главы -> (отметка при разборе, результат разбора)
+        self.chapters: dict[str, tuple[Stamp, Any]] = {}
+        self.parses: int = 0
+
+    def check_root(self) -> NoReturn:
+        if self.root != config.get_root():
+            self.clear()
+            self.root = config.get_root()
+
+    def clear(self) -> NoReturn:
+        for screen, _ in self.screens.values():
+            screen.release()
+        self.screens.clear()
+        self.chapters.clear()
+
+    def suspend(self, name: str, screen: Screen) -> NoReturn:
+        self.check_root()
+        files: Iterable[str] = screen.suspend()
+        self.screens[name] = (screen, {path: stamp_of(path) for path in files})
+
+    def resume(self, name: str, **options) -> Optional[Screen]:
+        """Приостановленный экран или None, если его нет или его файлы изменились (тогда он отпускается).
+        options передаются в resume экрана."""
+        self.check_root()
+        screen, stamps = self.screens.pop(name, (None, {}))
+        if screen is None:
+            return None
+        if any(stamp_of(path) != stamp for path, stamp in stamps.items()):
+            screen.release()
+            return None
+        screen.resume(**options)
+        return screen
+
+    def chapter(self, path: str, parse: Callable[[], Any]) -> Any:
+        """Разобранная глава из файла path; parse вызывается, только если файл изменился с прошлого разбора."""
+        self.check_root()
+        stamp: Stamp = stamp_of(path)
+        cached: Optional[tuple[Stamp, Any]] = self.chapters.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        result: Any = parse()
+        self.parses += 1
+        self.chapters[path] = (stamp, result)
+        return result
@@ -0,0 +1,144 @@
+"""Профиль холодного запуска: python main.py --startup [файл] (или переменная NOVEL_STARTUP).
+
+Пишет время импорта каждого модуля — как -X importtime, но и в собранном PyInstaller файле, где флагов
+интерпретатора не передать, — и длительность фаз запуска до первого кадра меню. Профили разных сборок
+сравниваются так: python startup.py было.json стало.json"""
+import json
+import sys
+import time
+from contextlib import contextmanager
+from typing import NoReturn, Optional, Any, Callable, Iterator
+
+# сколько самых долгих импортов показывать в отчёте
+TOP: int = 15
+
+
+class StartupProfile:
+    """Фазы запуска и импорты модулей, отсчитанные от импорта этого модуля (первая строка main.py).
+
+    Импорты меряются обёрткой над exec_module загрузчиков: поиск модуля не входит, собственное время
+    модуля — без вложенных импортов, как в колонке self у -X importtime."""
+
+    def __new__(cls, *args, **kwargs):
+        if not hasattr(cls, 'instance'):
+            cls.instance = super(StartupProfile, cls).__new__(cls)
+        return cls.instance
+
+    def __init__(self) -> NoReturn:
+        if hasattr(self, 'phases'):
+            return
+        self.enabled: bool = False
+        self.finished: bool = False
+        self._path: Optional[str] = None
+        self._start: float = time.perf_counter()
+        # (фаза, начало, длительность), секунды
+        self.phases: list[tuple[str, float, float]] = []
+        # (модуль, вложенность, собственное время, с вложенными импортами), секунды
+        self.imports: list[tuple[str, int, float, float]] = []
+        # время вложенных импортов у каждого исполняемого сейчас модуля
+        self._nested: list[float] = []
+
+    def enable(self, path: str) -> NoReturn:
+        if not self.enabled:
+            sys.meta_path.insert(0, self)
+        self.enabled = True
+        self._path = path
+
+    def find_spec(self, name: str, path=None, target=None):
+        """Ищет модуль остальными искателями и оборачивает exec_module его загрузчика."""
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        loader = spec.loader
+        # у встроенных и замороженных модулей загрузчик — класс со статическими методами, их не трогаем
+        if loader is not None and not isinstance(loader, type) and hasattr(loader, 'exec_module') \
+                and not hasattr(loader.exec_module, 'timed'):
+            loader.exec_module = self.timed(loader.exec_module)
+        return spec
+
+    def timed(self, exec_module: Callable) -> Callable:
+        def run(module) -> NoReturn:
+            begin: float = time.perf_counter()
+            self._nested.append(0.0)
+            try:
+                exec_module(module)
+            finally:
+                total: float = time.perf_counter() - begin
+                nested: float = self._nested.pop()
+                if self._nested:
+                    self._nested[-1] += total
+                if not self.finished:
+                    self.imports.append((module.__name__, len(self._nested), total - nested, total))
+
+        run.timed = True
+        return run
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[NoReturn]:
+        begin: float = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.enabled and not self.finished:
+                self.phases.append((name, begin - self._start, time.perf_counter() - begin))
+
+    def mark(self, name: str) -> NoReturn:
+        """Фаза от начала запуска до этой точки."""
+        if self.enabled and not self.finished:
+            self.phases.append((name, 0.0, time.perf_counter() - self._start))
+
+    def finish(self) -> NoReturn:
+        """Первый кадр показан: профиль сохраняется, дальнейшие фазы и импорты не пишутся."""
+        if not self.enabled or self.finished:
+            return
+        self.mark('first frame')
+        self.finished = True
+        with open(self._path, mode='w', encoding='utf-8') as file:
+            json.dump(self.__my_dict__(), file, ensure_ascii=False, indent=1)
+        print('\n'.join(self.report()))
+        print(f'Профиль запуска сохранён: {self._path}')
+
+    def __my_dict__(self) -> dict[str, Any]:
+        return {
+            'python': sys.version.split()[0],
+            'frozen': hasattr(sys, '_MEIPASS'),
+            'phases': {name: round(duration * 1000, 2) for name, _, duration in self.phases},
+            'imports': {name: [depth, round(own * 1000, 2), round(total * 1000, 2)]
+                        for name, depth, own, total in self.imports}
+        }
+
+    def report(self) -> list[str]:
+        lines: list[str] = [f'{name:<28} {start * 1000:>8.1f} {duration * 1000:>8.1f} мс'
+                            for name, start, duration in self.phases]
+        lines.append(f'импортов: {len(self.imports)}, самые долгие (собственное / с вложенными, мс):')
+        for name, depth, own, total in sorted(self.imports, key=lambda item: -item[2])[:TOP]:
+            lines.append(f'{own * 1000:>8.1f} {total * 1000:>8.1f}  {"  " * depth}{name}')
+        return lines
+
+
+def compare(before: dict[str, Any], after: dict[str, Any]) -> list[str]:
+    """Фазы и импорты двух профилей: было, стало, разница."""
+    lines: list[str] = [f'{"фаза":<28} {"было":>8} {"стало":>8} {"разница":>8}']
+    for name in dict.fromkeys(list(before['phases']) + list(after['phases'])):
+        old, new = before['phases'].get(name, 0.0), after['phases'].get(name, 0.0)
+        lines.append(f'{name:<28} {old:>8.1f} {new:>8.1f} {new - old:>+8.1f}')
+    lines.append(f'импортов: {len(before["imports"])} -> {len(after["imports"])}')
+    gone: list[str] = [name for name in before['imports'] if name not in after['imports']]
+    own: Callable[[dict[str, Any], str], float] = lambda profile, name: profile['imports'].get(name, [0, 0.0])[1]
+    for name in sorted(gone, key=lambda name: -own(before, name))[:TOP]:
+        lines.append(f'  больше не импортируется при запуске: {name} ({own(before, name):.1f} мс)')
+    return lines
+
+
+if __name__ == '__main__':
+    # python startup.py было.json стало.json
+    profiles: list[dict[str, Any]] = []
+    for argument in sys.argv[1:3]:
+        with open(argument, encoding='utf-8') as source:
+            profiles.append(json.load(source))
+    print('\n'.join(compare(*profiles)))
@@ -0,0 +1,158 @@
+from collections import defaultdict
+from enum import Enum, auto
+from typing import NoReturn, Optional, Iterable, Any, Mapping, Container, Callable
+
+from editor import ImageNode, ChoosenNode, NodeRecord, ArrowRecord
+from project import Project
+
+
+class TransitionType(Enum):
+    null = auto()
+    press_button = auto()
+    expression = auto()
+
+
+class Transition:
+    def __init__(self, result: str, t_type: TransitionType = TransitionType.null,
+                 button_text: str = None) -> NoReturn:
+        self.condition = None
+        self.result: str = result
+        self.t_type: TransitionType = t_type
+        self.button_text: str = button_text
+
+    def __repr__(self):
+        return f'{self.result}, {self.t_type}, {self.button_text}'
+
+    def __my_dict__(self) -> list:
+        return [self.result, self.t_type.name, self.button_text]
+
+    @staticmethod
+    def load(data: list) -> 'Transition':
+        return Transition(data[0], TransitionType[data[1]], data[2])
+
+
+class StoryNode:
+    """Экран игры, скомпилированный из ImageNode: всё, что нужно проигрывателю, без объектов редактора."""
+
+    def __init__(self, node_id: str, text: str, path_image: Optional[str], initial: bool = False,
+                 chapter: Optional[str] = None) -> NoReturn:
+        self.id: str = node_id
+        self.text: str = text
+        self.path_image: Optional[str] = path_image
+        self.initial: bool = initial
+        self.chapter: Optional[str] = chapter
+        self.transitions: list[Transition] = []
+
+    def __my_dict__(self) -> dict[str, Any]:
+        return {
+            'id': self.id,
+            'text': self.text,
+            'image_path': self.path_image,
+            'initial': self.initial,
+            'chapter': self.chapter,
+            'transitions': [transition.__my_dict__() for transition in self.transitions]
+        }
+
+    @staticmethod
+    def load(data: dict[str, Any]) -> 'StoryNode':
+        node: StoryNode = StoryNode(data['id'], data['text'], data['image_path'], data['initial'], data['chapter'])
+        node.transitions = [Transition.load(transition) for transition in data['transitions']]
+        return node
+
+
+def compile_story(records: Iterable[NodeRecord], arrows: Iterable[ArrowRecord],
+                  links: Iterable[dict[str, Any]] = ()) -> dict[str, StoryNode]:
+    """Граф переходов между экранами. links — связи в ещё не загруженные главы (id из файла)."""
+    by_id: dict[str, NodeRecord] = {}
+    answers: set[str] = set()
+    for record in records:
+        by_id[record.id] = record
+        answers.update(answer.id for answer in record.answers)
+
+    outgoing: dict[str, list[str]] = defaultdict(list)
+    for arrow in arrows:
+        outgoing[arrow.start].append(arrow.end)
+    for link in links:
+        outgoing[link['start']].append(link['end'])
+    return StoryCompiler().compile(by_id, answers, lambda node_id: outgoing.get(node_id, ()))
+
+
+class StoryCompiler:
+    """Граф переходов, который пересобирается по частям. Переходы экрана зависят от его записи, его стрелок
+    и — если стрелка ведёт в ноду выбора — от ответов этой ноды и их стрелок; поэтому при правке
+    пересобираются изменённые экраны и экраны, читающие изменённые ноды выбора, а остальные берутся
+    из прошлой сборки."""
+
+    def __init__(self) -> NoReturn:
+        self.story: dict[str, StoryNode] = {}
+        # нода выбора -> экраны, переходы которых собраны из её ответов, и обратно
+        self.readers: defaultdict[str, set[str]] = defaultdict(set)
+        self.reads: dict[str, str] = {}
+        # сколько экранов собрано последней сборкой
+        self.rebuilt: int = 0
+
+    def compile(self, records: Mapping[str, NodeRecord], answers: Container[str],
+                outgoing: Callable[[str], Iterable[str]], changed: Optional[Iterable[str]] = None) -> dict[str, StoryNode]:
+        """records — ноды по id, answers — id ответов, outgoing — id, в которые ведут стрелки из ноды или ответа.
+        changed — id нод, у которых с прошлой сборки изменились запись или исходящие стрелки (для ответа —
+        id его ноды выбора); None — собрать граф заново."""
+
+        def is_screen(node_id: str) -> bool:
+            # нода из незагруженной главы считается экраном до загрузки главы
+            record: Optional[NodeRecord] = records.get(node_id)
+            return record.type == ImageNode.node_type if record is not None else node_id not in answers
+
+        if changed is None:
+            self.story, self.reads = {}, {}
+            self.readers.clear()
+            affected: Iterable[str] = records
+        else:
+            affected = set(changed)
+            for node_id in list(affected):
+                affected.update(self.readers.get(node_id, ()))
+            for node_id in affected:
+                self.forget(node_id)
+
+        self.rebuilt = 0
+        for node_id in affected:
+            record: Optional[NodeRecord] = records.get(node_id)
+            if record is None or record.type != ImageNode.node_type:
+                continue
+            story_node: StoryNode = StoryNode(node_id, record.text, record.path_image, record.initial, record.chapter)
+            self.story[node_id] = story_node
+            self.rebuilt += 1
+            nexts: list[str] = list(outgoing(node_id))
+            choosen: Optional[NodeRecord] = next(
+                (records[n] for n in nexts if n in records and records[n].type == ChoosenNode.node_type), None)
+            if choosen is None:
+                story_node.transitions = [Transition(n) for n in nexts if is_screen(n)]
+                continue
+
+            self.reads[node_id] = choosen.id
+            self.readers[choosen.id].add(node_id)
+            for answer in choosen.answers:
+                targets: list[str] = [n for n in outgoing(answer.id) if is_screen(n)]
+                if len(targets) <= 0:
+                    continue
+                story_node.transitions.append(Transition(targets[0], TransitionType.press_button,
+                                                         button_text=answer.text))
+        return self.story
+
+    def forget(self, node_id: str) -> NoReturn:
+        self.story.pop(node_id, None)
+        choosen: Optional[str] = self.reads.pop(node_id, None)
+        if choosen is not None:
+            self.readers[choosen].discard(node_id)
+            if not self.readers[choosen]:
+                del self.readers[choosen]
+
+
+class Playtest:
+    """Проба игры из редактора: граф, собранный из записей редактора в памяти, и экран, с которого играть.
+    Главы, которых в редакторе нет, игра загрузит с диска сама."""
+
+    def __init__(self, story: dict[str, StoryNode], start: str, project: Project, chapters: Iterable[str]) -> NoReturn:
+        self.story: dict[str, StoryNode] = story
+        self.start: str = start
+        self.project: Project = project
+        self.chapters: set[str] = set(chapters)
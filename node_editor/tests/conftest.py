@@ -0,0 +1,5 @@
+import os
+import sys
+
+# модули редактора лежат плоско в node_editor и импортируются по именам, как из main.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
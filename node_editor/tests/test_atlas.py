@@ -0,0 +1,43 @@
+import pygame as pg
+from pygame import Surface
+
+from atlas import MiniatureAtlas, canonical_size
+
+
+def fresh() -> MiniatureAtlas:
+    atlas: MiniatureAtlas = MiniatureAtlas()
+    atlas.directory, atlas.entries, atlas.shelves, atlas.sheet, atlas.wasted = None, {}, [], None, 0
+    return atlas
+
+
+def miniature(size: tuple[int, int]) -> Surface:
+    surface: Surface = Surface(canonical_size(size))
+    surface.fill(pg.Color(200, 100, 50))
+    return surface
+
+
+def test_zoom_reuses_canonical_miniature():
+    atlas: MiniatureAtlas = fresh()
+    atlas.put('a.png', 1, miniature((120, 80)))
+    for k in range(1, 40):
+        size: tuple[int, int] = (int(120 * 1.1 ** k), int(80 * 1.1 ** k))
+        assert atlas.get('a.png', size, 1) is not None
+    assert len(atlas.entries) == 1 and atlas.wasted == 0
+
+
+def test_changed_image_or_aspect_misses():
+    atlas: MiniatureAtlas = fresh()
+    atlas.put('a.png', 1, miniature((120, 80)))
+    assert atlas.get('a.png', (120, 80), 2) is None
+    assert atlas.get('a.png', (80, 120), 1) is None
+
+
+def test_replacements_repack_sheet():
+    atlas: MiniatureAtlas = fresh()
+    for stamp in range(200):
+        atlas.put('a.png', stamp, miniature((120, 80 + stamp % 2)))
+        atlas.put('b.png', stamp, miniature((80, 120)))
+    used: int = sum(entry[2] * entry[3] for entry in atlas.entries.values())
+    assert atlas.wasted <= used
+    assert atlas.sheet.get_height() <= 512
+    assert atlas.get('a.png', (120, 81), 199) is not None
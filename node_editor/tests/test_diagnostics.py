@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+from diagnostics import StoryChecker, NodeFacts, Problem
+
+NODES: int = 30
+EDITS: int = 3000
+
+
+def facts_of(count: int, rng: random.Random) -> list[NodeFacts]:
+    """Экраны и ноды выбора с ответами; начальная — нода 0."""
+    facts: list[NodeFacts] = []
+    for i in range(count):
+        answers: tuple[str, ...] = tuple(f'{i}.{j}' for j in range(rng.randint(1, 3))) if i % 4 == 3 else ()
+        facts.append(NodeFacts(str(i), screen=not answers, answers=answers, initial=i == 0))
+    return facts
+
+
+def rebuilt(facts: list[NodeFacts], edges: list[tuple[str, str]], entries: set[str]) -> StoryChecker:
+    checker: StoryChecker = StoryChecker(lambda path: True)
+    checker.set_entries(entries)
+    checker.load(facts, edges)
+    return checker
+
+
+def assert_same(checker: StoryChecker, expected: StoryChecker) -> None:
+    assert checker.reachable == expected.reachable
+    assert checker.local == expected.local
+    assert sorted(checker.flagged()) == sorted(expected.flagged())
+    # порядок частей сводки зависит от порядка правок
+    assert sorted(checker.summary().split(' · ')) == sorted(expected.summary().split(' · '))
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_incremental_edges_match_full_recompute(seed):
+    rng: random.Random = random.Random(seed)
+    facts: list[NodeFacts] = facts_of(NODES, rng)
+    starts: list[str] = [node.id for node in facts if not node.answers] + \
+        [answer for node in facts for answer in node.answers]
+    ends: list[str] = [node.id for node in facts]
+    entries: set[str] = {ends[-1]}
+
+    checker: StoryChecker = rebuilt(facts, [], entries)
+    edges: list[tuple[str, str]] = []
+    for _ in range(EDITS):
+        if edges and rng.random() < 0.45:
+            # стрелки могут повторяться: снимается одна из одинаковых
+            start, end = edges.pop(rng.randrange(len(edges)))
+            checker.remove_edge(start, end)
+        else:
+            edge: tuple[str, str] = (rng.choice(starts), rng.choice(ends))
+            edges.append(edge)
+            checker.add_edge(*edge)
+        assert_same(checker, rebuilt(facts, edges, entries))
+
+
+def test_removed_edge_keeps_nodes_reachable_by_another_path():
+    facts: list[NodeFacts] = [NodeFacts(str(i), screen=True, initial=i == 0) for i in range(4)]
+    checker: StoryChecker = rebuilt(facts, [('0', '1'), ('1', '3'), ('0', '2'), ('2', '3')], set())
+    checker.remove_edge('1', '3')
+    assert checker.reachable == {'0', '1', '2', '3'}
+    checker.remove_edge('0', '2')
+    assert checker.reachable == {'0', '1'}
+    assert Problem.unreachable in checker.problems_of('3')
+    assert Problem.dead_end in checker.problems_of('1')
@@ -0,0 +1,102 @@
+from typing import Any
+
+from editor import MoveNodes
+from history import Command, Inverse, History
+
+
+class Board:
+    """Цель команд: позиции нод по id, как у Editor.move_by."""
+
+    def __init__(self, **positions: tuple[float, float]) -> None:
+        self.positions: dict[str, tuple[float, float]] = dict(positions)
+
+    def move_by(self, ids: tuple[str, ...], delta: tuple[float, float]) -> None:
+        for node_id in ids:
+            x, y = self.positions[node_id]
+            self.positions[node_id] = (x + delta[0], y + delta[1])
+
+
+class Append(Command):
+    __slots__ = ('value',)
+
+    def __init__(self, value: Any) -> None:
+        self.value: Any = value
+
+    def undo(self, target: list) -> None:
+        target.remove(self.value)
+
+    def redo(self, target: list) -> None:
+        target.append(self.value)
+
+
+def test_moves_of_one_gesture_merge_into_one_command():
+    board: Board = Board(a=(0, 0), b=(10, 10))
+    history: History = History(1 << 20)
+    for _ in range(5):
+        history.do(MoveNodes(('a', 'b'), (1, 2)), board)
+    assert len(history.done) == 1
+    assert board.positions == {'a': (5, 10), 'b': (15, 20)}
+    history.undo(board)
+    assert board.positions == {'a': (0, 0), 'b': (10, 10)}
+    history.redo(board)
+    assert board.positions == {'a': (5, 10), 'b': (15, 20)}
+
+
+def test_seal_and_other_ids_end_the_merge():
+    board: Board = Board(a=(0, 0), b=(0, 0))
+    history: History = History(1 << 20)
+    history.do(MoveNodes(('a',), (1, 0)), board)
+    history.do(MoveNodes(('b',), (1, 0)), board)
+    history.seal()
+    history.do(MoveNodes(('b',), (1, 0)), board)
+    assert len(history.done) == 3
+    # после отмены новая команда не сливается с той, что под ней
+    history.undo(board)
+    history.do(MoveNodes(('b',), (0, 5)), board)
+    assert len(history.done) == 3
+    assert board.positions == {'a': (1, 0), 'b': (1, 5)}
+
+
+def test_new_command_clears_redo_stack():
+    target: list = []
+    history: History = History(1 << 20)
+    for value in 'abc':
+        history.do(Append(value), target)
+        history.seal()
+    history.undo(target)
+    history.undo(target)
+    assert target == ['a'] and len(history.undone) == 2
+    history.do(Append('d'), target)
+    assert history.undone == [] and not history.redo(target)
+    assert history.used == sum(weight for _, weight in history.done)
+    assert target == ['a', 'd']
+
+
+def test_weight_cap_drops_oldest_but_keeps_last():
+    target: list = []
+    weight: int = Append('x' * 100).weight()
+    history: History = History(weight * 3)
+    for i in range(10):
+        history.do(Append(f'{i:x<100}'), target)
+        history.seal()
+        assert history.used <= history.limit
+    assert len(history.done) == 3
+    assert history.used == sum(w for _, w in history.done)
+    while history.undo(target):
+        pass
+    assert target == [f'{i:x<100}' for i in range(7)]
+    # команда тяжелее предела всё равно остаётся, чтобы её можно было отменить
+    history.do(Append('y' * weight * 5), target)
+    assert len(history.done) == 1 and history.undo(target)
+
+
+def test_inverse_swaps_undo_and_redo():
+    target: list = ['a']
+    history: History = History(1 << 20)
+    command: Append = Append('a')
+    command.undo(target)
+    history.push(Inverse(command))
+    history.undo(target)
+    assert target == ['a']
+    history.redo(target)
+    assert target == []
@@ -0,0 +1,92 @@
+import io
+import json
+
+import pytest
+
+from loader import JsonStream, iter_project
+
+# размеры куска чтения, при которых любое число, строка и escape-последовательность попадают на границу
+CHUNKS: list[int] = [1, 2, 3, 5, 7]
+
+PROJECT: dict = {
+    'version': '1.1',
+    'nodes': {
+        '1000': {'text': 'Привет, мир — «ёлка»', 'position': [123456789, -0.000125], 'size': [1e-7, 12.5e10],
+                 'image_path': None, 'answers': {}},
+        '1001': {'text': 'кавычки \" и \\\\ слэш, \\u2603 ☃ \U0001F600', 'connector': [], 'flag': True},
+        '1002': {}
+    },
+    'arrows': [{'start': '1000', 'end': '1001', 'text': '→'}, [], {}, 9007199254740993],
+    'initial': '1000',
+    'next_id': 1003
+}
+
+
+@pytest.fixture(params=CHUNKS)
+def chunk(request, monkeypatch) -> int:
+    monkeypatch.setattr(JsonStream, 'CHUNK', request.param)
+    return request.param
+
+
+def stream_of(text: str) -> JsonStream:
+    return JsonStream(io.BytesIO(text.encode('utf-8')))
+
+
+def test_value_numbers_split_across_chunks(chunk):
+    stream: JsonStream = stream_of('[123456789, -0.000125, 12.5e10, 7]')
+    assert list(stream.items()) == [123456789, -0.000125, 12.5e10, 7]
+
+
+def test_value_number_at_end_of_file(chunk):
+    assert stream_of('  31415926  ').value() == 31415926
+    assert stream_of('31415926').value() == 31415926
+
+
+def test_value_escaped_and_multibyte_split_across_chunks(chunk):
+    text: str = json.dumps(['ёлка ☃ \U0001F600', 'a\\"b\\u00e9\n'], ensure_ascii=False)
+    assert list(stream_of(text).items()) == json.loads(text)
+    ascii_text: str = json.dumps(['ёлка ☃ \U0001F600'])
+    assert list(stream_of(ascii_text).items()) == ['ёлка ☃ \U0001F600']
+
+
+def test_empty_containers(chunk):
+    assert list(stream_of(' { } ').members()) == []
+    assert list(stream_of('[ ]').items()) == []
+    stream: JsonStream = stream_of('{"a": {}, "b": []}')
+    result: dict = {}
+    for key in stream.members():
+        result[key] = stream.value()
+    assert result == {'a': {}, 'b': []}
+
+
+def test_empty_input(chunk):
+    stream: JsonStream = stream_of('')
+    assert stream.peek() == ''
+    with pytest.raises(json.JSONDecodeError):
+        stream.value()
+
+
+def test_iter_project_matches_json_load(chunk, tmp_path):
+    path = tmp_path / 'game.json'
+    path.write_text(json.dumps(PROJECT, ensure_ascii=False, indent=4), encoding='utf-8')
+    progress: list[float] = []
+
+    result: dict = {}
+    for key, value in iter_project(str(path), progress.append):
+        if key == 'node':
+            result.setdefault('nodes', {})[value[0]] = value[1]
+        elif key == 'arrow':
+            result.setdefault('arrows', []).append(value)
+        else:
+            result[key] = value
+
+    with open(path, encoding='utf-8') as file:
+        assert result == json.load(file)
+    assert list(result) == list(PROJECT)
+    assert progress[-1] == 1.0
+
+
+def test_iter_project_empty_file(chunk, tmp_path):
+    path = tmp_path / 'game.json'
+    path.write_bytes(b'')
+    assert list(iter_project(str(path))) == []
@@ -0,0 +1,111 @@
+import random
+from collections import defaultdict
+from typing import Hashable
+
+import pytest
+
+from search import TextIndex, words_of, grams_of, GRAM, EXACT, PREFIX, SUBSTRING
+
+# маленький алфавит: у слов много общих начал и подстрок
+LETTERS: str = 'абвгд'
+EDITS: int = 400
+
+
+def random_word(rng: random.Random) -> str:
+    return ''.join(rng.choice(LETTERS) for _ in range(rng.randint(1, 6)))
+
+
+def random_text(rng: random.Random) -> str:
+    return ' '.join(random_word(rng).upper() if rng.random() < 0.2 else random_word(rng)
+                    for _ in range(rng.randint(0, 5)))
+
+
+def weight(term: str, word: str) -> int:
+    if word == term:
+        return EXACT
+    if word.startswith(term):
+        return PREFIX
+    return SUBSTRING if len(term) >= GRAM and term in word else 0
+
+
+def brute_scores(texts: dict[Hashable, str], query: str) -> dict[Hashable, int]:
+    """Очки текстов, где каждое слово запроса совпадает с каким-то словом текста."""
+    terms: set[str] = words_of(query)
+    scores: dict[Hashable, int] = {}
+    for key, text in texts.items():
+        best: list[int] = [max((weight(term, word) for word in words_of(text)), default=0) for term in terms]
+        if terms and all(best):
+            scores[key] = sum(best)
+    return scores
+
+
+def assert_consistent(index: TextIndex, texts: dict[Hashable, str]) -> None:
+    postings: defaultdict[str, set[Hashable]] = defaultdict(set)
+    for key, text in texts.items():
+        for word in words_of(text):
+            postings[word].add(key)
+    assert index.texts == texts
+    assert dict(index.postings) == dict(postings)
+    assert index.vocabulary == sorted(postings)
+    grams: defaultdict[str, set[str]] = defaultdict(set)
+    for word in postings:
+        for gram in grams_of(word):
+            grams[gram].add(word)
+    assert dict(index.grams) == dict(grams)
+    assert index.lengths == {key: len(text) for key, text in texts.items()}
+
+
+def assert_search(index: TextIndex, texts: dict[Hashable, str], query: str) -> None:
+    scores: dict[Hashable, int] = brute_scores(texts, query)
+    found: list[Hashable] = index.search(query, limit=len(texts) + 1)
+    assert set(found) == set(scores)
+    order: list[tuple[int, int]] = [(-scores[key], len(texts[key])) for key in found]
+    assert order == sorted(order)
+    # с ограничением — лучшие по тому же порядку
+    top: list[Hashable] = index.search(query, limit=3)
+    assert [(-scores[key], len(texts[key])) for key in top] == order[:3]
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_index_matches_brute_force_after_edits(seed):
+    rng: random.Random = random.Random(seed)
+    texts: dict[Hashable, str] = {f'n{i}': random_text(rng) for i in range(40)}
+    index: TextIndex = TextIndex()
+    index.load(texts.items())
+    assert_consistent(index, texts)
+
+    for step in range(EDITS):
+        key: str = f'n{rng.randrange(60)}'
+        if key in texts and rng.random() < 0.3:
+            index.remove(key)
+            del texts[key]
+        else:
+            texts[key] = random_text(rng)
+            index.put(key, texts[key])
+        if step % 20 == 0:
+            assert_consistent(index, texts)
+        assert_search(index, texts, ' '.join(random_word(rng) for _ in range(rng.randint(1, 2))))
+    assert_consistent(index, texts)
+
+
+def test_exact_prefix_and_substring_queries():
+    index: TextIndex = TextIndex()
+    index.load([('a', 'Дверь в подвал'), ('b', 'подвальная дверь'), ('c', 'Вальс')])
+    assert index.search('подвал') == ['a', 'b']
+    assert index.search('вал') == ['c', 'a', 'b']
+    assert index.search('валь') == ['c', 'b']
+    assert index.search('ва') == ['c']
+    assert index.search('дверь подв') == ['a', 'b']
+    assert index.search('нет') == []
+    assert index.search('') == []
+
+
+def test_edit_and_remove_update_postings():
+    index: TextIndex = TextIndex()
+    index.put('a', 'старый текст')
+    index.put('a', 'новый текст')
+    assert index.search('старый') == []
+    assert index.search('нов') == ['a']
+    index.remove('a')
+    assert index.search('текст') == []
+    assert len(index) == 0 and not index.vocabulary and not index.grams
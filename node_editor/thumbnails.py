@@ -0,0 +1,53 @@
+import pygame as pg
+from pygame import Surface
+
+try:
+    from PIL import Image
+except ImportError:
+    # без Pillow картинка декодируется pygame целиком, а уменьшается в два прохода
+    Image = None
+
+# белая пелена поверх миниатюры: цвет c становится c + (255 - c) * OVERLAY / 255
+OVERLAY: int = 100
+# насколько крупнее миниатюры первый, грубый проход уменьшения
+ROUGH: int = 2
+
+
+def overlay_lut(value: int) -> int:
+    return value + (255 - value) * OVERLAY // 255
+
+
+def decode_pillow(path: str, size: tuple[int, int]) -> Surface:
+    """JPEG декодируется сразу в 1/2, 1/4 или 1/8 разрешения (масштабирование DCT в draft), так что 4K-картинка
+    для миниатюры не разворачивается в памяти целиком. Пелена запекается таблицей по каналам."""
+    with Image.open(path) as image:
+        image.draft('RGB', (size[0] * ROUGH, size[1] * ROUGH))
+        image = image.convert('RGB').resize(size, Image.Resampling.BILINEAR, reducing_gap=ROUGH)
+        image = image.point(overlay_lut)
+        return pg.image.frombytes(image.tobytes(), image.size, 'RGB')
+
+
+def decode_pygame(path: str, size: tuple[int, int]) -> Surface:
+    """Грубое уменьшение ближайшим соседом до ROUGH размеров миниатюры, затем сглаженное — до неё самой:
+    smoothscale проходит уже по маленькой картинке. Пелена накладывается заливками, без альфа-поверхности."""
+    image: Surface = pg.image.load(path)
+    rough: tuple[int, int] = (size[0] * ROUGH, size[1] * ROUGH)
+    if image.get_width() > rough[0] and image.get_height() > rough[1]:
+        image = pg.transform.scale(image, rough)
+    if image.get_bitsize() not in (24, 32):
+        # smoothscale работает только с 24- и 32-битными поверхностями
+        full: Surface = Surface(image.get_size(), 0, 32)
+        full.blit(image, (0, 0))
+        image = full
+    image = pg.transform.smoothscale(image, size)
+    keep: int = 255 - OVERLAY
+    image.fill((keep, keep, keep), special_flags=pg.BLEND_RGB_MULT)
+    image.fill((OVERLAY, OVERLAY, OVERLAY), special_flags=pg.BLEND_RGB_ADD)
+    return image
+
+
+def miniature(path: str, size: tuple[int, int]) -> Surface:
+    """Миниатюра картинки размера size с наложенной пеленой."""
+    if Image is not None:
+        return decode_pillow(path, size)
+    return decode_pygame(path, size)
@@ -0,0 +1,81 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from typing import NoReturn, Optional, Any, Callable, Iterator
+
+# Верхняя граница буфера событий: при переполнении теряются самые старые
+MAX_EVENTS: int = 200_000
+
+
+class Tracer:
+    """Сбор спанов в памяти и выгрузка в формате Chrome trace (chrome://tracing, Perfetto)."""
+
+    def __new__(cls, *args, **kwargs):
+        if not hasattr(cls, 'instance'):
+            cls.instance = super(Tracer, cls).__new__(cls)
+        return cls.instance
+
+    def __init__(self) -> NoReturn:
+        if hasattr(self, '_events'):
+            return
+        self.enabled: bool = False
+        self._path: Optional[str] = None
+        self._events: deque[tuple[str, int, int, int, Optional[dict[str, Any]]]] = deque(maxlen=MAX_EVENTS)
+        self._start: int = time.perf_counter_ns()
+
+    def enable(self, path: str, max_events: int = MAX_EVENTS) -> NoReturn:
+        if not self.enabled:
+            atexit.register(self.flush)
+        self.enabled = True
+        self._path = path
+        self._events = deque(self._events, maxlen=max_events)
+
+    def now(self) -> int:
+        """Время от создания трассировщика, мкс: начало спана для record."""
+        return (time.perf_counter_ns() - self._start) // 1000
+
+    def record(self, name: str, begin: int, **args: Any) -> NoReturn:
+        """Спан от begin до этого момента — для спанов, которые решают записывать только в конце."""
+        if self.enabled:
+            self._events.append((name, begin, self.now() - begin, threading.get_ident(), args or None))
+
+    @contextmanager
+    def span(self, name: str, **args: Any) -> Iterator[NoReturn]:
+        if not self.enabled:
+            yield
+            return
+        begin: int = self.now()
+        try:
+            yield
+        finally:
+            self.record(name, begin, **args)
+
+    def trace(self, name: str) -> Callable:
+        def decorator(func: Callable) -> Callable:
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def flush(self) -> NoReturn:
+        if not self.enabled or self._path is None:
+            return
+        pid: int = os.getpid()
+        events: list[dict[str, Any]] = []
+        for name, ts, dur, tid, args in self._events:
+            event = {'name': name, 'ph': 'X', 'ts': ts, 'dur': dur, 'pid': pid, 'tid': tid}
+            if args:
+                event['args'] = args
+            events.append(event)
+        with open(self._path, mode='w', encoding='utf-8') as file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
+        print(f'Трассировка сохранена: {self._path} ({len(events)} событий)')